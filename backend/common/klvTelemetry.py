@@ -0,0 +1,125 @@
+"""
+Binary KLV telemetry format shared by the drone (sendVideoStream.py) and the GCS (receiveVideoStream.py).
+
+Every video frame gets one KLV packet in the MPEG-TS metadata stream:
+
+    Key    16 bytes   TELEMETRY_KEY (private universal label identifying LOCK2A telemetry)
+    Length BER        Length of the value (short form, one byte, for every current version)
+    Value             1 version byte followed by the fixed little-endian field layout below
+
+Floats that are unknown on the drone (None) are sent as NaN and decoded back to None.
+Packets that do not start with TELEMETRY_KEY are decoded as the JSON format used before,
+so old captures still play back.
+"""
+import json
+import math
+import struct
+
+TELEMETRY_KEY = b"\x06\x0e\x2b\x34\x02\x0b\x01\x01LOCK2ATM"
+TELEMETRY_VERSION = 1
+
+# (field name, struct code) in wire order after the version byte
+TELEMETRY_FIELDS_V1 = (
+    ("frame_number", "I"),
+    ("video_timestamp", "d"),
+    ("last_time", "d"),
+    ("latitude", "d"),
+    ("longitude", "d"),
+    ("rth_altitude", "f"),
+    ("dlat", "f"),
+    ("dlon", "f"),
+    ("dalt", "f"),
+    ("heading", "f"),
+    ("roll", "f"),
+    ("pitch", "f"),
+    ("yaw", "f"),
+    ("flight_mode", "i"),
+    ("battery_remaining", "f"),
+    ("battery_voltage", "f"),
+)
+
+_LAYOUTS = {
+    1: (TELEMETRY_FIELDS_V1, struct.Struct("<B" + "".join(code for _, code in TELEMETRY_FIELDS_V1))),
+}
+
+
+def _ber_length(length):
+    """Encode a KLV length in BER short or long form."""
+    if length < 128:
+        return bytes((length,))
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(length_bytes),)) + length_bytes
+
+
+def _read_ber_length(payload, offset):
+    """Decode a BER length at offset. Returns (length, offset of the value)."""
+    first = payload[offset]
+    if first < 128:
+        return first, offset + 1
+    num_bytes = first & 0x7F
+    end = offset + 1 + num_bytes
+    if num_bytes == 0 or end > len(payload):
+        raise ValueError("Malformed KLV length")
+    return int.from_bytes(payload[offset + 1:end], "big"), end
+
+
+def encode_telemetry(frame_number, video_timestamp, telemetry):
+    """
+    Pack one frame's telemetry into a KLV packet.
+
+    Args:
+        frame_number: Frame counter on the drone
+        video_timestamp: Wall-clock capture time of the frame
+        telemetry: dict with the flight computer's basic_telemetry keys (missing keys are sent as unknown)
+
+    Returns:
+        bytes ready to push into the KLV appsrc
+    """
+    fields, layout = _LAYOUTS[TELEMETRY_VERSION]
+    values = [TELEMETRY_VERSION]
+    for name, code in fields:
+        if name == "frame_number":
+            value = frame_number
+        elif name == "video_timestamp":
+            value = video_timestamp
+        else:
+            value = telemetry.get(name)
+
+        if code in ("i", "I"):
+            values.append(-1 if value is None else int(value))
+        else:
+            values.append(math.nan if value is None else float(value))
+
+    value_bytes = layout.pack(*values)
+    return TELEMETRY_KEY + _ber_length(len(value_bytes)) + value_bytes
+
+
+def decode_telemetry(payload):
+    """
+    Decode a KLV telemetry packet (or a legacy JSON one) into a dict.
+
+    Raises:
+        ValueError: If the packet is truncated, malformed or from an unknown version
+    """
+    payload = bytes(payload)
+    if not payload.startswith(TELEMETRY_KEY):
+        return json.loads(payload.decode("utf-8", errors="ignore"))
+
+    length, offset = _read_ber_length(payload, len(TELEMETRY_KEY))
+    if offset + length > len(payload) or length < 1:
+        raise ValueError("Truncated KLV telemetry packet")
+
+    version = payload[offset]
+    if version not in _LAYOUTS:
+        raise ValueError(f"Unsupported KLV telemetry version {version}")
+    fields, layout = _LAYOUTS[version]
+    if length < layout.size:
+        raise ValueError("Truncated KLV telemetry packet")
+
+    values = layout.unpack_from(payload, offset)
+    meta = {}
+    for (name, _), value in zip(fields, values[1:]):
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        meta[name] = value
+    return meta
@@ -0,0 +1,123 @@
+"""
+Binary UDP datagram sent at 60 Hz by the MAVProxy `lock` module (mavproxy_lock.py) to server.py.
+
+Layout (little-endian), LOCK_DATAGRAM_VERSION 1:
+    version u8 | sequence u32 | last_time f64 | latitude f64 | longitude f64 |
+    rth_altitude, dlat, dlon, dalt, heading, roll, pitch, yaw f32 | flight_mode i32
+
+mavproxy_lock.py is copied into MAVProxy's modules directory on its own, so it keeps a
+copy of this format. Keep the two in sync and bump the version when the layout changes.
+"""
+import struct
+
+LOCK_DATAGRAM_VERSION = 1
+LOCK_DATAGRAM = struct.Struct("<BIdddffffffffi")
+
+# basic_telemetry keys in wire order after version and sequence
+LOCK_DATAGRAM_FIELDS = (
+    "last_time", "latitude", "longitude", "rth_altitude",
+    "dlat", "dlon", "dalt", "heading",
+    "roll", "pitch", "yaw", "flight_mode",
+)
+
+SEQUENCE_MODULO = 2 ** 32
+SEQUENCE_RESTART_GAP = 600  # A datagram this far behind means the lock module restarted (10 s at 60 Hz)
+SEQUENCE_RESYNC_COUNT = 5   # Consecutive, increasing datagrams behind the last one also mean a restart
+
+
+def decode_lock_datagram(data):
+    """
+    Parse a datagram from the lock module.
+
+    Returns:
+        Tuple (sequence, values) where values is a tuple ordered like LOCK_DATAGRAM_FIELDS
+
+    Raises:
+        ValueError: If the datagram is the wrong size or version
+    """
+    if len(data) != LOCK_DATAGRAM.size:
+        raise ValueError(f"Lock datagram is {len(data)} bytes, expected {LOCK_DATAGRAM.size}")
+    if data[0] != LOCK_DATAGRAM_VERSION:
+        raise ValueError(f"Unsupported lock datagram version {data[0]}")
+    unpacked = LOCK_DATAGRAM.unpack_from(data)
+    return unpacked[1], unpacked[2:]
+
+
+class DatagramSequenceTracker:
+    """
+    Counts dropped, reordered and duplicate datagrams from the lock module's sequence numbers.
+
+    A restarted lock module counts from 0 again. That is recognised either by a datagram far
+    behind the last one, or by SEQUENCE_RESYNC_COUNT datagrams in a row that are behind it but
+    follow on from each other, which late stragglers do not.
+    """
+    def __init__(self):
+        self.last_sequence = None
+        self.received = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.restarts = 0
+
+        # Datagrams behind last_sequence in a row, counted as reordered until they prove a restart
+        self.behind_run = 0
+        self.behind_last = None
+        self.behind_dropped_credit = 0
+
+    def accept(self, sequence):
+        """
+        Record a sequence number. Returns True if the datagram is newer than anything seen
+        so far and should be applied, False if it is a duplicate or arrived out of order.
+        """
+        self.received += 1
+        if self.last_sequence is None:
+            self.last_sequence = sequence
+            return True
+
+        gap = (sequence - self.last_sequence) % SEQUENCE_MODULO
+        if gap == 0:
+            self.duplicates += 1
+            return False
+        if gap < SEQUENCE_MODULO // 2:
+            self.dropped += gap - 1
+            self.last_sequence = sequence
+            self.behind_run = 0
+            return True
+
+        behind = SEQUENCE_MODULO - gap
+        if behind > SEQUENCE_RESTART_GAP:
+            self._restart(sequence)
+            return True
+
+        # Behind the last datagram: a late arrival, or the start of a restarted sender's count
+        follows_run = (self.behind_run > 0 and
+                       0 < (sequence - self.behind_last) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2)
+        if not follows_run:
+            self.behind_run = 0
+            self.behind_dropped_credit = 0
+        self.behind_run += 1
+        self.behind_last = sequence
+        if self.behind_run >= SEQUENCE_RESYNC_COUNT:
+            # Undo the counts of the earlier datagrams in the run, they were not late arrivals
+            self.reordered -= self.behind_run - 1
+            self.dropped += self.behind_dropped_credit
+            self._restart(sequence)
+            return True
+
+        # Late arrival of a datagram that was already counted as dropped
+        self.reordered += 1
+        if self.dropped > 0:
+            self.dropped -= 1
+            self.behind_dropped_credit += 1
+        return False
+
+    def _restart(self, sequence):
+        """Sender restarted and counts from 0 again"""
+        self.restarts += 1
+        self.last_sequence = sequence
+        self.behind_run = 0
+        self.behind_dropped_credit = 0
+
+    def summary(self):
+        return (f"received={self.received} dropped={self.dropped} reordered={self.reordered} "
+                f"duplicates={self.duplicates} restarts={self.restarts}")
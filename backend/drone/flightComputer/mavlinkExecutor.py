@@ -0,0 +1,143 @@
+"""
+Non-blocking MAVLink command execution for the flight computer server.
+
+One I/O thread owns all reads from the vehicle connection and hands every COMMAND_ACK to the
+asyncio future waiting on that command ID, so awaiting an ack never blocks the event loop and
+commands with different IDs can be in flight together.
+"""
+import asyncio
+import threading
+from collections import deque
+from pymavlink import mavutil
+from mavlinkMessages.mode import COPTER_MODES
+
+ACK_TIMEOUT = 5.0  # Seconds to wait for the autopilot's COMMAND_ACK
+READ_TIMEOUT = 0.5  # Reader thread wakes up at least this often to check for shutdown
+
+
+class MavlinkCommandError(RuntimeError):
+    """The autopilot rejected a command or did not acknowledge it in time."""
+
+
+class MavlinkExecutor:
+    """
+    Sends MAVLink commands from the event loop and resolves their acks from a reader thread.
+
+    Acks for the same command ID come back in the order the commands were sent, so waiters are
+    kept in a FIFO per command ID.
+    """
+    def __init__(self, connection, ack_timeout=ACK_TIMEOUT):
+        self.connection = connection
+        self.ack_timeout = ack_timeout
+        self._loop = None
+        self._send_lock = threading.Lock()  # pymavlink's sender is not thread safe
+        self._waiters = {}  # command ID -> deque of futures
+        self._stop = threading.Event()
+        self._reader_thread = None
+
+    def start(self, loop):
+        """Start the reader thread. Acks are delivered to futures on loop."""
+        self._loop = loop
+        self._stop.clear()
+        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._reader_thread:
+            self._reader_thread.join(timeout=READ_TIMEOUT * 2)
+            self._reader_thread = None
+        for waiters in self._waiters.values():
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(MavlinkCommandError("MAVLink executor stopped"))
+        self._waiters.clear()
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                msg = self.connection.recv_match(blocking=True, timeout=READ_TIMEOUT)
+            except Exception as e:
+                print(f"[ERROR] MAVLink read failed: {e}")
+                continue
+            if msg is None or msg.get_type() != "COMMAND_ACK":
+                continue
+            try:
+                self._loop.call_soon_threadsafe(self._resolve_ack, msg)
+            except RuntimeError:
+                return # Loop closed (shutdown)
+
+    def _resolve_ack(self, msg):
+        waiters = self._waiters.get(msg.command)
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():  # Skip waiters that already timed out
+                future.set_result(msg)
+                return
+
+    async def command_long(self, command, *params, timeout=None):
+        """
+        Send a COMMAND_LONG and wait for its COMMAND_ACK without blocking the event loop.
+
+        Args:
+            command: MAV_CMD ID
+            params: Up to seven command parameters (missing ones are sent as 0)
+            timeout: Seconds to wait for the ack, defaults to ack_timeout
+
+        Returns:
+            The COMMAND_ACK message
+
+        Raises:
+            MavlinkCommandError: If the ack times out or reports a result other than MAV_RESULT_ACCEPTED
+        """
+        if self._loop is None:
+            raise RuntimeError("MAVLink executor not started")
+        params = (list(params) + [0] * 7)[:7]
+        future = self._loop.create_future()
+        self._waiters.setdefault(command, deque()).append(future)
+
+        with self._send_lock:
+            self.connection.mav.command_long_send(
+                self.connection.target_system,
+                self.connection.target_component,
+                command,
+                0, # Confirmation
+                *params
+            )
+
+        timeout = self.ack_timeout if timeout is None else timeout
+        try:
+            ack = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise MavlinkCommandError(f"No COMMAND_ACK for command {command} after {timeout:.1f}s")
+        if ack.result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            raise MavlinkCommandError(f"Autopilot rejected command {command} with result {ack.result}")
+        return ack
+
+    async def set_mode(self, mode_string):
+        """Set the flight mode by name (see COPTER_MODES)."""
+        mode_id = COPTER_MODES.get(mode_string)
+        if mode_id is None:
+            raise ValueError(f"Unknown flight mode: {mode_string}")
+        return await self.command_long(
+            mavutil.mavlink.MAV_CMD_DO_SET_MODE,
+            mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
+            mode_id,
+        )
+
+    async def takeoff(self, takeoff_height):
+        return await self.command_long(mavutil.mavlink.MAV_CMD_NAV_TAKEOFF, 0, 0, 0, 0, 0, 0, takeoff_height)
+
+    async def move_to_location(self, latitude, longitude, altitude):
+        """Send a guided position target. The autopilot does not ack these, so this returns once it is sent."""
+        with self._send_lock:
+            self.connection.mav.send(mavutil.mavlink.MAVLink_set_position_target_global_int_message(
+                10,
+                self.connection.target_system,
+                self.connection.target_component,
+                mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
+                int(0b110111111000),
+                int(latitude * 10 ** 7),
+                int(longitude * 10 ** 7),
+                altitude, # Altitude (in metres) above home
+                0, 0, 0, 0, 0, 0, 0, 0))
@@ -1,8 +1,14 @@
 import socket
+import struct
 import time
 
 from MAVProxy.modules.lib import mp_module
 
+# Binary datagram read by flightComputer/server.py. This file is copied into MAVProxy's
+# modules directory on its own, so the format is duplicated from flightComputer/lockTelemetry.py.
+LOCK_DATAGRAM_VERSION = 1
+LOCK_DATAGRAM = struct.Struct("<BIdddffffffffi")
+
 class lock(mp_module.MPModule):
     def __init__(self, mpstate):
         """Initialise module"""
@@ -28,6 +34,9 @@ class lock(mp_module.MPModule):
 
         self.flight_mode = 0
 
+        self.sequence = 0
+        self.datagram = bytearray(LOCK_DATAGRAM.size)  # Reused for every send
+
     def idle_task(self):
         '''called rapidly by mavproxy'''
         now = time.time()
@@ -62,11 +71,11 @@ class lock(mp_module.MPModule):
             
     def send_data(self):
         t = time.time()
-        heartbeat_data = (t, self.lat, self.lon, self.rel_alt, self.roll, self.pitch, self.yaw, 
-                          self.dlat, self.dlon, self.dalt, self.heading, self.flight_mode)
-
-        heartbeat_message = f"{heartbeat_data}".encode()
-        self.sock.sendto(heartbeat_message, ("127.0.0.1", 5005))
+        LOCK_DATAGRAM.pack_into(self.datagram, 0, LOCK_DATAGRAM_VERSION, self.sequence, t,
+                                self.lat, self.lon, self.rel_alt, self.dlat, self.dlon, self.dalt,
+                                self.heading, self.roll, self.pitch, self.yaw, int(self.flight_mode))
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.sock.sendto(self.datagram, ("127.0.0.1", 5005))
 
     def encode_message(self, items):
         message = ""
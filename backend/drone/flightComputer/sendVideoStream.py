@@ -6,7 +6,6 @@ import time
 import socket
 import psutil
 import gi
-import json
 from dotenv import load_dotenv
 import os
 
@@ -18,6 +17,9 @@ metrics = {"packet_count": 0, "total_bytes": 0, "start_time": 0}
 
 # --- Configuration ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../common"))
+from klvTelemetry import encode_telemetry
+
 env_path = os.path.join(script_dir, "../../../.env")
 load_dotenv(dotenv_path=env_path)
 VIDEO_INPUT_DEVICE = "/dev/video0"
@@ -88,14 +90,10 @@ def video_frame_probe(pad, info, klv_src):
         except Exception:
             pass
 
-    # Build KLV Packet
-    klv_data = {
-        "frame_number": frame_count,
-        "video_timestamp": capture_time, 
-    }
-    klv_data.update(telemetry_data)
+    # Build KLV Packet (fixed binary layout, see common/klvTelemetry.py)
+    data_bytes = encode_telemetry(frame_count, capture_time, telemetry_data)
+
     # Create GStreamer Buffer and add data
-    data_bytes = json.dumps(klv_data).encode("utf-8")
     gst_buffer = Gst.Buffer.new_allocate(None, len(data_bytes), None)
     gst_buffer.fill(0, data_bytes)
 
@@ -213,7 +211,7 @@ def benchmark_gstreamer(duration=60):
 
             # --- Inject Dummy Metadata (Required to keep pipeline healthy) ---
             # Even though this is a benchmark, feed the 'appsrc' or it might stall
-            data = json.dumps({"ts": loop_start}).encode("utf-8")
+            data = encode_telemetry(0, loop_start, {})
             buf = Gst.Buffer.new_allocate(None, len(data), None)
             buf.fill(0, data)
             # Use pipeline time for PTS
@@ -1,6 +1,6 @@
 """Flight Computer Server running on the raspberry pi onboard the drone."""
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
@@ -11,18 +11,19 @@ from sendVideoStream import start_streaming_video_and_telemetry
 from dotenv import load_dotenv
 import threading
 import socket
+import os
 import time
-from mavlinkMessages.mode import set_mode
-import time
-from mavlinkMessages.mode import set_mode
 from mavlinkMessages.connect import connect_to_vehicle, verify_connection
-from mavlinkMessages.commandToLocation import move_to_location
+from mavlinkExecutor import MavlinkExecutor
+from lockTelemetry import LOCK_DATAGRAM_FIELDS, DatagramSequenceTracker, decode_lock_datagram
+from telemetryBus import TelemetryBus, DEFAULT_PUSH_RATE_HZ, parse_push_rate
 
 load_dotenv(dotenv_path="../../.env")
 
 active_connections: List[WebSocket] = []
 
 vehicle_connection = None
+mavlink_executor = None  # Owns all reads from vehicle_connection once started
 
 vehicle_ip = "udp:127.0.0.1:5006" # Need to run mavproxy module on 5006
 
@@ -43,11 +44,15 @@ basic_telemetry = {
     "battery_voltage": None
 }
 basic_telemetry_lock = threading.Lock()
+telemetry_bus = TelemetryBus(basic_telemetry.copy())  # Ingest thread publishes, websocket clients subscribe
+TELEMETRY_PUSH_HZ = parse_push_rate(os.getenv("TELEMETRY_PUSH_HZ"), DEFAULT_PUSH_RATE_HZ)  # Default per-client push rate
+lock_datagram_stats = DatagramSequenceTracker()  # Drops/reordering on the 60 Hz lock module feed
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global vehicle_connection
-    
+    global vehicle_connection, mavlink_executor
+
+    telemetry_bus.attach_loop(asyncio.get_running_loop())
     flight_controller_thread = threading.Thread(target=update_vehicle_position_from_flight_controller, daemon=True)
     flight_controller_thread.start()
     time.sleep(0.5) # Give some time for the thread to start
@@ -70,6 +75,9 @@ async def lifespan(app: FastAPI):
         print("Vehicle connection is None, exiting...")
         # exit(1)
 
+    mavlink_executor = MavlinkExecutor(vehicle_connection)
+    mavlink_executor.start(asyncio.get_running_loop())
+
     video_and_telemetry_thread = threading.Thread(
         target=start_streaming_video_and_telemetry, args=(return_telemetry_data,), daemon=True
     )
@@ -77,15 +85,8 @@ async def lifespan(app: FastAPI):
     print("Video streaming thread started")
     time.sleep(0.5)  # Give some time for the thread to start
     
-    background_task = asyncio.create_task(send_telemetry_data())
     yield
-    # Shutdown
-    if background_task:
-        background_task.cancel()
-        try:
-            await background_task
-        except asyncio.CancelledError:
-            pass
+    mavlink_executor.stop()
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
@@ -95,40 +96,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def send_data_to_connections(message: dict):
-    """Send message to all connected WebSocket clients"""
-    for websocket in active_connections:
-        try:
-            await websocket.send_text(json.dumps(message))
-        except:
-            if websocket in active_connections:
-                active_connections.remove(websocket)
-
-
-async def send_telemetry_data():
-    global basic_telemetry
-    while True:
-        with basic_telemetry_lock:
-            await send_data_to_connections(basic_telemetry)
-        await asyncio.sleep(1)
+async def push_telemetry(websocket: WebSocket, rate_hz: float, send_lock: asyncio.Lock):
+    """Send the newest telemetry snapshot to one client at up to rate_hz, coalescing anything in between"""
+    subscription = telemetry_bus.subscribe(rate_hz)
+    try:
+        while True:
+            snapshot = await subscription.next()
+            async with send_lock:
+                await websocket.send_text(json.dumps(snapshot))
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        print(f"Stopped pushing telemetry to client: {e}")
+    finally:
+        subscription.close()
 
 
 def return_telemetry_data():
-    global basic_telemetry
-    with basic_telemetry_lock:
-        return basic_telemetry.copy()
+    """Newest telemetry snapshot (read-only) for the video KLV stream"""
+    return telemetry_bus.latest()[1]
 
 
-def setFlightMode(mode: str):
+async def setFlightMode(mode: str):
     """Set the flight mode of the drone"""
     print(f"Received request to set flight mode: {mode}")
     if not mode:
         raise ValueError("Flight mode cannot be empty.")
-    if vehicle_connection is None:
+    if mavlink_executor is None:
         raise RuntimeError("Vehicle connection is not established.")
     try:
-        set_mode(vehicle_connection, mode)
         print(f"Setting flight mode to: {mode}")
+        await mavlink_executor.set_mode(mode)
     except Exception as e:
         print(f"Failed to set flight mode: {e}")
         raise RuntimeError(f"Failed to set flight mode: {e}")
@@ -152,38 +150,70 @@ def stopFollowingTarget():
     except Exception as e:
         raise RuntimeError(f"Failed to stop following target: {e}")
     
-def moveToLocation(location):
+async def moveToLocation(location):
     """Move the drone to a specified location"""
     if not location or "lat" not in location or "lon" not in location or "alt" not in location:
         raise ValueError("Invalid location data")
+    if mavlink_executor is None:
+        raise RuntimeError("Vehicle connection is not established.")
     try:
         print(f"Moving to location - lat: {location['lat']}, lon: {location['lon']}, alt: {location['alt']}")        
-        move_to_location(vehicle_connection, location["lat"], location["lon"], location["alt"])
+        await mavlink_executor.move_to_location(location["lat"], location["lon"], location["alt"])
     except Exception as e:
         raise RuntimeError(f"Failed to move to location: {e}")
 
 
+async def handle_command(msg: dict):
+    """Run a command from the GCS. Raises if it is unknown or fails."""
+    cmd = msg.get("command")
+    if cmd == "move_to_location":
+        await moveToLocation(msg.get("location"))
+    elif cmd == "set_flight_mode":
+        await setFlightMode(msg.get("mode"))
+    elif cmd == "set_follow_distance":
+        setFollowDistance(msg.get("distance"))
+    elif cmd == "stop_following":
+        stopFollowingTarget()
+    else:
+        raise ValueError(f"Unknown command: {cmd}")
+
+
+async def run_and_ack(websocket: WebSocket, msg: dict, send_lock: asyncio.Lock):
+    """Run one command and acknowledge it with its request_id so the GCS can match and time it"""
+    ack = {"type": "ack", "request_id": msg.get("request_id"), "command": msg.get("command"), "status": "ok"}
+    try:
+        await handle_command(msg)
+    except Exception as e:
+        ack["status"] = "error"
+        ack["error"] = str(e)
+    try:
+        async with send_lock:
+            await websocket.send_text(json.dumps(ack))
+    except Exception as e:
+        print(f"Failed to ack {msg.get('command')}: {e}")
+
+
 @app.websocket("/ws/flight-computer")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for GCS frontend to send commands and receive telemetry"""
     await websocket.accept()
     active_connections.append(websocket)
+
+    # Clients can ask for their own push rate, e.g. /ws/flight-computer?telemetry_hz=60
+    rate_hz = parse_push_rate(websocket.query_params.get("telemetry_hz"), TELEMETRY_PUSH_HZ)
+    send_lock = asyncio.Lock()  # Acks and telemetry share the socket
+    telemetry_task = asyncio.create_task(push_telemetry(websocket, rate_hz, send_lock))
+    command_tasks = set()
     try:
         while True:
             data = await websocket.receive_text()
             msg = json.loads(data)
-            cmd = msg.get("command")
-            # Handle commands
-            if cmd == "move_to_location":
-                moveToLocation(msg.get("location"))
-            elif cmd == "set_flight_mode":
-                setFlightMode(msg.get("mode"))
-            elif cmd == "set_follow_distance":
-                setFollowDistance(msg.get("distance"))
-            elif cmd == "stop_following":
-                stopFollowingTarget()
-            else:
-                raise HTTPException(status_code=400, detail="Unknown command")
+
+            # Each command waits for its autopilot ack in its own task, so a slow mode change
+            # doesn't hold up the commands behind it
+            task = asyncio.create_task(run_and_ack(websocket, msg, send_lock))
+            command_tasks.add(task)
+            task.add_done_callback(command_tasks.discard)
 
     except WebSocketDisconnect:
         print("Client disconnected.")
@@ -194,6 +224,9 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
     finally:
+        telemetry_task.cancel()
+        for task in command_tasks:
+            task.cancel()
         if websocket in active_connections:
             active_connections.remove(websocket)
 
@@ -206,20 +239,24 @@ def update_vehicle_position_from_flight_controller():
     sock.bind(("127.0.0.1", 5005))
 
     while True:
-        data = sock.recvfrom(1024)
-        items = data[0].decode()[1:-1].split(",")
-        message_time = float(items[0])
+        data, _ = sock.recvfrom(1024)
+        try:
+            sequence, values = decode_lock_datagram(data)
+        except ValueError as e:
+            print(f"Ignoring lock module datagram: {e}")
+            continue
+
+        if not lock_datagram_stats.accept(sequence):
+            continue # Duplicate or older than what we already have
 
         with basic_telemetry_lock:
-            last_time = basic_telemetry.get("last_time")
-            if last_time is not None and message_time <= last_time:
-                continue
-            elif len(items) == len(basic_telemetry) - 2: # Exclude battery fields
-                basic_telemetry["last_time"] = message_time
-                for i, key in enumerate(list(basic_telemetry.keys())[1:-2], start=1):
-                    basic_telemetry[key] = float(items[i])
-            else:
-                print(f"Received data item does not match expected length...")
+            for key, value in zip(LOCK_DATAGRAM_FIELDS, values):
+                basic_telemetry[key] = value
+            snapshot = basic_telemetry.copy()
+        telemetry_bus.publish(snapshot) # Never blocks on websocket sends
+
+        if lock_datagram_stats.received % 600 == 0 and (lock_datagram_stats.dropped or lock_datagram_stats.reordered):
+            print(f"Lock module datagrams: {lock_datagram_stats.summary()}")
 
 if __name__ == "__main__":    
     uvicorn.run("server:app", host="0.0.0.0", port=5555, reload=True)
\ No newline at end of file
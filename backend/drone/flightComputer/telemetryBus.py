@@ -0,0 +1,115 @@
+"""Latest-value telemetry bus between the 60 Hz UDP ingest thread and the websocket clients."""
+import asyncio
+import math
+import threading
+
+DEFAULT_PUSH_RATE_HZ = 20
+MAX_PUSH_RATE_HZ = 60
+KEEPALIVE_INTERVAL = 1.0  # Re-send the latest snapshot at least this often, even if nothing changed
+
+
+def parse_push_rate(value, default=DEFAULT_PUSH_RATE_HZ):
+    """
+    Push rate a client asked for (e.g. the telemetry_hz query parameter).
+
+    Returns:
+        The rate in Hz, or default if value is missing, not a number, not finite or not positive
+    """
+    try:
+        rate_hz = float(value)
+    except (TypeError, ValueError):
+        return default
+    return rate_hz if math.isfinite(rate_hz) and rate_hz > 0 else default
+
+
+class TelemetryBus:
+    """
+    The ingest thread publishes immutable telemetry snapshots; each subscriber receives the
+    newest one at its own rate. Snapshots published between two sends are coalesced, so a
+    slow client only ever skips stale values and publish() never waits on network I/O.
+    """
+    def __init__(self, initial_snapshot=None):
+        self._lock = threading.Lock()
+        self._snapshot = initial_snapshot
+        self._version = 0
+        self._loop = None
+        self._notify_pending = False
+        self._subscribers = set()
+
+    def attach_loop(self, loop):
+        """Set the event loop the subscribers run on. Call from that loop before publishing."""
+        self._loop = loop
+
+    def publish(self, snapshot):
+        """Publish a new snapshot. Safe to call from any thread; the dict must not be modified afterwards."""
+        with self._lock:
+            self._snapshot = snapshot
+            self._version += 1
+            schedule = self._loop is not None and not self._notify_pending
+            self._notify_pending = self._notify_pending or schedule
+
+        # One wake-up per batch of publishes, however many arrive before the loop runs
+        if schedule:
+            try:
+                self._loop.call_soon_threadsafe(self._notify_subscribers)
+            except RuntimeError:
+                pass # Loop already closed (shutdown)
+
+    def latest(self):
+        """Returns (version, snapshot) of the newest published telemetry."""
+        with self._lock:
+            return self._version, self._snapshot
+
+    def _notify_subscribers(self):
+        with self._lock:
+            self._notify_pending = False
+        for subscription in self._subscribers:
+            subscription._event.set()
+
+    def subscribe(self, rate_hz=DEFAULT_PUSH_RATE_HZ):
+        """
+        Create a subscription delivering at most rate_hz snapshots per second (clamped to 1-60 Hz,
+        DEFAULT_PUSH_RATE_HZ if it is not a finite positive number).
+        """
+        subscription = TelemetrySubscription(self, rate_hz)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+
+class TelemetrySubscription:
+    def __init__(self, bus, rate_hz):
+        self._bus = bus
+        self._event = asyncio.Event()
+        rate_hz = parse_push_rate(rate_hz)  # nan would slip through min/max and disable the limit
+        self.interval = 1.0 / min(max(rate_hz, 1), MAX_PUSH_RATE_HZ)
+        self._last_version = -1
+        self._next_send = 0.0
+
+    async def next(self):
+        """Wait for the next snapshot to send, no sooner than this subscription's interval allows."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout=KEEPALIVE_INTERVAL)
+                keepalive = False
+            except asyncio.TimeoutError:
+                keepalive = True
+            self._event.clear()
+
+            # Anything published while we wait here is coalesced into the snapshot we send
+            wait = self._next_send - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            version, snapshot = self._bus.latest()
+            if snapshot is None or (version == self._last_version and not keepalive):
+                continue
+            self._last_version = version
+            self._next_send = loop.time() + self.interval
+            return snapshot
+
+    def close(self):
+        self._bus.unsubscribe(self)
@@ -0,0 +1,87 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lockTelemetry import (LOCK_DATAGRAM, LOCK_DATAGRAM_VERSION, LOCK_DATAGRAM_FIELDS, SEQUENCE_MODULO,
+                           SEQUENCE_RESTART_GAP, SEQUENCE_RESYNC_COUNT, DatagramSequenceTracker, decode_lock_datagram)
+
+
+@pytest.fixture
+def tracker():
+    return DatagramSequenceTracker()
+
+
+def accept_all(tracker, sequences):
+    return [tracker.accept(sequence) for sequence in sequences]
+
+
+# ------------------ Datagram Decoding Tests ------------------
+def test_decode_round_trip():
+    values = (12.5, 51.0, -114.0, 30.0, 1.0, 2.0, 3.0, 90.0, 0.5, 0.25, 0.125, 4)
+    sequence, decoded = decode_lock_datagram(LOCK_DATAGRAM.pack(LOCK_DATAGRAM_VERSION, 7, *values))
+    assert sequence == 7
+    assert len(decoded) == len(LOCK_DATAGRAM_FIELDS)
+    assert decoded == pytest.approx(values)
+
+
+def test_decode_rejects_wrong_size_and_version():
+    with pytest.raises(ValueError):
+        decode_lock_datagram(b"\x01" * (LOCK_DATAGRAM.size - 1))
+    with pytest.raises(ValueError):
+        decode_lock_datagram(LOCK_DATAGRAM.pack(LOCK_DATAGRAM_VERSION + 1, 0, *([0.0] * 11), 0))
+
+
+# ------------------ Sequence Tracker Tests ------------------
+def test_in_order_and_dropped(tracker):
+    assert accept_all(tracker, [0, 1, 2, 5, 6]) == [True] * 5
+    assert tracker.dropped == 2
+    assert tracker.reordered == 0
+
+
+def test_duplicates_are_skipped(tracker):
+    assert accept_all(tracker, [0, 1, 1, 2, 2]) == [True, True, False, True, False]
+    assert tracker.duplicates == 2
+    assert tracker.dropped == 0
+
+
+def test_late_datagram_is_skipped_and_not_dropped(tracker):
+    assert accept_all(tracker, [0, 1, 3, 2, 4]) == [True, True, True, False, True]
+    assert tracker.reordered == 1
+    assert tracker.dropped == 0
+    assert tracker.restarts == 0
+
+
+def test_sequence_wraps_around(tracker):
+    last = SEQUENCE_MODULO - 1
+    assert accept_all(tracker, [last - 1, last, 0, 2]) == [True] * 4
+    assert tracker.dropped == 1
+    assert tracker.restarts == 0
+    assert tracker.accept(last) is False  # Late across the wrap
+    assert tracker.reordered == 1
+
+
+def test_restart_far_behind_is_applied_at_once(tracker):
+    accept_all(tracker, range(10000, 10010))
+    assert tracker.accept(0) is True
+    assert tracker.accept(1) is True
+    assert tracker.restarts == 1
+
+
+def test_early_restart_resyncs_after_a_few_datagrams(tracker):
+    # Lock module restarted after only a few seconds: the new count is not far enough behind
+    accept_all(tracker, range(100, 100 + SEQUENCE_RESTART_GAP // 2))
+    restarted = accept_all(tracker, range(0, SEQUENCE_RESYNC_COUNT + 3))
+    assert restarted == [False] * (SEQUENCE_RESYNC_COUNT - 1) + [True] * 4
+    assert tracker.restarts == 1
+    assert tracker.reordered == 0
+    assert tracker.dropped == 0
+
+
+def test_stragglers_do_not_resync(tracker):
+    accept_all(tracker, [0, 5, 10])
+    # Late datagrams from before the newest one, not following on from each other
+    assert accept_all(tracker, [3, 1, 4, 2, 9, 6]) == [False] * 6
+    assert tracker.restarts == 0
+    assert tracker.last_sequence == 10
+    assert tracker.reordered == 6
+    assert tracker.dropped == 8 - 6
@@ -0,0 +1,112 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import queue
+from unittest.mock import Mock
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from pymavlink import mavutil
+from mavlinkExecutor import MavlinkExecutor, MavlinkCommandError
+
+TAKEOFF = mavutil.mavlink.MAV_CMD_NAV_TAKEOFF
+ACCEPTED = mavutil.mavlink.MAV_RESULT_ACCEPTED
+DENIED = mavutil.mavlink.MAV_RESULT_DENIED
+
+
+class FakeConnection:
+    """Vehicle connection whose incoming messages are fed by the test"""
+    def __init__(self):
+        self.incoming = queue.Queue()
+        self.mav = Mock()
+        self.target_system = 1
+        self.target_component = 1
+
+    def recv_match(self, blocking=True, timeout=None):
+        try:
+            return self.incoming.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def ack(self, command, result=ACCEPTED, tag=None):
+        self.incoming.put(Mock(get_type=Mock(return_value="COMMAND_ACK"), command=command, result=result, tag=tag))
+
+
+@pytest_asyncio.fixture
+async def executor():
+    connection = FakeConnection()
+    executor = MavlinkExecutor(connection, ack_timeout=1.0)
+    executor.start(asyncio.get_running_loop())
+    yield executor
+    executor.stop()
+
+
+async def sent(executor, count):
+    """Wait until count commands were sent"""
+    while executor.connection.mav.command_long_send.call_count < count:
+        await asyncio.sleep(0.01)
+
+
+# ------------------ Ack Resolution Tests ------------------
+@pytest.mark.asyncio
+async def test_acks_for_one_command_resolve_in_order(executor):
+    first = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    second = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    await sent(executor, 2)
+
+    executor.connection.ack(TAKEOFF, tag="first")
+    executor.connection.ack(TAKEOFF, tag="second")
+    assert (await first).tag == "first"
+    assert (await second).tag == "second"
+
+
+@pytest.mark.asyncio
+async def test_timed_out_waiter_is_skipped(executor):
+    with pytest.raises(MavlinkCommandError):
+        await executor.command_long(TAKEOFF, timeout=0.05)
+
+    pending = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    await sent(executor, 2)
+    executor.connection.ack(TAKEOFF, tag="late")  # The timed-out waiter is skipped, the next ack resolves the live one
+    assert (await pending).tag == "late"
+    assert not executor._waiters[TAKEOFF]
+
+
+@pytest.mark.asyncio
+async def test_rejected_command_raises(executor):
+    pending = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    await sent(executor, 1)
+    executor.connection.ack(TAKEOFF, result=DENIED)
+    with pytest.raises(MavlinkCommandError, match="rejected"):
+        await pending
+
+
+@pytest.mark.asyncio
+async def test_other_messages_are_ignored(executor):
+    pending = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    await sent(executor, 1)
+    executor.connection.incoming.put(Mock(get_type=Mock(return_value="HEARTBEAT")))
+    executor.connection.ack(mavutil.mavlink.MAV_CMD_DO_SET_MODE)
+    await asyncio.sleep(0.05)
+    assert not pending.done()
+    executor.connection.ack(TAKEOFF)
+    await pending
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_pending_commands():
+    executor = MavlinkExecutor(FakeConnection())
+    executor.start(asyncio.get_running_loop())
+    pending = asyncio.ensure_future(executor.command_long(TAKEOFF))
+    await sent(executor, 1)
+
+    executor.stop()
+    with pytest.raises(MavlinkCommandError, match="stopped"):
+        await pending
+
+
+@pytest.mark.asyncio
+async def test_unknown_mode_is_not_sent(executor):
+    with pytest.raises(ValueError):
+        await executor.set_mode("Sport")
+    executor.connection.mav.command_long_send.assert_not_called()
@@ -0,0 +1,113 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import telemetryBus
+from telemetryBus import TelemetryBus, DEFAULT_PUSH_RATE_HZ, parse_push_rate
+
+
+@pytest_asyncio.fixture
+async def bus():
+    bus = TelemetryBus()
+    bus.attach_loop(asyncio.get_running_loop())
+    return bus
+
+
+# ------------------ Telemetry Bus Tests ------------------
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_only_the_newest_snapshot(bus):
+    subscription = bus.subscribe(rate_hz=60)
+    bus.publish({"seq": 0})
+    assert (await asyncio.wait_for(subscription.next(), 1))["seq"] == 0
+
+    # Published while the client was busy sending: only the last one is delivered
+    for seq in range(1, 50):
+        bus.publish({"seq": seq})
+    assert (await asyncio.wait_for(subscription.next(), 1))["seq"] == 49
+
+    pending = asyncio.ensure_future(subscription.next())
+    await asyncio.sleep(0.1)
+    assert not pending.done()  # Nothing new: no re-send before the keepalive
+    pending.cancel()
+
+
+@pytest.mark.asyncio
+async def test_each_subscriber_has_its_own_rate(bus):
+    fast, slow = bus.subscribe(rate_hz=60), bus.subscribe(rate_hz=5)
+    received = {fast: 0, slow: 0}
+
+    async def consume(subscription):
+        while True:
+            await subscription.next()
+            received[subscription] += 1
+
+    consumers = [asyncio.ensure_future(consume(fast)), asyncio.ensure_future(consume(slow))]
+    loop = asyncio.get_running_loop()
+    end = loop.time() + 0.5
+    seq = 0
+    while loop.time() < end:
+        bus.publish({"seq": seq})
+        seq += 1
+        await asyncio.sleep(1 / 120)
+    for consumer in consumers:
+        consumer.cancel()
+
+    assert received[slow] <= 4  # 5 Hz for half a second, plus the first send
+    assert received[fast] >= 3 * received[slow]
+
+
+@pytest.mark.asyncio
+async def test_keepalive_resends_latest_snapshot(bus, monkeypatch):
+    monkeypatch.setattr(telemetryBus, "KEEPALIVE_INTERVAL", 0.1)
+    subscription = bus.subscribe()
+    bus.publish({"seq": 1})
+    first = await asyncio.wait_for(subscription.next(), 1)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    again = await asyncio.wait_for(subscription.next(), 1)
+    assert again is first
+    assert loop.time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_publish_from_another_thread_wakes_subscribers(bus):
+    subscription = bus.subscribe(rate_hz=60)
+    pending = asyncio.ensure_future(subscription.next())
+    await asyncio.sleep(0)
+
+    publisher = threading.Thread(target=lambda: [bus.publish({"seq": seq}) for seq in range(100)])
+    publisher.start()
+    publisher.join()
+
+    assert (await asyncio.wait_for(pending, 0.5))["seq"] == 99
+    assert bus.latest() == (100, {"seq": 99})
+    assert not bus._notify_pending  # One wake-up for the whole batch, then ready for the next
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "0", "-5", "fast", None])
+def test_invalid_push_rate_falls_back_to_default(value):
+    assert parse_push_rate(value, 15.0) == 15.0
+
+
+def test_valid_push_rate_is_kept():
+    assert parse_push_rate("60") == 60.0
+    assert parse_push_rate("0.5") == 0.5
+
+
+@pytest.mark.asyncio
+async def test_nan_rate_does_not_disable_rate_limit(bus):
+    subscription = bus.subscribe(rate_hz=float("nan"))
+    assert subscription.interval == pytest.approx(1.0 / DEFAULT_PUSH_RATE_HZ)
+
+
+@pytest.mark.asyncio
+async def test_closed_subscription_is_not_notified(bus):
+    subscription = bus.subscribe()
+    subscription.close()
+    bus.publish({"seq": 1})
+    await asyncio.sleep(0)
+    assert not subscription._event.is_set()
@@ -6,7 +6,8 @@ import time
 import traceback
 import numpy as np
 from collections import deque
-from .AIEngine import TelemetryRecorder, TrackingEngine, ProcessingState, CursorHandler, process_detection_mode, process_tracking_mode
+from .AIEngine import TelemetryRecorder, TrackingEngine, TrackingConfig, ProcessingState, CursorHandler, run_detection, render_detections, update_tracking, render_tracking, describe_detections, describe_tracking
+from .BatchInference import BatchInferenceService
 from GeoLocate import locate, locate_with_fixed_gimbal
 
 ENGINE = TrackingEngine()
@@ -14,6 +15,16 @@ STATE = ProcessingState()
 CURSOR_HANDLER = CursorHandler()
 TELEMETRY_RECORDER = TelemetryRecorder()
 
+# Every stream's detections go through one batching service; more streams register their own client
+BATCH_INFERENCE = BatchInferenceService(
+    ENGINE.model,
+    conf=TrackingConfig.CONFIDENCE_THRESHOLD,
+    iou=TrackingConfig.MODEL_IOU,
+    device=0 if STATE.gpu_available else 'cpu',
+    half=STATE.gpu_available,
+)
+DETECTOR = BATCH_INFERENCE.client("primary")
+
 # Basic FPS tracking (minimal overhead)
 STATS_WINDOW = 100
 frame_times = deque(maxlen=STATS_WINDOW)
@@ -63,8 +74,8 @@ def print_fps():
 
 print("AI Processor initialized, ready to process frames...")
 
-def process_frame(frame, metadata, cursor_pos=None, click_pos=None):
-    """Process a single frame through the AI pipeline and return the annotated frame"""
+def process_frame(frame, metadata, cursor_pos=None, click_pos=None, track_id=None):
+    """Process a single frame through the AI pipeline and return the annotated frame (frame itself, see render_frame)"""
     try:
         
         frame_start_time = time.time()
@@ -72,56 +83,10 @@ def process_frame(frame, metadata, cursor_pos=None, click_pos=None):
         if frame is None:
             return None
 
-        STATE.increment_frame()
-        
-        cursor_x, cursor_y = cursor_pos if cursor_pos else (0, 0)
-
-        # --- DETECTION MODE or TRACKING MODE ---
-        if not STATE.tracking:
-            # --- DETECTION MODE ---
-            output_frame, _, mode_changed = process_detection_mode(frame, ENGINE.model, STATE, (cursor_x, cursor_y), click_pos)
-        else:
-            # --- TRACKING MODE ---
-            output_frame, tracking_succeeded, mode_changed = process_tracking_mode(frame, STATE)
-            
-            # Geolocation processing - only run every N frames to reduce computational load
-            if tracking_succeeded and STATE.frame_count % 5 == 0:
-                x, y, w, h = STATE.tracked_bbox
-
-                current_alt = metadata["altitude"]
-                current_lat = metadata["latitude"]
-                current_lon = metadata["longitude"]
-                heading = metadata["heading"]
-
-                # Information for fixed gimbal
-                roll = metadata["roll"]
-                pitch = metadata["pitch"]
-                yaw = metadata["yaw"]
-
-                # --- Calculate Target Location ---
-                image_center_x = frame.shape[1] / 2
-                image_center_y = frame.shape[0] / 2
-                
-                bbox_center_x = x + w/2
-                bbox_center_y = y + h/2
-                
-                obj_x_px = bbox_center_x - image_center_x
-                obj_y_px = bbox_center_y - image_center_y
-                
-                # target_lat, target_lon = locate(current_lat, current_lon, current_alt, heading, obj_x_px, obj_y_px) # TODO: Will need this back when we switch to 2D gimbal
-                target_lat, target_lon = locate_with_fixed_gimbal(bbox_center_x, bbox_center_y, current_lat, current_lon, current_alt, roll, pitch, yaw)
-                STATE.last_target_lat = target_lat
-                STATE.last_target_lon = target_lon
-                
-                if TELEMETRY_RECORDER.is_recording: 
-                    metadata['longitude'] = target_lon
-                    metadata['latitude'] = target_lat
-                    TELEMETRY_RECORDER.record_telemetry(metadata)
-
-                print(f"Target Found at relative latitude, longitude: {target_lat}, {target_lon}")
-        
-        # Return annotated frame or original if no annotation
-        display_frame = output_frame if output_frame is not None else frame
+        inference = infer_frame(frame, cursor_pos, metadata, click_pos, track_id)
+        display_frame = render_frame(frame, inference, metadata, cursor_pos)
+        if display_frame is None:
+            display_frame = frame
         
         # Track FPS
         frame_time = (time.time() - frame_start_time) * 1000
@@ -138,4 +103,125 @@ def process_frame(frame, metadata, cursor_pos=None, click_pos=None):
     except Exception as e:
         print(f"\nERROR processing frame: {e}")
         traceback.print_exc()
-        return frame  # Return original frame on error
\ No newline at end of file
+        return frame  # Return original frame on error
+
+
+def infer_frame(frame, cursor_pos=None, metadata=None, click_pos=None, track_id=None):
+    """
+    Inference step of process_frame: YOLO detection, or a tracker update while tracking.
+    Runs in the video pipeline's infer stage, ahead of render_frame for the previous frame.
+    cursor_pos centres the ROI detection crop (full-frame detection if None). metadata
+    gives the motion gate the drone's attitude.
+
+    Tracking is started (click_pos on a detection, or a selected track_id) and ended here,
+    so only the infer stage's thread changes STATE's tracking mode and tracker.
+
+    Returns:
+        Tuple (mode, result)
+        - mode: "detection" or "tracking"
+        - result: Detection results, or (success, bbox, updated) from the tracker
+    """
+    STATE.increment_frame()
+    if not STATE.tracking:
+        results = run_detection(frame, DETECTOR, STATE, cursor_pos, metadata)
+        if click_pos is not None or track_id is not None:
+            render_detections(frame, results, ENGINE.model, STATE, click_pos, click_pos, track_id, draw=False)
+        return "detection", results
+
+    success, bbox, updated = update_tracking(frame, STATE, DETECTOR)
+    if not success and not STATE.reacquisition.searching:
+        print("Lost tracking, resuming detection")
+        STATE.reset_tracking()
+    return "tracking", (success, bbox, updated)
+
+
+def render_frame(frame, inference, metadata, cursor_pos=None, draw=True):
+    """
+    Render step of process_frame: draw the inference results and geolocate the tracked target.
+    Only reads the tracking mode, which infer_frame changes.
+
+    Overlays are drawn into frame itself (a copy if it is read-only), or not at all with
+    draw=False (see describe_frame). Only pass a frame nothing reads unannotated afterwards,
+    such as the pipeline's BGR frame, which is streamed as drawn.
+
+    Returns:
+        The annotated frame, or None if nothing was drawn
+    """
+    mode, result = inference
+    cursor_x, cursor_y = cursor_pos if cursor_pos else (0, 0)
+    output_frame = None
+
+    # Tracking may have started or stopped since this frame was inferred (pipelined), skip its overlay
+    if (mode == "tracking") != STATE.tracking:
+        return None
+
+    # --- DETECTION MODE or TRACKING MODE ---
+    if mode == "detection":
+        # --- DETECTION MODE ---
+        output_frame, _ = render_detections(frame, result, ENGINE.model, STATE, (cursor_x, cursor_y), None, None, draw, inplace=True)
+    else:
+        # --- TRACKING MODE ---
+        if not result[0]:  # Target lost or being searched for: nothing to draw
+            return None
+        output_frame, tracking_succeeded, _ = render_tracking(frame, STATE, *result, draw=draw, inplace=True)
+        
+        # Geolocation processing - only run every N frames to reduce computational load
+        if tracking_succeeded and STATE.frame_count % 5 == 0:
+            x, y, w, h = STATE.tracked_bbox
+
+            current_alt = metadata["altitude"]
+            current_lat = metadata["latitude"]
+            current_lon = metadata["longitude"]
+            heading = metadata["heading"]
+
+            # Information for fixed gimbal
+            roll = metadata["roll"]
+            pitch = metadata["pitch"]
+            yaw = metadata["yaw"]
+
+            # --- Calculate Target Location ---
+            image_center_x = frame.shape[1] / 2
+            image_center_y = frame.shape[0] / 2
+            
+            bbox_center_x = x + w/2
+            bbox_center_y = y + h/2
+            
+            obj_x_px = bbox_center_x - image_center_x
+            obj_y_px = bbox_center_y - image_center_y
+            
+            # target_lat, target_lon = locate(current_lat, current_lon, current_alt, heading, obj_x_px, obj_y_px) # TODO: Will need this back when we switch to 2D gimbal
+            target_lat, target_lon = locate_with_fixed_gimbal(bbox_center_x, bbox_center_y, current_lat, current_lon, current_alt, roll, pitch, yaw)
+            STATE.last_target_lat = target_lat
+            STATE.last_target_lon = target_lon
+            
+            if TELEMETRY_RECORDER.is_recording: 
+                metadata['longitude'] = target_lon
+                metadata['latitude'] = target_lat
+                TELEMETRY_RECORDER.record_telemetry(metadata)
+
+            print(f"Target Found at relative latitude, longitude: {target_lat}, {target_lon}")
+    
+    return output_frame
+
+
+def describe_frame(inference, frame_shape, metadata):
+    """
+    Vector overlay message for a frame, for a frontend that draws the overlays itself.
+    Call after infer_frame so click and tracking state changes are included.
+
+    Returns:
+        Dict with type "overlay", the frame's number and capture timestamp, its size, the
+        mode, every detection and the tracked target
+    """
+    mode, result = inference
+    current = (mode == "tracking") == STATE.tracking  # Mode may have changed since inference
+    return {
+        "type": "overlay",
+        "frame_number": metadata.get("frame_number"),
+        "video_timestamp": metadata.get("video_timestamp"),
+        "width": frame_shape[1],
+        "height": frame_shape[0],
+        "mode": "tracking" if STATE.tracking else "detection",
+        "detections": describe_detections(result, ENGINE.model, STATE) if current and mode == "detection" else [],
+        "tracking": describe_tracking(STATE, ENGINE.model),
+    }
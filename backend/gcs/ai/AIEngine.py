@@ -1,20 +1,29 @@
 import os
+import math
 import time
+import importlib.util
 import cv2
 import numpy as np
 import torch
 from ultralytics import YOLO
+from .MultiObjectTracker import MultiObjectTracker
+from .OverlayRenderer import OverlayRenderer
 
 class CursorHandler:
     """Handles cursor position and click events from user"""
     def __init__(self):
         self.cursor_pos = None  # (x, y) or None
         self.click_pos = None   # (x, y) or None
+        self.selected_track_id = None  # Multi-object track ID picked by the operator, or None
 
     def update_cursor(self, x: int, y: int):
         """Update current cursor position"""
         self.cursor_pos = (x, y)
 
+    def clear_cursor(self):
+        """Cursor left the video: detection goes back to full-frame passes"""
+        self.cursor_pos = None
+
     def register_click(self, x: int, y: int):
         """Register a click event at (x, y)"""
         self.click_pos = (x, y)
@@ -23,11 +32,44 @@ class CursorHandler:
         """Clear the registered click event after processing"""
         self.click_pos = None
 
+    def register_track_selection(self, track_id: int):
+        """Register the operator picking an object by its track ID"""
+        self.selected_track_id = track_id
+
+    def clear_track_selection(self):
+        self.selected_track_id = None
+
 class TrackingConfig:
     """Centralized configuration for all tracking and detection parameters"""
-    # --- Frame Skipping ---
-    DETECTION_FRAME_SKIP = 1  # Skip N frames during detection phase (0=every frame, 1=every 2nd, 2=every 3rd)
-    TRACKER_FRAME_SKIP =   1    # Skip N frames during tracking phase (0=every frame, 1=every 2nd)
+    # --- Adaptive Frame Skipping (FrameScheduler) ---
+    TARGET_FPS = 60               # Output frame rate detection/tracking has to keep up with
+    LATENCY_BUDGET_MS = 100       # Oldest a reused detection/tracker result may get before it is refreshed
+    MAX_DETECTION_SKIP = 5        # Most frames detection results are reused for while the scene is static
+    MAX_TRACKER_SKIP = 3          # Most frames a tracker result is reused for while the target is steady
+    CURSOR_MOVE_PX = 8            # Cursor movement between frames that counts as the operator moving
+    TARGET_MOVE_RATIO = 0.1       # Tracked box movement per update, relative to its size, that counts as shaky tracking
+    BACKOFF_FRAMES = 30           # Static frames before the scheduler skips one more frame
+
+    # --- Motion Gate (reuse detections while the scene is unchanged, e.g. during loiter) ---
+    MOTION_GATE = os.getenv("GCS_MOTION_GATE", "1") == "1"
+    MOTION_GATE_WIDTH = 160          # Frames are compared downsampled to this width
+    MOTION_DIFF_THRESHOLD = 6.0      # Mean grey-level difference (0-255) after motion compensation that counts as a scene change
+    MOTION_MAX_SHIFT_RATIO = 0.1     # Global shift, as a fraction of frame width, beyond which cached boxes are not trusted
+    MOTION_MAX_ANGULAR_RATE = 0.05   # rad/s of roll, pitch or yaw from telemetry that counts as the drone manoeuvring
+    MOTION_MAX_REUSE = 30            # Detection runs in a row the gate may skip before YOLO runs regardless
+
+    # --- Multi-object tracking (persistent IDs for detection-mode boxes, see MultiObjectTracker) ---
+    MULTI_OBJECT_TRACKING = os.getenv("GCS_MULTI_OBJECT_TRACKING", "1") == "1"
+
+    # --- Re-acquisition (detector-assisted tracking) ---
+    REDETECT_INTERVAL = 15           # Tracker updates between drift-correcting detections around the target
+    SEARCH_WINDOW_SCALE = 2.5        # Search window side relative to the larger side of the target box
+    SEARCH_WINDOW_MIN = 160          # Smallest search window side in pixels
+    SEARCH_WINDOW_MAX_GROWTH = 3.0   # Search window size reached at REACQUIRE_TIMEOUT, growing with the time since the target was lost
+    SEARCH_INTERVAL = 4              # Frames between lost-target searches (one YOLO run on the window each)
+    REACQUIRE_TIMEOUT = 2.0          # Seconds to search for a lost target before dropping back to detection
+    REACQUIRE_MIN_SIMILARITY = 0.5   # Colour histogram correlation a detection needs to count as the target
+    DRIFT_CORRECTION_IOU = (0.3, 0.8)  # Re-seat the tracker on a detection overlapping it by this IoU range
     
     # --- Detection Parameters ---
     CONFIDENCE_THRESHOLD = 0.1    # YOLO detection confidence threshold
@@ -35,8 +77,43 @@ class TrackingConfig:
     
     # --- Tracker Configuration ---
     PREFER_GPU_TRACKER = True     # Use VitTrack if available, otherwise use CSRT
-    TRACKER_TYPE = None           # Will be auto-detected: 'vittrack' or 'csrt'
+    TRACKER_TYPE = os.getenv("GCS_TRACKER") or None  # Any of TRACKERS; auto-detected ('vittrack' or 'csrt') if unset
     VITTRACK_MODEL = None          # Path to VitTrack model file
+    NANOTRACK_BACKBONE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "nanotrack_backbone_sim.onnx")
+    NANOTRACK_HEAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "nanotrack_head_sim.onnx")
+
+    # --- Scaled tracking (tracker runs on a downscaled copy of the frame, see ScaledTracker) ---
+    SCALED_TRACKING = os.getenv("GCS_SCALED_TRACKING", "1") == "1"
+    TRACKING_GRAYSCALE = os.getenv("GCS_TRACKING_GRAYSCALE", "0") == "1"  # Also convert to grayscale (CSRT, MOSSE only)
+    TRACKING_TARGET_PX = 64          # Larger side of the target in the tracker's image
+    TRACKING_MIN_SCALE = 0.25        # Smallest downscale factor
+
+    # --- Detector Backend ---
+    DETECTOR_BACKEND = os.getenv("GCS_DETECTOR_BACKEND", "pytorch")  # 'pytorch', 'onnx' (ONNX Runtime) or 'openvino'
+    DETECTOR_INT8 = os.getenv("GCS_DETECTOR_INT8", "0") == "1"        # Load the INT8-quantized export
+
+    # --- ROI Detection (around the operator's cursor) ---
+    ROI_DETECTION = os.getenv("GCS_ROI_DETECTION", "1") == "1"  # Full-res crop around the cursor + cheap low-res full-frame pass
+    ROI_SIZE = 320                # Side of the square crop in frame pixels, inferred at native resolution
+    ROI_FULL_FRAME_IMGSZ = 320    # Inference size of the cheap full-frame pass
+    ROI_FULL_FRAME_INTERVAL = 5   # Run the full-frame pass every N detection runs, reuse its boxes in between
+
+class DetectionBoxes:
+    """Numpy stand-in for ultralytics Boxes (xyxy, conf, cls) used for merged ROI detections"""
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class DetectionResult:
+    """Stand-in for an ultralytics Results object holding only boxes"""
+    def __init__(self, boxes):
+        self.boxes = boxes
+
 
 class TelemetryRecorder:
     def __init__(self):
@@ -68,16 +145,132 @@ class TelemetryRecorder:
         }
         self.recorded_data.append(point)
 
+def _dnn_target():
+    """OpenCV DNN backend and target for the DNN trackers: CUDA if available, else CPU"""
+    if torch.cuda.is_available():
+        return cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA
+    return cv2.dnn.DNN_BACKEND_DEFAULT, cv2.dnn.DNN_TARGET_CPU
+
+
+def _create_vittrack():
+    if not TrackingConfig.VITTRACK_MODEL or not os.path.exists(TrackingConfig.VITTRACK_MODEL):
+        raise RuntimeError(f"VitTrack model not found at {TrackingConfig.VITTRACK_MODEL}")
+    params = cv2.TrackerVit_Params()
+    params.net = TrackingConfig.VITTRACK_MODEL
+    params.backend, params.target = _dnn_target()
+    return cv2.TrackerVit.create(params)
+
+
+def _create_nanotrack():
+    for path in (TrackingConfig.NANOTRACK_BACKBONE, TrackingConfig.NANOTRACK_HEAD):
+        if not os.path.exists(path):
+            raise RuntimeError(f"NanoTrack model not found at {path}")
+    params = cv2.TrackerNano_Params()
+    params.backbone = TrackingConfig.NANOTRACK_BACKBONE
+    params.neckhead = TrackingConfig.NANOTRACK_HEAD
+    params.backend, params.target = _dnn_target()
+    return cv2.TrackerNano.create(params)
+
+
+# Tracker name -> factory returning a new OpenCV tracker (raises if it cannot be created here).
+# Rough CPU cost, slowest first: CSRT, VitTrack/NanoTrack (DNN), KCF, MOSSE. Compare them on
+# recorded footage with utils/benchmark_tracker.py.
+TRACKERS = {
+    "csrt": lambda: cv2.TrackerCSRT.create(),
+    "kcf": lambda: cv2.TrackerKCF.create(),
+    "mosse": lambda: cv2.legacy.TrackerMOSSE_create(),  # opencv-contrib
+    "vittrack": _create_vittrack,
+    "nano": _create_nanotrack,
+}
+
+
+def create_tracker(tracker_type=None):
+    """
+    Create a tracker from TRACKERS, falling back to CSRT if it cannot be created.
+
+    Args:
+        tracker_type: Name in TRACKERS, or None for TrackingConfig.TRACKER_TYPE
+
+    Returns:
+        Tuple (tracker, tracker_type)
+        - tracker_type: Name of the tracker actually created
+    """
+    tracker_type = tracker_type or TrackingConfig.TRACKER_TYPE or "csrt"
+    if tracker_type not in TRACKERS:
+        raise ValueError(f"Unknown tracker '{tracker_type}', expected one of {list(TRACKERS)}")
+    try:
+        return TRACKERS[tracker_type](), tracker_type
+    except Exception as e:
+        if tracker_type == "csrt":
+            raise
+        print(f"{tracker_type} tracker initialization failed: {e}. Falling back to CSRT.")
+        return cv2.TrackerCSRT.create(), "csrt"
+
+
+def tracking_scale(bbox):
+    """Downscale factor bringing the (x, y, w, h) target to about TRACKING_TARGET_PX, between TRACKING_MIN_SCALE and 1"""
+    size = max(bbox[2], bbox[3])
+    if size <= 0:
+        return 1.0
+    return float(min(1.0, max(TrackingConfig.TRACKING_MIN_SCALE, TrackingConfig.TRACKING_TARGET_PX / size)))
+
+
+class ScaledTracker:
+    """
+    Runs a tracker on a downscaled (optionally grayscale) copy of the frame. Boxes are given
+    and returned in full-resolution coordinates. The scale is picked from the target's size
+    when the tracker is initialised: large targets are tracked in a much smaller image, small
+    ones at full resolution.
+    """
+    GRAYSCALE_TRACKERS = ("csrt", "mosse")  # Trackers that accept single-channel frames
+
+    def __init__(self, tracker, grayscale=False):
+        self.tracker = tracker
+        self.grayscale = grayscale
+        self.scale = 1.0
+
+    def _prepare(self, frame):
+        if self.scale < 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def init(self, frame, bbox):
+        self.scale = tracking_scale(bbox)
+        x, y, w, h = (v * self.scale for v in bbox)
+        return self.tracker.init(self._prepare(frame), (int(round(x)), int(round(y)), max(1, int(round(w))), max(1, int(round(h)))))
+
+    def update(self, frame):
+        success, bbox = self.tracker.update(self._prepare(frame))
+        if not success or bbox is None:
+            return success, bbox
+        return success, tuple(int(round(v / self.scale)) for v in bbox)
+
+    def __getattr__(self, name):
+        # getTrackingScore() etc. of the wrapped tracker
+        return getattr(self.tracker, name)
+
+
 def _init_tracker_config():
-    """Initialize tracker type based on GPU availability"""
+    """Initialize tracker type from GCS_TRACKER, or based on GPU availability"""
     base_dir = os.path.dirname(os.path.abspath(__file__))
     vittrack_model_path = os.path.join(base_dir, "models", "object_tracking_vittrack_2023sep.onnx")
     gpu_available = torch.cuda.is_available()
-    
+    if os.path.exists(vittrack_model_path):
+        TrackingConfig.VITTRACK_MODEL = vittrack_model_path
+
+    if TrackingConfig.TRACKER_TYPE is not None:
+        if TrackingConfig.TRACKER_TYPE not in TRACKERS:
+            print(f"⚠ Unknown tracker GCS_TRACKER={TrackingConfig.TRACKER_TYPE}, expected one of {list(TRACKERS)}")
+            TrackingConfig.TRACKER_TYPE = None
+        else:
+            print(f"Using {TrackingConfig.TRACKER_TYPE} tracker (GCS_TRACKER)")
+            return
+
     # Check GPU first, then VitTrack model availability
     if gpu_available and TrackingConfig.PREFER_GPU_TRACKER and os.path.exists(vittrack_model_path):
         TrackingConfig.TRACKER_TYPE = 'vittrack'
-        TrackingConfig.VITTRACK_MODEL = vittrack_model_path
         print(f"✓ GPU available and VitTrack model found. Using VitTrack tracker (GPU-optimized)")
     else:
         if gpu_available and TrackingConfig.PREFER_GPU_TRACKER and not os.path.exists(vittrack_model_path):
@@ -90,6 +283,80 @@ def _init_tracker_config():
 _init_tracker_config()
 
 
+# Backend name -> Python package that runs its exported model
+DETECTOR_RUNTIMES = {
+    "onnx": "onnxruntime",
+    "openvino": "openvino",
+}
+
+
+def detector_export_path(model_path, backend, int8=False):
+    """Path export_detector() writes the backend's model to, next to the .pt file"""
+    stem, _ = os.path.splitext(model_path)
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        return f"{stem}{suffix}.onnx"
+    if backend == "openvino":
+        return f"{stem}{suffix}_openvino_model"
+    raise ValueError(f"Unknown detector backend: {backend}")
+
+
+def resolve_detector_model(model_path, backend, int8=False):
+    """
+    Choose the model file to load for a detector backend. Ultralytics loads the ONNX and
+    OpenVINO exports behind the same predict()/Results interface as the .pt model.
+
+    Returns:
+        Tuple (path, backend)
+        - Falls back to (model_path, 'pytorch') if the backend is unknown, its runtime is
+          not installed or the model has not been exported yet
+    """
+    if backend == "pytorch":
+        return model_path, "pytorch"
+    if backend not in DETECTOR_RUNTIMES:
+        print(f"⚠ Unknown detector backend '{backend}'. Using PyTorch.")
+        return model_path, "pytorch"
+    if importlib.util.find_spec(DETECTOR_RUNTIMES[backend]) is None:
+        print(f"⚠ {DETECTOR_RUNTIMES[backend]} is not installed. Using PyTorch.")
+        return model_path, "pytorch"
+
+    export_path = detector_export_path(model_path, backend, int8)
+    if not os.path.exists(export_path):
+        print(f"⚠ No {backend} export at {export_path} (see utils/benchmark_detector.py --export). Using PyTorch.")
+        return model_path, "pytorch"
+    return export_path, backend
+
+
+def export_detector(model_path, backend, int8=False, imgsz=640, data=None):
+    """
+    Export a .pt model for a CPU backend with a dynamic batch size (for BatchInferenceService).
+
+    INT8: OpenVINO uses Ultralytics' NNCF post-training quantization (calibrated on data),
+    ONNX uses ONNX Runtime dynamic weight quantization.
+
+    Returns:
+        Path of the exported model (see detector_export_path)
+    """
+    target = detector_export_path(model_path, backend, int8)
+    model = YOLO(model_path)
+    if backend == "onnx":
+        exported = model.export(format="onnx", dynamic=True, imgsz=imgsz)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+        elif os.path.abspath(exported) != os.path.abspath(target):
+            os.replace(exported, target)
+    else:
+        export_args = {"format": "openvino", "dynamic": True, "int8": int8, "imgsz": imgsz}
+        if data is not None:
+            export_args["data"] = data
+        exported = model.export(**export_args)
+        if os.path.abspath(exported.rstrip(os.sep)) != os.path.abspath(target):
+            os.replace(exported, target)
+    print(f"Exported {backend}{' INT8' if int8 else ''} detector to {target}")
+    return target
+
+
 class TrackingEngine:
     def __init__(self):
         model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'yolo26n.pt')
@@ -99,8 +366,13 @@ class TrackingEngine:
         else:
             print(f"Loading model from: {model_path}")
 
+        # ONNX Runtime / OpenVINO export if configured and available, else the .pt model
+        model_path, self.detector_backend = resolve_detector_model(model_path, TrackingConfig.DETECTOR_BACKEND, TrackingConfig.DETECTOR_INT8)
+        if self.detector_backend != "pytorch":
+            print(f"Using {self.detector_backend} detector backend: {model_path}")
+
         # Public attributes for high-performance direct access (hot path)
-        self.model = YOLO(model_path)
+        self.model = YOLO(model_path, task="detect")
         self.tracker = None  # Created on-demand in start_tracking()
         self.tracker_type = TrackingConfig.TRACKER_TYPE
         
@@ -119,27 +391,17 @@ class TrackingEngine:
     def _load_vittrack(self):
         """Initialize VitTrack tracker with GPU acceleration if available"""
         try:
-            params = cv2.TrackerVit_Params()
-            params.net = TrackingConfig.VITTRACK_MODEL
-            
-            # GPU acceleration via OpenCV DNN if available
-            if torch.cuda.is_available():
-                params.backend = cv2.dnn.DNN_BACKEND_CUDA
-                params.target = cv2.dnn.DNN_TARGET_CUDA
-                print("VitTrack: Using CUDA acceleration")
-            else:
-                params.backend = cv2.dnn.DNN_BACKEND_DEFAULT
-                params.target = cv2.dnn.DNN_TARGET_CPU
-            
-            return cv2.TrackerVit.create(params)
+            return _create_vittrack()
         except Exception as e:
             print(f"VitTrack initialization failed: {e}. Falling back to CSRT.")
             return None
 
     def start_tracking(self, frame, bbox, class_id):
-        """Initialize tracker (VitTrack if available, else CSRT)"""
+        """Initialize the configured tracker (see TRACKERS), falling back to CSRT"""
         if self.tracker_type == 'vittrack':
             self.tracker = self._load_vittrack()
+        elif self.tracker_type is not None and self.tracker_type != 'csrt':
+            self.tracker, self.tracker_type = create_tracker(self.tracker_type)
         
         # Fall back to CSRT if VitTrack failed or not available
         if self.tracker is None:
@@ -157,17 +419,309 @@ class TrackingEngine:
 # SHARED RENDERING AND INTERACTION LOGIC
 # ============================================================================
 
+class MotionGate:
+    """
+    Cheap scene-change check that lets detection reuse its last results while the drone hovers.
+
+    The frame is compared with the one YOLO last ran on, downsampled to grey. The global
+    shift between them is estimated with phase correlation, and what differs after
+    compensating for it counts as scene change. Telemetry attitude rates and cursor movement
+    also count as change. While nothing has changed, the cached boxes are shifted by the
+    estimated motion instead of running the model.
+    """
+    def __init__(self):
+        self.reference = None          # Downsampled grey frame detection last ran on
+        self.reference_cursor = None
+        self.scale = 1.0               # Frame pixels per downsampled pixel
+        self.shift = (0.0, 0.0)        # Estimated motion since the reference, in frame pixels
+        self.reused = 0
+        self.skipped_total = 0
+        self._last_attitude = None     # (time, roll, pitch, yaw)
+
+    def _downsample(self, frame):
+        scale = frame.shape[1] / TrackingConfig.MOTION_GATE_WIDTH
+        height = max(1, int(round(frame.shape[0] / scale)))
+        small = cv2.resize(frame, (TrackingConfig.MOTION_GATE_WIDTH, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.float32), scale
+
+    def _manoeuvring(self, metadata):
+        """True if telemetry reports the drone rotating faster than MOTION_MAX_ANGULAR_RATE"""
+        if not metadata:
+            return False
+        timestamp = metadata.get("video_timestamp") or metadata.get("last_time")
+        attitude = (metadata.get("roll"), metadata.get("pitch"), metadata.get("yaw"))
+        if timestamp is None or timestamp <= 0 or any(angle is None for angle in attitude):
+            return False
+
+        previous, self._last_attitude = self._last_attitude, (timestamp, *attitude)
+        if previous is None or timestamp <= previous[0]:
+            return False
+        dt = timestamp - previous[0]
+        for angle, previous_angle in zip(attitude, previous[1:]):
+            delta = (angle - previous_angle + math.pi) % (2 * math.pi) - math.pi  # Wrap yaw around +-pi
+            if abs(delta) / dt > TrackingConfig.MOTION_MAX_ANGULAR_RATE:
+                return True
+        return False
+
+    def unchanged(self, frame, metadata=None, cursor_pos=None):
+        """
+        Returns True if the last detection results can be reused for this frame (see shift
+        for how far to move them), False if YOLO should run.
+        """
+        manoeuvring = self._manoeuvring(metadata)
+        if self.reference is None or manoeuvring or self.reused >= TrackingConfig.MOTION_MAX_REUSE:
+            return False
+        if cursor_pos is not None and self.reference_cursor is not None:
+            if math.hypot(cursor_pos[0] - self.reference_cursor[0], cursor_pos[1] - self.reference_cursor[1]) >= TrackingConfig.CURSOR_MOVE_PX:
+                return False
+
+        small, _ = self._downsample(frame)
+        if small.shape != self.reference.shape:
+            return False
+
+        (dx, dy), _ = cv2.phaseCorrelate(self.reference, small)
+        if math.hypot(dx, dy) > TrackingConfig.MOTION_MAX_SHIFT_RATIO * small.shape[1]:
+            return False
+
+        # Difference left after moving the reference by the global shift, ignoring the uncovered border
+        compensated = cv2.warpAffine(self.reference, np.float32([[1, 0, dx], [0, 1, dy]]), (small.shape[1], small.shape[0]))
+        margin_x, margin_y = int(math.ceil(abs(dx))) + 1, int(math.ceil(abs(dy))) + 1
+        residual = cv2.absdiff(compensated, small)[margin_y:-margin_y, margin_x:-margin_x]
+        if residual.size == 0 or float(residual.mean()) > TrackingConfig.MOTION_DIFF_THRESHOLD:
+            return False
+
+        self.shift = (dx * self.scale, dy * self.scale)
+        self.reused += 1
+        self.skipped_total += 1
+        return True
+
+    def set_reference(self, frame, cursor_pos=None):
+        """Call after YOLO ran on frame."""
+        self.reference, self.scale = self._downsample(frame)
+        self.reference_cursor = cursor_pos
+        self.shift = (0.0, 0.0)
+        self.reused = 0
+
+
+def shift_detections(results, shift):
+    """
+    Returns results with every box moved by shift (dx, dy), as a list with one DetectionResult.
+    """
+    xyxy, conf, cls = _boxes_to_numpy(results[0].boxes)
+    dx, dy = shift
+    return [DetectionResult(DetectionBoxes(xyxy + np.array([dx, dy, dx, dy], dtype=np.float32), conf, cls))]
+
+
+def appearance_histogram(frame, bbox):
+    """Normalised hue/saturation histogram of the (x, y, w, h) patch, or None if it is empty"""
+    x, y, w, h = (int(v) for v in bbox)
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(frame.shape[1], x + w), min(frame.shape[0], y + h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    hsv = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
+    return cv2.normalize(histogram, histogram).flatten()
+
+
+def bbox_iou(a, b):
+    """IoU of two (x, y, w, h) boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class TargetReacquisition:
+    """
+    Keeps tracking mode alive with local detections. Every REDETECT_INTERVAL tracker updates,
+    YOLO runs on a window around the target and re-seats a drifting tracker. When the tracker
+    loses the target, a window around its last position, growing with the time since, is
+    searched every SEARCH_INTERVAL frames for a detection of the same class and appearance
+    for up to REACQUIRE_TIMEOUT before giving up.
+    """
+    def __init__(self):
+        self.corrections = 0
+        self.recoveries = 0
+        self.reset()
+
+    def reset(self):
+        self.histogram = None
+        self.last_good_bbox = None
+        self.updates_since_redetect = 0
+        self.searching = False
+        self.search_attempts = 0
+        self.frames_since_search = 0
+        self.lost_at = None
+
+    def start(self, frame, bbox):
+        self.reset()
+        self.histogram = appearance_histogram(frame, bbox)
+        self.last_good_bbox = tuple(int(v) for v in bbox)
+
+    def begin_search(self):
+        self.searching = True
+        self.search_attempts = 0
+        self.frames_since_search = 0
+        self.lost_at = time.time()
+
+    def search_window(self, frame_shape, growth=1.0):
+        """Square (x1, y1, x2, y2) window around the last known target position"""
+        x, y, w, h = self.last_good_bbox
+        side = max(TrackingConfig.SEARCH_WINDOW_MIN, max(w, h) * TrackingConfig.SEARCH_WINDOW_SCALE) * growth
+        return roi_bounds(frame_shape, (x + w / 2, y + h / 2), int(side))
+
+    def find_target(self, frame, model, state, window):
+        """
+        Run YOLO on the window and pick the detection most likely to be the target.
+
+        Returns:
+            Tuple (bbox, similarity) with bbox as (x, y, w, h) in frame coordinates, or None
+        """
+        x1, y1, x2, y2 = window
+        crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        detections = model.predict(crop, imgsz=TrackingConfig.ROI_SIZE, **_predict_args(state))[0]
+        xyxy, _, classes = _boxes_to_numpy(detections.boxes)
+
+        best = None
+        for box, class_id in zip(xyxy, classes):
+            if int(class_id) != state.tracked_class:
+                continue
+            bbox = (int(box[0]) + x1, int(box[1]) + y1, int(box[2] - box[0]), int(box[3] - box[1]))
+            histogram = appearance_histogram(frame, bbox)
+            if histogram is None:
+                continue
+            similarity = 1.0 if self.histogram is None else cv2.compareHist(self.histogram, histogram, cv2.HISTCMP_CORREL)
+            if similarity >= TrackingConfig.REACQUIRE_MIN_SIMILARITY and (best is None or similarity > best[1]):
+                best = (bbox, similarity)
+        return best
+
+    def stats(self):
+        return {"searching": self.searching, "corrections": self.corrections, "recoveries": self.recoveries}
+
+
+class FrameScheduler:
+    """
+    Chooses on which frames detection and tracker updates run, from their measured cost.
+
+    The skip has a floor and a ceiling. The floor is the smallest skip that lets the measured
+    inference time fit into the TARGET_FPS frame budget on average. The ceiling keeps reused
+    results younger than LATENCY_BUDGET_MS. The scheduler stays at the floor while the cursor
+    moves or tracking gets shaky, and backs off one frame per BACKOFF_FRAMES static frames.
+    """
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, target_fps=TrackingConfig.TARGET_FPS, latency_budget_ms=TrackingConfig.LATENCY_BUDGET_MS,
+                 max_detection_skip=TrackingConfig.MAX_DETECTION_SKIP, max_tracker_skip=TrackingConfig.MAX_TRACKER_SKIP):
+        self.frame_interval_ms = 1000.0 / target_fps
+        self.latency_budget_ms = latency_budget_ms
+        self.max_detection_skip = max_detection_skip
+        self.max_tracker_skip = max_tracker_skip
+
+        self.detection_ms = None  # Smoothed cost of one detection run
+        self.tracking_ms = None   # Smoothed cost of one tracker update
+        self.detection_skip = 0
+        self.tracker_skip = 0
+        self.static_frames = 0    # Frames since the cursor or target last moved
+        self._frames_since_detection = None
+        self._frames_since_tracking = None
+        self._last_cursor = None
+        self._last_score = None
+
+    def _choose_skip(self, cost_ms, max_skip):
+        if cost_ms is None:
+            return 0
+        cost_floor = max(0, math.ceil(cost_ms / self.frame_interval_ms) - 1)
+        latency_ceiling = max(0, int((self.latency_budget_ms - cost_ms) // self.frame_interval_ms))
+        ceiling = max(cost_floor, min(max_skip, latency_ceiling))
+        return min(ceiling, cost_floor + self.static_frames // TrackingConfig.BACKOFF_FRAMES)
+
+    def _smooth(self, average, sample):
+        return sample if average is None else average + self.EWMA_ALPHA * (sample - average)
+
+    def _activity(self):
+        self.static_frames = 0
+
+    def restart(self):
+        """Run on the next frame (mode change or new target)."""
+        self._frames_since_detection = None
+        self._frames_since_tracking = None
+        self._last_score = None
+        self._activity()
+
+    def update_cursor(self, cursor_pos):
+        """Note the cursor position for this frame; movement keeps detection at full cadence."""
+        if cursor_pos is not None and self._last_cursor is not None:
+            if math.hypot(cursor_pos[0] - self._last_cursor[0], cursor_pos[1] - self._last_cursor[1]) >= TrackingConfig.CURSOR_MOVE_PX:
+                self._activity()
+        self._last_cursor = cursor_pos
+
+    def should_detect(self):
+        """Call once per frame in detection mode. Returns True if detection should run."""
+        self.static_frames += 1
+        self.detection_skip = self._choose_skip(self.detection_ms, self.max_detection_skip)
+        if self._frames_since_detection is None or self._frames_since_detection >= self.detection_skip:
+            self._frames_since_detection = 0
+            return True
+        self._frames_since_detection += 1
+        return False
+
+    def should_track(self):
+        """Call once per frame in tracking mode. Returns True if the tracker should update."""
+        self.static_frames += 1
+        self.tracker_skip = self._choose_skip(self.tracking_ms, self.max_tracker_skip)
+        if self._frames_since_tracking is None or self._frames_since_tracking >= self.tracker_skip:
+            self._frames_since_tracking = 0
+            return True
+        self._frames_since_tracking += 1
+        return False
+
+    def record_detection(self, elapsed_ms):
+        self.detection_ms = self._smooth(self.detection_ms, elapsed_ms)
+
+    def record_tracking(self, elapsed_ms, success, previous_bbox, bbox, score=None):
+        """
+        Record a tracker update. A lost target, a falling tracker score or a target moving fast
+        relative to its size all count as activity and bring the cadence back up.
+        """
+        self.tracking_ms = self._smooth(self.tracking_ms, elapsed_ms)
+        if not success or bbox is None:
+            self._activity()
+            return
+        if score is not None:
+            if self._last_score is not None and score < self._last_score * 0.9:
+                self._activity()
+            self._last_score = score
+        if previous_bbox is not None:
+            moved = math.hypot(bbox[0] - previous_bbox[0], bbox[1] - previous_bbox[1])
+            size = max(1.0, min(bbox[2], bbox[3]))
+            if moved / size >= TrackingConfig.TARGET_MOVE_RATIO:
+                self._activity()
+
+    def stats(self):
+        return {
+            "detection_ms": self.detection_ms,
+            "tracking_ms": self.tracking_ms,
+            "detection_skip": self.detection_skip,
+            "tracker_skip": self.tracker_skip,
+            "static_frames": self.static_frames,
+        }
+
+
 class ProcessingState:
     """Manages state for detection/tracking processing"""
     def __init__(self):
         self.tracking = False
         self.tracker = None
+        self.tracker_type = None
         self.tracked_class = None
         self.tracked_bbox = None
         self.frame_count = 0
         self.last_detection_results = None
         self.last_tracker_bbox = None
-        self.last_rendered_tracking_frame = None  # Cache rendered tracking frame
         self.target_latitude = None
         self.target_longitude = None
         
@@ -175,6 +729,20 @@ class ProcessingState:
         self.last_target_lat = None
         self.last_target_lon = None
 
+        # Detection/tracker cadence
+        self.scheduler = FrameScheduler()
+        self.motion_gate = MotionGate()
+        self.reacquisition = TargetReacquisition()
+
+        # Persistent IDs for detections
+        self.object_tracker = MultiObjectTracker()
+        self.detection_track_ids = (None, None)  # (results, track ID per box) from the latest detection run
+
+        # ROI detection
+        self.roi_runs = 0
+        self.roi_full_frame_boxes = None  # (xyxy, conf, cls) from the last low-res full-frame pass
+        self.last_roi = None              # (x1, y1, x2, y2) of the last crop
+
         # GPU optimization
         self.gpu_available = torch.cuda.is_available()
         
@@ -204,25 +772,38 @@ class ProcessingState:
         self.tracked_class = None
         self.tracked_bbox = None
         self.last_tracker_bbox = None
-        self.last_rendered_tracking_frame = None
         self.target_latitude = None
         self.target_longitude = None
+        self.scheduler.restart()
+        self.reacquisition.reset()
     
+    def _create_tracker(self):
+        tracker, self.tracker_type = create_tracker(TrackingConfig.TRACKER_TYPE)
+        if TrackingConfig.SCALED_TRACKING:
+            grayscale = TrackingConfig.TRACKING_GRAYSCALE and self.tracker_type in ScaledTracker.GRAYSCALE_TRACKERS
+            tracker = ScaledTracker(tracker, grayscale)
+        return tracker
+
     def start_tracking(self, frame, bbox, class_id):
         """Initialize tracking from a detection"""
-        if TrackingConfig.TRACKER_TYPE == 'dasiamrpn':
-            # For DaSiamRPN - would need full implementation
-            # For now, fall back to CSRT in ProcessingState
-            self.tracker = cv2.TrackerCSRT.create()
-        else:
-            self.tracker = cv2.TrackerCSRT.create()
-        
-        self.tracker.init(frame, bbox)
+        tracker = self._create_tracker()
+        tracker.init(frame, bbox)
         self.tracked_class = class_id
         self.tracked_bbox = bbox
+        self.reacquisition.start(frame, bbox)
+        self.tracker = tracker
         self.tracking = True
         self.last_tracker_bbox = (True, bbox)
-        print(f"Started tracking object, class {self.tracked_class}")
+        self.scheduler.restart()
+        print(f"Started tracking object, class {self.tracked_class}, with {self.tracker_type} tracker")
+
+    def reseat_tracker(self, frame, bbox):
+        """Restart the tracker on a re-detected box, keeping the target's class and appearance"""
+        tracker = self._create_tracker()
+        tracker.init(frame, bbox)
+        self.tracker = tracker
+        self.last_tracker_bbox = (True, bbox)
+        self.reacquisition.last_good_bbox = tuple(int(v) for v in bbox)
     
     def increment_frame(self):
         """Increment frame counter"""
@@ -246,11 +827,26 @@ def process_detection_mode(frame, model, state, cursor_pos, click_pos):
         - detection_results: Latest detection results
         - mode_changed: True if mode switched to tracking
     """
-    output_frame = None
-    mode_changed = False
-    
+    results = run_detection(frame, model, state, cursor_pos)
+    output_frame, mode_changed = render_detections(frame, results, model, state, cursor_pos, click_pos)
+    return output_frame, results, mode_changed
+
+
+def run_detection(frame, model, state, cursor_pos=None, metadata=None):
+    """
+    Inference half of process_detection_mode: run YOLO on the frame, or reuse the last
+    results on frames the FrameScheduler skips. With MOTION_GATE, results are also reused
+    (shifted by the estimated camera motion) while the MotionGate sees no scene change.
+
+    With ROI_DETECTION and a cursor position, only a crop around the cursor is inferred at
+    full resolution (see detect_roi).
+
+    Returns:
+        Detection results (None if detection has not run yet)
+    """
     # Determine if we should run detection this frame
-    should_detect = (state.frame_count % (TrackingConfig.DETECTION_FRAME_SKIP + 1)) == 0
+    state.scheduler.update_cursor(cursor_pos)
+    should_detect = state.scheduler.should_detect()
     
     # Reset timings for this frame
     state.profile_inference_ms = 0.0
@@ -259,6 +855,12 @@ def process_detection_mode(frame, model, state, cursor_pos, click_pos):
     state.profile_frame_prep_ms = 0.0
     state.profile_results_process_ms = 0.0
     state.detection_ran_this_frame = False
+
+    if should_detect and TrackingConfig.MOTION_GATE and state.last_detection_results is not None:
+        if state.motion_gate.unchanged(frame, metadata, cursor_pos):
+            results = shift_detections(state.last_detection_results, state.motion_gate.shift)
+            update_object_tracks(results, state)
+            return results
     
     if should_detect:
         state.detection_ran_this_frame = True
@@ -284,22 +886,137 @@ def process_detection_mode(frame, model, state, cursor_pos, click_pos):
         # YOLO handles frame format conversion internally, optimized for numpy HWC format
         # Use device=0 to keep operations on GPU, half=True for fp16 memory efficiency
         t_model_start = time.time()
-        results = model.predict(frame, conf=TrackingConfig.CONFIDENCE_THRESHOLD,
-                               iou=TrackingConfig.MODEL_IOU, 
-                               device=0 if state.gpu_available else 'cpu',
-                               half=state.gpu_available, 
-                               verbose=False)
+        predict_args = _predict_args(state)
+        if TrackingConfig.ROI_DETECTION and cursor_pos is not None:
+            results = detect_roi(frame, model, state, cursor_pos, predict_args)
+        else:
+            results = model.predict(frame, **predict_args)
         state.profile_model_predict_ms = (time.time() - t_model_start) * 1000
+        state.scheduler.record_detection(state.profile_model_predict_ms)
         
         state.last_detection_results = results
         state.profile_inference_ms = state.profile_model_predict_ms
+        update_object_tracks(results, state)
+        if TrackingConfig.MOTION_GATE:
+            state.motion_gate.set_reference(frame, cursor_pos)
         
         # Periodic GPU memory optimization
         if state.gpu_available and state.frame_count % 100 == 0:
             torch.cuda.empty_cache()
     else:
         results = state.last_detection_results
-    
+    return results
+
+
+def update_object_tracks(results, state):
+    """Feed a detection run to the multi-object tracker and keep the track ID of every box"""
+    if not TrackingConfig.MULTI_OBJECT_TRACKING:
+        return
+    xyxy, conf, classes = _boxes_to_numpy(results[0].boxes)
+    track_ids = state.object_tracker.update(xyxy, conf, classes, state.frame_count)
+    state.detection_track_ids = (results, track_ids)
+
+
+def _predict_args(state):
+    return {
+        "conf": TrackingConfig.CONFIDENCE_THRESHOLD,
+        "iou": TrackingConfig.MODEL_IOU,
+        "device": 0 if state.gpu_available else 'cpu',
+        "half": state.gpu_available,
+        "verbose": False,
+    }
+
+
+def roi_bounds(frame_shape, center, size):
+    """
+    Square crop of side size centred on center, shifted to stay inside the frame.
+
+    Returns:
+        Tuple (x1, y1, x2, y2)
+    """
+    height, width = frame_shape[:2]
+    roi_w, roi_h = min(size, width), min(size, height)
+    x1 = int(min(max(center[0] - roi_w // 2, 0), width - roi_w))
+    y1 = int(min(max(center[1] - roi_h // 2, 0), height - roi_h))
+    return x1, y1, x1 + roi_w, y1 + roi_h
+
+
+def _boxes_to_numpy(boxes):
+    """Returns (xyxy float32, conf, cls) numpy arrays from ultralytics Boxes"""
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    def to_numpy(values):
+        if hasattr(values, 'cpu'):
+            values = values.cpu()
+        return np.asarray(values.numpy() if hasattr(values, 'numpy') else values, dtype=np.float32)
+    return to_numpy(boxes.xyxy).reshape(-1, 4), to_numpy(boxes.conf), to_numpy(boxes.cls)
+
+
+def detect_roi(frame, model, state, cursor_pos, predict_args):
+    """
+    ROI detection: YOLO on a full-resolution crop around the cursor every run, plus a cheap
+    low-resolution full-frame pass every ROI_FULL_FRAME_INTERVAL runs for everything else.
+
+    Returns:
+        List with one DetectionResult in frame coordinates, like model.predict()
+    """
+    if state.roi_full_frame_boxes is None or state.roi_runs % TrackingConfig.ROI_FULL_FRAME_INTERVAL == 0:
+        full_frame = model.predict(frame, imgsz=TrackingConfig.ROI_FULL_FRAME_IMGSZ, **predict_args)[0]
+        state.roi_full_frame_boxes = _boxes_to_numpy(full_frame.boxes)
+    state.roi_runs += 1
+
+    x1, y1, x2, y2 = roi_bounds(frame.shape, cursor_pos, TrackingConfig.ROI_SIZE)
+    crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+    roi_xyxy, roi_conf, roi_cls = _boxes_to_numpy(model.predict(crop, imgsz=TrackingConfig.ROI_SIZE, **predict_args)[0].boxes)
+    roi_xyxy = roi_xyxy + np.array([x1, y1, x1, y1], dtype=np.float32)  # Back to frame coordinates
+    state.last_roi = (x1, y1, x2, y2)
+
+    # The crop replaces the full-frame boxes centred inside it
+    full_xyxy, full_conf, full_cls = state.roi_full_frame_boxes
+    center_x = (full_xyxy[:, 0] + full_xyxy[:, 2]) / 2
+    center_y = (full_xyxy[:, 1] + full_xyxy[:, 3]) / 2
+    outside = ~((center_x >= x1) & (center_x < x2) & (center_y >= y1) & (center_y < y2))
+
+    boxes = DetectionBoxes(
+        np.concatenate([roi_xyxy, full_xyxy[outside]]),
+        np.concatenate([roi_conf, full_conf[outside]]),
+        np.concatenate([roi_cls, full_cls[outside]]),
+    )
+    return [DetectionResult(boxes)]
+
+
+def render_detections(frame, results, model, state, cursor_pos, click_pos, track_id=None, draw=True, inplace=False):
+    """
+    Drawing half of process_detection_mode: hover highlight and click-to-track. Overlays are
+    drawn into a copy of frame.
+
+    Args:
+        track_id: ID of a multi-object track the operator selected, tracked instead of a click
+        draw: False to only handle clicks, for clients that draw the overlays (describe_detections)
+        inplace: Draw into frame itself (unless it is read-only, e.g. a receiver ring slot), for
+            callers that own frame and do not use it unannotated afterwards (render_frame)
+
+    Returns:
+        Tuple (output_frame, mode_changed)
+        - output_frame: Annotated frame or None if unchanged
+        - mode_changed: True if mode switched to tracking
+    """
+    output_frame = None
+    mode_changed = False
+
+    if track_id is not None:
+        track = state.object_tracker.get(track_id)
+        if track is None:
+            print(f"No object with ID {track_id} to track")
+        else:
+            height, width = frame.shape[:2]
+            x1, y1, x2, y2 = track.xyxy
+            x1, y1 = int(max(0, x1)), int(max(0, y1))
+            x2, y2 = int(min(width, x2)), int(min(height, y2))
+            if x2 > x1 and y2 > y1:
+                state.start_tracking(frame, (x1, y1, x2 - x1, y2 - y1), track.class_id)
+                return output_frame, True
+
     # Process bounding boxes - convert GPU tensors to numpy only when needed
     if results is not None and results[0].boxes is not None and len(results[0].boxes) > 0:
         t_boxes_start = time.time()
@@ -323,47 +1040,92 @@ def process_detection_mode(frame, model, state, cursor_pos, click_pos):
             classes = np.array(cls_vals)
             
         state.profile_boxes_ms = (time.time() - t_boxes_start) * 1000
+
+        tracked_results, track_ids = state.detection_track_ids
+        if tracked_results is not results or len(track_ids) != len(boxes):
+            track_ids = None
         
         cursor_x, cursor_y = cursor_pos if cursor_pos else (0, 0)
         
-        # Draw all detections
+        # Queue the annotations of all detections, then draw them in one pass
         t_drawing_start = time.time()
+        overlay = OverlayRenderer()
         for i, box in enumerate(boxes):
             x1, y1, x2, y2 = box
             
             # Hover effect
             if x1 <= cursor_x <= x2 and y1 <= cursor_y <= y2:
-                if output_frame is None:
-                    output_frame = frame.copy()
-                
-                # Draw outline + fill for hovered box
-                cv2.rectangle(output_frame, (x1, y1), (x2, y2), (0, 200, 0), 2)
-                overlay = output_frame.copy()
-                cv2.rectangle(overlay, (x1, y1), (x2, y2), (0, 255, 0), -1)
-                output_frame = cv2.addWeighted(overlay, 0.3, output_frame, 0.7, 0)
+                # Outline + fill for hovered box
+                overlay.fill((x1, y1, x2, y2), (0, 255, 0), 0.3)
+                overlay.outline((x1, y1, x2, y2), (0, 200, 0), 2)
                 
                 class_id = int(classes[i])
                 class_name = model.names[class_id]
-                cv2.putText(output_frame, class_name, (x1, y1 - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                if track_ids is not None and track_ids[i] >= 0:
+                    class_name = f"{class_name} #{track_ids[i]}"
+                overlay.label(class_name, (x1, y1 - 10), (0, 255, 0))
                 
-                # Click = start tracking
+                # Click = start tracking (on the frame before anything is drawn on it)
                 if click_pos is not None:
                     state.start_tracking(frame, (x1, y1, x2 - x1, y2 - y1), class_id)
                     mode_changed = True
                     break
+        if overlay and draw:
+            output_frame = overlay.render(frame, copy=not (inplace and frame.flags.writeable))
         state.profile_drawing_ms = (time.time() - t_drawing_start) * 1000
     
-    return output_frame, results, mode_changed
+    return output_frame, mode_changed
+
+
+def describe_detections(results, model, state):
+    """
+    Vector form of the detections, for clients that draw the overlays themselves.
+
+    Returns:
+        List of dicts with bbox [x1, y1, x2, y2], class name, confidence and track_id (None if unconfirmed)
+    """
+    if results is None:
+        return []
+    xyxy, conf, classes = _boxes_to_numpy(results[0].boxes)
+    tracked_results, track_ids = state.detection_track_ids
+    if tracked_results is not results or len(track_ids) != len(xyxy):
+        track_ids = None
+    return [
+        {
+            "bbox": [int(v) for v in xyxy[i]],
+            "class": model.names[int(classes[i])],
+            "confidence": round(float(conf[i]), 3),
+            "track_id": int(track_ids[i]) if track_ids is not None and track_ids[i] >= 0 else None,
+        }
+        for i in range(len(xyxy))
+    ]
 
 
-def process_tracking_mode(frame, state):
+def describe_tracking(state, model):
+    """
+    Vector form of the tracked target, for clients that draw the overlays themselves.
+
+    Returns:
+        Dict with bbox [x1, y1, x2, y2], class name and whether the target is being searched for, or None
+    """
+    if not state.tracking or state.tracked_bbox is None:
+        return None
+    x, y, w, h = state.tracked_bbox
+    return {
+        "bbox": [int(x), int(y), int(x + w), int(y + h)],
+        "class": model.names[state.tracked_class] if state.tracked_class is not None else None,
+        "searching": state.reacquisition.searching,
+    }
+
+
+def process_tracking_mode(frame, state, model=None):
     """
     Process frame in tracking mode.
     
     Args:
         frame: Input frame
         state: ProcessingState object
+        model: YOLO model for drift correction and re-acquisition, or None to rely on the tracker alone
     
     Returns:
         Tuple (output_frame, tracking_succeeded, mode_changed)
@@ -371,37 +1133,133 @@ def process_tracking_mode(frame, state):
         - tracking_succeeded: True if tracking succeeded
         - mode_changed: True if mode switched back to detection
     """
-    output_frame = None
-    mode_changed = False
-    
-    # Determine if we should update tracker this frame
-    should_track = (state.frame_count % (TrackingConfig.TRACKER_FRAME_SKIP + 1)) == 0
-    if should_track:
-        success, bbox = state.tracker.update(frame)
+    success, bbox, should_track = update_tracking(frame, state, model)
+    return render_tracking(frame, state, success, bbox, should_track)
+
+
+def update_tracking(frame, state, model=None):
+    """
+    Tracker half of process_tracking_mode: update the tracker, or reuse its last result on
+    frames the FrameScheduler skips. With a model, the tracker is periodically corrected by a
+    detection around the target, and a lost target is searched for before tracking ends.
+
+    Returns:
+        Tuple (success, bbox, updated)
+        - updated: True if the tracker ran on this frame
+    """
+    reacquisition = state.reacquisition
+    if reacquisition.searching and model is not None:
+        return search_lost_target(frame, model, state)
+
+    should_track = state.scheduler.should_track()
+    tracker = state.tracker  # reset_tracking() may clear it from another thread
+    if should_track and tracker is not None:
+        previous_bbox = state.last_tracker_bbox[1] if state.last_tracker_bbox else None
+        t_track_start = time.time()
+        success, bbox = tracker.update(frame)
+        score = tracker.getTrackingScore() if hasattr(tracker, 'getTrackingScore') else None
+        state.scheduler.record_tracking((time.time() - t_track_start) * 1000, success, previous_bbox, bbox, score)
         state.last_tracker_bbox = (success, bbox)
+
+        if model is not None and reacquisition.last_good_bbox is not None:
+            if success:
+                reacquisition.last_good_bbox = tuple(int(v) for v in bbox)
+                reacquisition.updates_since_redetect += 1
+                if reacquisition.updates_since_redetect >= TrackingConfig.REDETECT_INTERVAL:
+                    bbox = correct_tracker_drift(frame, model, state, bbox)
+            else:
+                print("Lost tracking, searching for target")
+                reacquisition.begin_search()
+                return search_lost_target(frame, model, state)
     else:
         success, bbox = state.last_tracker_bbox if state.last_tracker_bbox else (False, None)
-    
+    return success, bbox, should_track
+
+
+def correct_tracker_drift(frame, model, state, bbox):
+    """
+    Detect around the tracked box and re-seat the tracker on the matching detection if the
+    tracker has drifted from it.
+
+    Returns:
+        The box to report for this frame
+    """
+    reacquisition = state.reacquisition
+    reacquisition.updates_since_redetect = 0
+    window = reacquisition.search_window(frame.shape)
+    match = reacquisition.find_target(frame, model, state, window)
+    if match is None:
+        return bbox
+
+    detected_bbox = match[0]
+    min_iou, max_iou = TrackingConfig.DRIFT_CORRECTION_IOU
+    if min_iou <= bbox_iou(bbox, detected_bbox) < max_iou:
+        state.reseat_tracker(frame, detected_bbox)
+        reacquisition.corrections += 1
+        return detected_bbox
+    return bbox
+
+
+def search_lost_target(frame, model, state):
+    """
+    One frame of the re-acquisition search. Every SEARCH_INTERVAL frames, detect in a window
+    around the last known position that grows with the time since the target was lost, up to
+    SEARCH_WINDOW_MAX_GROWTH at REACQUIRE_TIMEOUT. Gives up after REACQUIRE_TIMEOUT.
+
+    Returns:
+        Same tuple as update_tracking; success stays False while the search goes on, and
+        updated is False on the frames between searches
+    """
+    reacquisition = state.reacquisition
+    elapsed = time.time() - reacquisition.lost_at
+    reacquisition.frames_since_search += 1
+    searched = reacquisition.search_attempts == 0 or reacquisition.frames_since_search >= TrackingConfig.SEARCH_INTERVAL
+    if searched:
+        reacquisition.search_attempts += 1
+        reacquisition.frames_since_search = 0
+        growth = 1 + (TrackingConfig.SEARCH_WINDOW_MAX_GROWTH - 1) * min(1.0, elapsed / TrackingConfig.REACQUIRE_TIMEOUT)
+        window = reacquisition.search_window(frame.shape, growth)
+        match = reacquisition.find_target(frame, model, state, window)
+
+        if match is not None:
+            bbox = match[0]
+            state.reseat_tracker(frame, bbox)
+            reacquisition.searching = False
+            reacquisition.updates_since_redetect = 0
+            reacquisition.recoveries += 1
+            print(f"Re-acquired target after {reacquisition.search_attempts} searches (similarity {match[1]:.2f})")
+            return True, bbox, True
+
+    if elapsed >= TrackingConfig.REACQUIRE_TIMEOUT:
+        print("Target not re-acquired, returning to detection")
+        reacquisition.searching = False
+    state.last_tracker_bbox = (False, None)
+    return False, None, searched
+
+
+def render_tracking(frame, state, success, bbox, should_track, draw=True, inplace=False):
+    """
+    Drawing half of process_tracking_mode. Tracking only ends once a lost target has not been
+    re-acquired. The box is drawn into a copy of frame (into frame itself with inplace=True, as
+    in render_detections), also on frames the tracker skipped.
+
+    Returns:
+        Same tuple as process_tracking_mode
+    """
+    if not success and state.reacquisition.searching:
+        return None, False, False
     if success and bbox is not None:
         x, y, w, h = int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])
         state.tracked_bbox = (x, y, w, h)
         
-        # Only render when we actually update the tracker
-        if should_track:
-            output_frame = frame.copy()
-            
-            # Draw gradient fill with transparency
-            overlay = output_frame.copy()
-            cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 255), -1)
-            output_frame = cv2.addWeighted(overlay, 0.3, output_frame, 0.7, 0)
-            
-            # Draw outline
-            cv2.rectangle(output_frame, (x, y), (x + w, y + h), (0, 200, 200), 2)
-            
-            state.last_rendered_tracking_frame = output_frame
-        else:
-            # Reuse cached frame on skipped frames
-            output_frame = state.last_rendered_tracking_frame
+        if not draw:
+            return None, True, False
+
+        # Fill with transparency and outline, blended inside the box only
+        overlay = OverlayRenderer()
+        overlay.fill((x, y, x + w, y + h), (0, 255, 255), 0.3)
+        overlay.outline((x, y, x + w, y + h), (0, 200, 200), 2)
+        output_frame = overlay.render(frame, copy=not (inplace and frame.flags.writeable))
         
         return output_frame, True, False
     else:
@@ -0,0 +1,208 @@
+"""
+Batched YOLO inference shared by several video streams.
+
+Every stream gets a BatchClient that looks like the YOLO model to process_detection_mode
+(predict() and names). Frames submitted by the clients are gathered for at most
+MAX_BATCH_LATENCY_MS and run through the model as one batch, which costs far less CPU per
+frame than one predict() call per stream.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = int(os.getenv("GCS_BATCH_MAX_SIZE", 4))                    # Frames per model call
+MAX_BATCH_LATENCY_MS = float(os.getenv("GCS_BATCH_MAX_LATENCY_MS", 8.0))    # Longest a frame waits for others to join its batch
+
+
+class _Request:
+    __slots__ = ("client", "frame", "imgsz", "future", "submitted_at")
+
+    def __init__(self, client, frame, imgsz):
+        self.client = client
+        self.frame = frame
+        self.imgsz = imgsz
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class BatchInferenceService:
+    """
+    Gathers frames from all registered clients and runs them through the model in batches.
+
+    A batch is run as soon as it is full, every registered client has a frame waiting, or the
+    oldest frame has waited max_latency_ms. With a single stream every frame is therefore run
+    straight away and batching adds no latency. Only frames with the same inference size share
+    a batch.
+
+    Args:
+        model: Ultralytics YOLO model (ENGINE.model)
+        max_batch_size: Most frames per predict() call
+        max_latency_ms: Most time a frame waits for others to join its batch
+        predict_kwargs: Arguments for model.predict(); the same for every frame of a batch
+    """
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_latency_ms=MAX_BATCH_LATENCY_MS, **predict_kwargs):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.predict_kwargs = dict(predict_kwargs, verbose=False)
+
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.clients = set()
+        self.thread = None
+        self.running = False
+
+        # Metrics
+        self.batches = 0
+        self.frames = 0
+        self.batch_wait_ms = deque(maxlen=100)
+        self.batch_predict_ms = deque(maxlen=100)
+
+    def client(self, name=None):
+        """Register a stream. Returns a BatchClient to use in place of the model."""
+        client = BatchClient(self, name)
+        with self.condition:
+            self.clients.add(client)
+        return client
+
+    def _unregister(self, client):
+        with self.condition:
+            self.clients.discard(client)
+            self.condition.notify()
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        while self.pending:
+            self.pending.popleft().future.set_exception(RuntimeError("Batch inference service stopped"))
+
+    def submit(self, client, frame, imgsz=None):
+        """
+        Queue a frame, starting the service on first use.
+
+        Args:
+            imgsz: Inference size for this frame, or None for the service's predict_kwargs/model default
+
+        Returns:
+            Future resolving to that frame's Results
+        """
+        if not self.running:
+            self.start()
+        request = _Request(client, frame, imgsz)
+        with self.condition:
+            self.pending.append(request)
+            self.condition.notify()
+        return request.future
+
+    def _batch_ready(self):
+        imgsz = self.pending[0].imgsz
+        if sum(1 for request in self.pending if request.imgsz == imgsz) >= self.max_batch_size:
+            return True
+        waiting_clients = {request.client for request in self.pending}
+        return len(waiting_clients) >= len(self.clients)
+
+    def _next_batch(self):
+        """Wait for the next batch. Returns a list of requests, or None when stopped."""
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait()
+            if not self.running:
+                return None
+
+            deadline = self.pending[0].submitted_at + self.max_latency
+            while self.running and not self._batch_ready():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            # Oldest frame and the frames of the same size queued after it
+            imgsz = self.pending[0].imgsz
+            batch = [request for request in self.pending if request.imgsz == imgsz][:self.max_batch_size]
+            for request in batch:
+                self.pending.remove(request)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            start = time.perf_counter()
+            self.batch_wait_ms.append((start - batch[0].submitted_at) * 1000)
+            try:
+                predict_kwargs = self.predict_kwargs
+                if batch[0].imgsz is not None:
+                    predict_kwargs = dict(predict_kwargs, imgsz=batch[0].imgsz)
+                results = list(self.model.predict([request.frame for request in batch], **predict_kwargs))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)}")
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            self.batch_predict_ms.append((time.perf_counter() - start) * 1000)
+            self.batches += 1
+            self.frames += len(batch)
+
+            # Each result goes back to the stream that submitted its frame
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+    def stats(self):
+        """Batch count, average batch size and average wait/predict time."""
+        return {
+            "clients": len(self.clients),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "avg_wait_ms": sum(self.batch_wait_ms) / len(self.batch_wait_ms) if self.batch_wait_ms else 0.0,
+            "avg_predict_ms": sum(self.batch_predict_ms) / len(self.batch_predict_ms) if self.batch_predict_ms else 0.0,
+        }
+
+
+class BatchClient:
+    """One stream's handle on the BatchInferenceService, used in place of the YOLO model."""
+    def __init__(self, service, name=None):
+        self.service = service
+        self.name = name
+
+    @property
+    def names(self):
+        return self.service.model.names
+
+    @property
+    def device(self):
+        return getattr(self.service.model, "device", "unknown")
+
+    def predict(self, frame, imgsz=None, **kwargs):
+        """
+        Run the frame through the next batch and wait for its result.
+
+        Other per-call predict arguments are ignored: every frame of a batch uses the service's settings.
+
+        Returns:
+            List with one Results, like model.predict() on a single frame
+        """
+        return [self.service.submit(self, frame, imgsz).result()]
+
+    def close(self):
+        """Unregister the stream so batches stop waiting for it."""
+        self.service._unregister(self)
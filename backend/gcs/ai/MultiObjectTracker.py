@@ -0,0 +1,256 @@
+"""
+Multi-object tracking of the detection-mode boxes (ByteTrack-style).
+
+Every detection run, the boxes are associated with the existing tracks by IoU against each
+track's Kalman-predicted box: confident detections first, then the low-confidence ones for
+the tracks that are left, which keeps IDs through partial occlusion. Only numpy is used and
+matching is greedy, so an update costs well under a millisecond for the handful of objects
+in view. Tracks keep their trajectory, so the operator can pick any ID and every object's
+path can be recorded, not only the followed one.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+HIGH_CONFIDENCE = float(os.getenv("GCS_MOT_HIGH_CONFIDENCE", 0.5))  # Detections matched first and able to start tracks
+MATCH_IOU = 0.3                 # Least IoU between a track's predicted box and a detection to match them
+MAX_LOST_UPDATES = 30           # Detection runs a track survives unmatched before it is finished
+MIN_HITS = 2                    # Matches before a track is reported (filters one-off false positives)
+TRAJECTORY_LENGTH = 300         # Points kept per track
+FINISHED_TRAJECTORIES = 100     # Trajectories of finished tracks kept for recording
+
+
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter on a box centre and size (cx, cy, w, h). Noise scales with
+    the box size, as in SORT/ByteTrack.
+    """
+    POSITION_STD = 1.0 / 20
+    VELOCITY_STD = 1.0 / 160
+
+    def __init__(self, box):
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+        self.x = np.concatenate([box, np.zeros(4)]).astype(np.float64)
+        size = max(box[2], box[3])
+        std = np.array([2 * self.POSITION_STD] * 4 + [10 * self.VELOCITY_STD] * 4) * size
+        self.P = np.diag(std ** 2)
+
+    def predict(self):
+        size = max(self.x[2], self.x[3])
+        std = np.array([self.POSITION_STD] * 4 + [self.VELOCITY_STD] * 4) * size
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + np.diag(std ** 2)
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+
+    def update(self, box):
+        R = np.diag((self.POSITION_STD * max(self.x[2], self.x[3]) * np.ones(4)) ** 2)
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (box - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    @property
+    def box(self):
+        return self.x[:4]
+
+
+def xyxy_to_cxcywh(box):
+    return np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, box[2] - box[0], box[3] - box[1]], dtype=np.float64)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of two (N, 4) and (M, 4) xyxy arrays"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def greedy_match(iou, min_iou):
+    """
+    Match rows to columns, highest IoU first.
+
+    Returns:
+        List of (row, column) pairs with IoU of at least min_iou
+    """
+    matches = []
+    if iou.size == 0:
+        return matches
+    iou = iou.copy()
+    while True:
+        row, column = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[row, column] < min_iou:
+            return matches
+        matches.append((int(row), int(column)))
+        iou[row, :] = -1
+        iou[:, column] = -1
+
+
+class Track:
+    """One object followed across detection runs."""
+    def __init__(self, track_id, box, score, class_id, frame_number):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.score = score
+        self.filter = KalmanBoxFilter(xyxy_to_cxcywh(box))
+        self.hits = 1
+        self.lost_updates = 0
+        self.started_at = time.time()
+        self.trajectory = deque(maxlen=TRAJECTORY_LENGTH)
+        self._add_point(frame_number)
+
+    def _add_point(self, frame_number):
+        cx, cy = self.filter.box[:2]
+        self.trajectory.append((frame_number, time.time(), float(cx), float(cy)))
+
+    def predict(self):
+        self.filter.predict()
+
+    def update(self, box, score, frame_number):
+        self.filter.update(xyxy_to_cxcywh(box))
+        self.score = score
+        self.hits += 1
+        self.lost_updates = 0
+        self._add_point(frame_number)
+
+    @property
+    def xyxy(self):
+        cx, cy, w, h = self.filter.box
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    @property
+    def confirmed(self):
+        return self.hits >= MIN_HITS
+
+    def to_dict(self):
+        return {
+            "id": self.track_id,
+            "class_id": self.class_id,
+            "score": float(self.score),
+            "bbox": [int(v) for v in self.xyxy],
+            "trajectory": [{"frame": f, "timestamp": t, "x": x, "y": y} for f, t, x, y in self.trajectory],
+        }
+
+
+class MultiObjectTracker:
+    """
+    Assigns persistent IDs to detections. update() runs on the inference thread while
+    trajectories() may be read from a request thread, so both hold the tracker's lock.
+
+    Args:
+        high_confidence: Detections at or above this score are matched first and may start new tracks
+        match_iou: Least IoU for a match
+        max_lost_updates: Detection runs an unmatched track is kept for
+    """
+    def __init__(self, high_confidence=HIGH_CONFIDENCE, match_iou=MATCH_IOU, max_lost_updates=MAX_LOST_UPDATES):
+        self.high_confidence = high_confidence
+        self.match_iou = match_iou
+        self.max_lost_updates = max_lost_updates
+        self.tracks = []
+        self.finished = deque(maxlen=FINISHED_TRAJECTORIES)
+        self.next_id = 1
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.tracks = []
+            self.finished.clear()
+
+    def _associate(self, tracks, xyxy, classes, detection_indices):
+        """Match tracks to the given detections of the same class. Returns the matched (track, detection) pairs."""
+        if not tracks or len(detection_indices) == 0:
+            return []
+        predicted = np.array([track.xyxy for track in tracks])
+        iou = iou_matrix(predicted, xyxy[detection_indices])
+        same_class = np.array([track.class_id for track in tracks])[:, None] == classes[detection_indices][None, :]
+        iou[~same_class] = 0
+        return [(tracks[row], int(detection_indices[column])) for row, column in greedy_match(iou, self.match_iou)]
+
+    def update(self, xyxy, scores, classes, frame_number=0):
+        """
+        Associate one detection run with the tracks.
+
+        Args:
+            xyxy, scores, classes: Detections as (N, 4), (N,) and (N,) numpy arrays
+
+        Returns:
+            Array of N track IDs, one per detection (-1 if the detection has no confirmed track)
+        """
+        with self._lock:
+            return self._update(xyxy, scores, classes, frame_number)
+
+    def _update(self, xyxy, scores, classes, frame_number):
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64)
+        classes = np.asarray(classes).astype(int)
+        track_ids = np.full(len(xyxy), -1, dtype=int)
+
+        for track in self.tracks:
+            track.predict()
+
+        # Stage 1: confident detections against every track
+        high = np.flatnonzero(scores >= self.high_confidence)
+        low = np.flatnonzero(scores < self.high_confidence)
+        matches = self._associate(self.tracks, xyxy, classes, high)
+
+        # Stage 2: low-confidence detections keep the remaining tracks alive (e.g. partly occluded objects)
+        matched_tracks = {id(track) for track, _ in matches}
+        remaining = [track for track in self.tracks if id(track) not in matched_tracks]
+        matches += self._associate(remaining, xyxy, classes, low)
+
+        matched_tracks = set()
+        matched_detections = set()
+        for track, index in matches:
+            track.update(xyxy[index], scores[index], frame_number)
+            matched_tracks.add(id(track))
+            matched_detections.add(index)
+            if track.confirmed:
+                track_ids[index] = track.track_id
+
+        tracks = []
+        for track in self.tracks:
+            if id(track) not in matched_tracks:
+                track.lost_updates += 1
+                if track.lost_updates > self.max_lost_updates:
+                    if track.confirmed:
+                        self.finished.append(track)
+                    continue
+            tracks.append(track)
+
+        # Unmatched confident detections start new tracks
+        for index in high:
+            if index not in matched_detections:
+                tracks.append(Track(self.next_id, xyxy[index], scores[index], classes[index], frame_number))
+                self.next_id += 1
+
+        self.tracks = tracks  # Swapped in whole: get() and active_tracks() see the old or the new list
+        return track_ids
+
+    def get(self, track_id):
+        """Active confirmed track with this ID, or None"""
+        for track in self.tracks:
+            if track.track_id == track_id and track.confirmed:
+                return track
+        return None
+
+    def active_tracks(self):
+        """Confirmed tracks matched in the latest detection run"""
+        return [track for track in self.tracks if track.confirmed and track.lost_updates == 0]
+
+    def trajectories(self):
+        """Every confirmed track, active and finished, with its trajectory. Safe to call from any thread."""
+        with self._lock:
+            tracks = list(self.finished) + [track for track in self.tracks if track.confirmed]
+            return [dict(track.to_dict(), active=track in self.tracks) for track in tracks]
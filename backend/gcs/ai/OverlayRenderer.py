@@ -0,0 +1,99 @@
+"""
+Overlay drawing that only touches the annotated pixels.
+
+Annotations (tinted boxes or masks, outlines, contours, labels) are queued for a frame and
+drawn in one pass by render(). Fills are blended inside their box only, so the cost of a
+frame's overlays grows with the annotated area rather than with the frame size, and no
+full-frame copy or blend is made.
+"""
+import cv2
+import numpy as np
+
+
+class OverlayRenderer:
+    """
+    Queue of annotations for one frame. Boxes are (x1, y1, x2, y2) in frame pixels, colours BGR.
+
+    render(frame) draws into frame itself, which suits frames the caller owns (e.g. the BGR
+    conversion of a YUV frame). render(frame, copy=True) leaves frame untouched, e.g. a read-only
+    receiver ring slot, and draws into a buffer the renderer reuses from frame to frame.
+    """
+    def __init__(self):
+        self.fills = []
+        self.outlines = []
+        self.contours = []
+        self.labels = []
+        self.buffer = None
+
+    def __len__(self):
+        return len(self.fills) + len(self.outlines) + len(self.contours) + len(self.labels)
+
+    def fill(self, box, colour, alpha, mask=None):
+        """
+        Tint the box with colour at opacity alpha.
+
+        Args:
+            mask: Optional uint8 array the size of the box; only pixels where it is non-zero are tinted
+        """
+        self.fills.append((box, colour, alpha, mask))
+
+    def outline(self, box, colour, thickness=2):
+        self.outlines.append((box, colour, thickness))
+
+    def contour(self, points, colour, thickness=2):
+        """Closed polygon, points in frame pixels as accepted by cv2.drawContours"""
+        self.contours.append((points, colour, thickness))
+
+    def label(self, text, origin, colour, scale=0.7, thickness=2):
+        self.labels.append((text, origin, colour, scale, thickness))
+
+    def clear(self):
+        self.fills.clear()
+        self.outlines.clear()
+        self.contours.clear()
+        self.labels.clear()
+
+    def render(self, frame, copy=False):
+        """
+        Draw every queued annotation and clear the queue.
+
+        Args:
+            copy: Draw into the renderer's reusable buffer instead of frame. The buffer is
+                overwritten by the next render(copy=True), so do not keep it around
+
+        Returns:
+            The annotated frame (frame itself, or the buffer)
+        """
+        if copy:
+            if self.buffer is None or self.buffer.shape != frame.shape or self.buffer.dtype != frame.dtype:
+                self.buffer = np.empty_like(frame)
+            np.copyto(self.buffer, frame)
+            frame = self.buffer
+
+        height, width = frame.shape[:2]
+        for box, colour, alpha, mask in self.fills:
+            x1, y1, x2, y2 = (int(v) for v in box)
+            cx1, cy1 = max(0, x1), max(0, y1)
+            cx2, cy2 = min(width, x2), min(height, y2)
+            if cx2 <= cx1 or cy2 <= cy1:
+                continue
+            roi = frame[cy1:cy2, cx1:cx2]
+            tint = np.empty_like(roi)
+            tint[:] = colour
+            if mask is None:
+                cv2.addWeighted(tint, alpha, roi, 1 - alpha, 0, dst=roi)
+            else:
+                mask = mask[cy1 - y1:cy2 - y1, cx1 - x1:cx2 - x1]
+                blended = cv2.addWeighted(tint, alpha, roi, 1 - alpha, 0)
+                np.copyto(roi, blended, where=(mask > 0)[..., None])
+
+        for box, colour, thickness in self.outlines:
+            x1, y1, x2, y2 = (int(v) for v in box)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), colour, thickness)
+        for points, colour, thickness in self.contours:
+            cv2.drawContours(frame, [points], -1, colour, thickness)
+        for text, origin, colour, scale, thickness in self.labels:
+            cv2.putText(frame, text, (int(origin[0]), int(origin[1])), cv2.FONT_HERSHEY_SIMPLEX, scale, colour, thickness)
+
+        self.clear()
+        return frame
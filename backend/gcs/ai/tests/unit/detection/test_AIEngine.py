@@ -5,6 +5,7 @@ Tests basic functionality and edge cases for the TrackingEngine class
 
 import pytest
 import numpy as np
+import cv2
 from unittest.mock import Mock, patch
 import sys
 import os
@@ -12,7 +13,22 @@ from pathlib import Path
 
 root = Path(__file__).resolve().parents[6]
 sys.path.insert(0, str(root))
-from backend.gcs.ai.AIEngine import TrackingEngine
+from backend.gcs.ai.AIEngine import CursorHandler, TrackingEngine, TrackingConfig, ProcessingState, FrameScheduler, MotionGate, DetectionBoxes, detector_export_path, resolve_detector_model, roi_bounds, run_detection, render_detections, update_tracking, render_tracking, describe_detections, describe_tracking, TRACKERS, create_tracker, ScaledTracker, tracking_scale
+
+
+@pytest.fixture
+def car_model():
+    """Detects one car at (100,100)-(140,140) in every frame"""
+    boxes = DetectionBoxes(np.array([[100, 100, 140, 140]], dtype=np.float32), np.array([0.9]), np.array([2.0]))
+    return Mock(predict=Mock(return_value=[Mock(boxes=boxes)]), names={2: "car"}, spec=["predict", "names"])
+
+
+def detect_twice(frame, model, state):
+    """Full-frame detection with multi-object tracking, run twice so the detections have confirmed track IDs"""
+    with patch.object(TrackingConfig, "MULTI_OBJECT_TRACKING", True), patch.object(TrackingConfig, "ROI_DETECTION", False), \
+            patch.object(TrackingConfig, "MOTION_GATE", False), patch.object(state.scheduler, "should_detect", return_value=True):
+        run_detection(frame, model, state)
+        return run_detection(frame, model, state)
 
 class TestTrackingEngine:
     """Sanity tests for TrackingEngine class"""
@@ -138,3 +154,504 @@ class TestTrackingEngine:
         assert engine.tracked_bbox == sample_bbox
         assert engine.tracked_class == class_id
         mock_tracker_instance.init.assert_called_once_with(sample_frame, sample_bbox)
+
+
+class TestDetectorBackend:
+    """Sanity tests for choosing the ONNX Runtime / OpenVINO detector backend"""
+
+    @pytest.fixture
+    def model_path(self, tmp_path):
+        path = tmp_path / "yolo26n.pt"
+        path.touch()
+        return str(path)
+
+    def test_export_paths(self, model_path):
+        stem = model_path[:-len(".pt")]
+        assert detector_export_path(model_path, "onnx") == stem + ".onnx"
+        assert detector_export_path(model_path, "onnx", int8=True) == stem + "_int8.onnx"
+        assert detector_export_path(model_path, "openvino") == stem + "_openvino_model"
+        assert detector_export_path(model_path, "openvino", int8=True) == stem + "_int8_openvino_model"
+        with pytest.raises(ValueError):
+            detector_export_path(model_path, "tensorrt")
+
+    @patch('backend.gcs.ai.AIEngine.importlib.util.find_spec', return_value=Mock())
+    def test_uses_export_when_available(self, mock_find_spec, model_path):
+        export_path = detector_export_path(model_path, "onnx", int8=True)
+        open(export_path, "w").close()
+        assert resolve_detector_model(model_path, "onnx", int8=True) == (export_path, "onnx")
+
+    @patch('backend.gcs.ai.AIEngine.importlib.util.find_spec', return_value=Mock())
+    def test_falls_back_when_export_missing(self, mock_find_spec, model_path):
+        assert resolve_detector_model(model_path, "openvino") == (model_path, "pytorch")
+
+    @patch('backend.gcs.ai.AIEngine.importlib.util.find_spec', return_value=None)
+    def test_falls_back_when_runtime_missing(self, mock_find_spec, model_path):
+        open(detector_export_path(model_path, "onnx"), "w").close()
+        assert resolve_detector_model(model_path, "onnx") == (model_path, "pytorch")
+
+    def test_unknown_backend_falls_back(self, model_path):
+        assert resolve_detector_model(model_path, "tensorrt") == (model_path, "pytorch")
+
+    @patch('backend.gcs.ai.AIEngine.YOLO')
+    @patch('backend.gcs.ai.AIEngine.importlib.util.find_spec', return_value=None)
+    def test_engine_records_backend(self, mock_find_spec, mock_yolo):
+        with patch.object(TrackingConfig, "DETECTOR_BACKEND", "onnx"):
+            engine = TrackingEngine()
+        assert engine.detector_backend == "pytorch"
+        assert mock_yolo.call_args.args[0].endswith("yolo26n.pt")
+
+
+class TestRoiDetection:
+    """Sanity tests for ROI detection around the cursor"""
+
+    @pytest.fixture
+    def frame(self):
+        return np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    @pytest.fixture
+    def model(self):
+        """Full-frame pass finds boxes at (100,100) and (600,300); the crop finds one box at (10,10) in crop coordinates"""
+        def predict(image, imgsz=None, **kwargs):
+            if image.shape[:2] == (720, 1280):
+                xyxy = [[100, 100, 140, 140], [600, 300, 640, 340]]
+            else:
+                xyxy = [[10, 10, 30, 30]]
+            boxes = DetectionBoxes(np.array(xyxy, dtype=np.float32), np.full(len(xyxy), 0.9), np.zeros(len(xyxy)))
+            return [Mock(boxes=boxes)]
+        return Mock(predict=Mock(side_effect=predict), spec=["predict"])
+
+    def test_roi_bounds_clamped_to_frame(self):
+        assert roi_bounds((720, 1280), (640, 360), 320) == (480, 200, 800, 520)
+        assert roi_bounds((720, 1280), (0, 0), 320) == (0, 0, 320, 320)
+        assert roi_bounds((720, 1280), (1280, 720), 320) == (960, 400, 1280, 720)
+        assert roi_bounds((200, 300), (150, 100), 320) == (0, 0, 300, 200)
+
+    def test_roi_boxes_mapped_to_frame_and_merged(self, frame, model):
+        state = ProcessingState()
+        with patch.object(TrackingConfig, "ROI_DETECTION", True):
+            results = run_detection(frame, model, state, cursor_pos=(640, 360))
+
+        # Crop is (480, 200)-(800, 520): its box moves to (490, 210), the full-frame box at
+        # (600, 300) is inside the crop and replaced, the one at (100, 100) is kept
+        xyxy = results[0].boxes.xyxy
+        assert xyxy.tolist() == [[490, 210, 510, 230], [100, 100, 140, 140]]
+        assert state.last_roi == (480, 200, 800, 520)
+        crop_call = model.predict.call_args_list[1]
+        assert crop_call.args[0].shape == (320, 320, 3)
+        assert crop_call.kwargs["imgsz"] == TrackingConfig.ROI_SIZE
+
+    def test_full_frame_pass_runs_every_interval(self, frame, model):
+        state = ProcessingState()
+        with patch.object(TrackingConfig, "ROI_DETECTION", True), patch.object(TrackingConfig, "MOTION_GATE", False), \
+                patch.object(state.scheduler, "should_detect", return_value=True):
+            for _ in range(TrackingConfig.ROI_FULL_FRAME_INTERVAL + 1):
+                run_detection(frame, model, state, cursor_pos=(640, 360))
+                state.increment_frame()
+
+        full_frame_calls = [call for call in model.predict.call_args_list if call.args[0].shape[:2] == (720, 1280)]
+        assert len(full_frame_calls) == 2
+        assert all(call.kwargs["imgsz"] == TrackingConfig.ROI_FULL_FRAME_IMGSZ for call in full_frame_calls)
+
+    def test_full_frame_resumes_after_cursor_leaves(self, frame, model):
+        state = ProcessingState()
+        cursor = CursorHandler()
+        cursor.update_cursor(640, 360)
+        with patch.object(TrackingConfig, "ROI_DETECTION", True), patch.object(TrackingConfig, "MOTION_GATE", False), \
+                patch.object(state.scheduler, "should_detect", return_value=True):
+            for _ in range(2):
+                run_detection(frame, model, state, cursor_pos=cursor.cursor_pos)
+                state.increment_frame()
+
+            cursor.clear_cursor()
+            model.predict.reset_mock()
+            results = run_detection(frame, model, state, cursor_pos=cursor.cursor_pos)
+
+        model.predict.assert_called_once()
+        assert model.predict.call_args.args[0].shape[:2] == (720, 1280)
+        assert "imgsz" not in model.predict.call_args.kwargs  # Full 640 pass, not ROI_FULL_FRAME_IMGSZ
+        assert len(results[0].boxes.xyxy) == 2
+
+    def test_no_cursor_runs_full_frame(self, frame, model):
+        state = ProcessingState()
+        with patch.object(TrackingConfig, "ROI_DETECTION", True):
+            run_detection(frame, model, state, cursor_pos=None)
+        model.predict.assert_called_once()
+        assert "imgsz" not in model.predict.call_args.kwargs
+
+
+class TestFrameScheduler:
+    """Sanity tests for the adaptive detection/tracker cadence"""
+
+    def run_frames(self, scheduler, count, should=None):
+        should = should or scheduler.should_detect
+        return [should() for _ in range(count)]
+
+    def test_runs_every_frame_until_cost_is_known(self):
+        scheduler = FrameScheduler(target_fps=60)
+        assert all(self.run_frames(scheduler, 5))
+
+    def test_fast_inference_runs_every_frame(self):
+        scheduler = FrameScheduler(target_fps=60)
+        scheduler.record_detection(10)  # Fits in the 16.7 ms frame budget
+        assert all(self.run_frames(scheduler, 10))
+
+    def test_slow_inference_skips_to_fit_frame_budget(self):
+        scheduler = FrameScheduler(target_fps=60, latency_budget_ms=200)
+        scheduler.record_detection(40)  # Needs 3 frames of budget, so runs every 3rd frame
+        ran = self.run_frames(scheduler, 9)
+        assert scheduler.detection_skip == 2
+        assert ran.count(True) == 3
+
+    def test_static_scene_backs_off_up_to_latency_budget(self):
+        scheduler = FrameScheduler(target_fps=60, latency_budget_ms=100, max_detection_skip=10)
+        scheduler.record_detection(10)
+        self.run_frames(scheduler, TrackingConfig.BACKOFF_FRAMES * 20)
+        # (100 ms budget - 10 ms cost) / 16.7 ms frames = at most 5 reused frames
+        assert scheduler.detection_skip == 5
+
+    def test_cursor_movement_restores_full_cadence(self):
+        scheduler = FrameScheduler(target_fps=60, latency_budget_ms=200)
+        scheduler.record_detection(10)
+        scheduler.update_cursor((100, 100))
+        self.run_frames(scheduler, TrackingConfig.BACKOFF_FRAMES * 3)
+        assert scheduler.detection_skip > 0
+
+        scheduler.update_cursor((100 + TrackingConfig.CURSOR_MOVE_PX, 100))
+        assert scheduler.should_detect()
+        assert scheduler.detection_skip == 0
+
+    def test_shaky_tracking_restores_full_cadence(self):
+        scheduler = FrameScheduler(target_fps=60, latency_budget_ms=200)
+        scheduler.record_tracking(5, True, (0, 0, 50, 50), (0, 0, 50, 50))
+        self.run_frames(scheduler, TrackingConfig.BACKOFF_FRAMES * 3, scheduler.should_track)
+        assert scheduler.tracker_skip > 0
+
+        scheduler.record_tracking(5, True, (0, 0, 50, 50), (20, 0, 50, 50))  # Moved 40% of its size
+        scheduler.should_track()
+        assert scheduler.tracker_skip == 0
+
+    def test_falling_tracker_score_counts_as_activity(self):
+        scheduler = FrameScheduler()
+        scheduler.record_tracking(5, True, None, (0, 0, 50, 50), score=0.9)
+        scheduler.static_frames = 100
+        scheduler.record_tracking(5, True, None, (0, 0, 50, 50), score=0.5)
+        assert scheduler.static_frames == 0
+
+    def test_restart_runs_next_frame(self):
+        scheduler = FrameScheduler(target_fps=60, latency_budget_ms=200)
+        scheduler.record_detection(40)
+        scheduler.should_detect()
+        assert scheduler.should_detect() is False
+        scheduler.restart()
+        assert scheduler.should_detect()
+
+
+class TestMotionGate:
+    """Sanity tests for motion-gated detection"""
+
+    @pytest.fixture
+    def scene(self):
+        """Smooth random texture, larger than the frame so it can be panned"""
+        rng = np.random.default_rng(0)
+        texture = cv2.GaussianBlur(rng.integers(0, 255, (400, 680), dtype=np.uint8), (15, 15), 0)
+        return cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+
+    def view(self, scene, dx=0, dy=0):
+        """360x640 window into the scene, content moved by (dx, dy)"""
+        return np.ascontiguousarray(scene[20 - dy:380 - dy, 20 - dx:660 - dx])
+
+    def test_static_scene_is_unchanged(self, scene):
+        gate = MotionGate()
+        gate.set_reference(self.view(scene))
+        assert gate.unchanged(self.view(scene))
+        assert max(abs(v) for v in gate.shift) < 1
+
+    def test_pan_is_estimated_in_frame_pixels(self, scene):
+        gate = MotionGate()
+        gate.set_reference(self.view(scene))
+        assert gate.unchanged(self.view(scene, dx=8, dy=-4))
+        assert gate.shift[0] == pytest.approx(8, abs=2)
+        assert gate.shift[1] == pytest.approx(-4, abs=2)
+
+    def test_scene_change_runs_detection(self, scene):
+        gate = MotionGate()
+        gate.set_reference(self.view(scene))
+        changed = self.view(scene).copy()
+        cv2.rectangle(changed, (200, 100), (400, 300), (255, 255, 255), -1)
+        assert not gate.unchanged(changed)
+
+    def test_no_reference_runs_detection(self, scene):
+        assert not MotionGate().unchanged(self.view(scene))
+
+    def test_manoeuvring_runs_detection(self, scene):
+        gate = MotionGate()
+        gate.set_reference(self.view(scene))
+        attitude = {"video_timestamp": 100.0, "roll": 0.0, "pitch": 0.0, "yaw": 3.1}
+        assert gate.unchanged(self.view(scene), attitude)
+        # Yaw wraps from 3.1 to -3.1 rad: a 0.08 rad turn in 0.1 s
+        assert not gate.unchanged(self.view(scene), dict(attitude, video_timestamp=100.1, yaw=-3.1))
+
+    def test_reuse_limit(self, scene):
+        gate = MotionGate()
+        gate.set_reference(self.view(scene))
+        results = [gate.unchanged(self.view(scene)) for _ in range(TrackingConfig.MOTION_MAX_REUSE + 1)]
+        assert results[-1] is False
+        assert all(results[:-1])
+
+    def test_run_detection_reuses_shifted_boxes(self, scene):
+        state = ProcessingState()
+        boxes = DetectionBoxes(np.array([[100, 100, 150, 150]], dtype=np.float32), np.array([0.9]), np.array([0.0]))
+        model = Mock(spec=["predict"])
+        model.predict.return_value = [Mock(boxes=boxes)]
+
+        with patch.object(TrackingConfig, "MOTION_GATE", True), patch.object(TrackingConfig, "ROI_DETECTION", False), \
+                patch.object(state.scheduler, "should_detect", return_value=True):
+            run_detection(self.view(scene), model, state)
+            results = run_detection(self.view(scene, dx=8), model, state)
+
+        model.predict.assert_called_once()
+        assert results[0].boxes.xyxy[0][0] == pytest.approx(108, abs=2)
+        assert results[0].boxes.xyxy[0][2] == pytest.approx(158, abs=2)
+
+
+class TestReacquisition:
+    """Sanity tests for detector-assisted drift correction and lost-target search"""
+
+    def frame(self, x, y, colour=(0, 0, 255)):
+        frame = np.full((480, 640, 3), 80, dtype=np.uint8)
+        cv2.rectangle(frame, (x, y), (x + 39, y + 39), colour, -1)
+        return frame
+
+    @pytest.fixture
+    def model(self):
+        """Detects the saturated blob in whatever crop it is given"""
+        def predict(image, imgsz=None, **kwargs):
+            ys, xs = np.nonzero(image.max(axis=2) > 200)
+            xyxy = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]] if len(xs) else []
+            boxes = DetectionBoxes(np.array(xyxy, dtype=np.float32).reshape(-1, 4), np.full(len(xyxy), 0.9), np.zeros(len(xyxy)))
+            return [Mock(boxes=boxes)]
+        return Mock(predict=Mock(side_effect=predict), spec=["predict"])
+
+    @pytest.fixture
+    def state(self):
+        state = ProcessingState()
+        state.start_tracking(self.frame(300, 200), (300, 200, 40, 40), 0)
+        state.tracker = Mock(spec=["init", "update"])
+        state.scheduler.should_track = Mock(return_value=True)
+        return state
+
+    def test_lost_target_is_reacquired(self, state, model):
+        state.tracker.update.return_value = (False, None)
+        with patch.object(cv2.TrackerCSRT, "create", return_value=Mock()):
+            success, bbox, _ = update_tracking(self.frame(330, 210), state, model)
+
+        assert success
+        assert bbox == (330, 210, 40, 40)
+        assert state.tracking and not state.reacquisition.searching
+        assert state.reacquisition.recoveries == 1
+
+    def test_search_window_grows_until_timeout(self, state, model):
+        state.tracker.update.return_value = (False, None)
+        empty = np.full((480, 640, 3), 80, dtype=np.uint8)
+
+        success, bbox, _ = update_tracking(empty, state, model)
+        assert not success and state.reacquisition.searching
+        # Still searching: tracking (and any recording) continues
+        assert render_tracking(empty, state, success, bbox, True) == (None, False, False)
+        assert state.tracking
+
+        state.reacquisition.lost_at -= TrackingConfig.REACQUIRE_TIMEOUT / 2
+        with patch.object(TrackingConfig, "SEARCH_INTERVAL", 1):
+            update_tracking(empty, state, model)
+        windows = [call.args[0].shape for call in model.predict.call_args_list]
+        assert windows[1][0] > windows[0][0]
+
+        state.reacquisition.lost_at -= TrackingConfig.REACQUIRE_TIMEOUT
+        success, bbox, _ = update_tracking(empty, state, model)
+        assert not state.reacquisition.searching
+        assert render_tracking(empty, state, success, bbox, True)[2] is True
+        assert not state.tracking
+
+    def test_search_detections_are_bounded_over_the_timeout(self, state, model):
+        state.tracker.update.return_value = (False, None)
+        empty = np.full((480, 640, 3), 80, dtype=np.uint8)
+        fps = 60
+        frames = 0
+        update_tracking(empty, state, model)
+        while state.reacquisition.searching:
+            state.reacquisition.lost_at -= 1 / fps  # One frame later
+            update_tracking(empty, state, model)
+            frames += 1
+
+        assert frames >= TrackingConfig.REACQUIRE_TIMEOUT * fps * 0.9  # Searched for (about) the whole timeout
+        assert model.predict.call_count <= frames // TrackingConfig.SEARCH_INTERVAL + 1
+        assert max(call.args[0].shape[0] for call in model.predict.call_args_list) <= TrackingConfig.SEARCH_WINDOW_MIN * TrackingConfig.SEARCH_WINDOW_MAX_GROWTH
+
+    def test_different_looking_object_is_rejected(self, state, model):
+        state.tracker.update.return_value = (False, None)
+        success, _, _ = update_tracking(self.frame(300, 200, colour=(255, 0, 0)), state, model)
+        assert not success
+        assert state.reacquisition.searching
+
+    def test_drift_is_corrected(self, state, model):
+        # Tracker reports a box drifting off the target
+        state.tracker.update.return_value = (True, (315, 200, 40, 40))
+        frame = self.frame(300, 200)
+        with patch.object(TrackingConfig, "REDETECT_INTERVAL", 2), patch.object(cv2.TrackerCSRT, "create", return_value=Mock()):
+            assert update_tracking(frame, state, model)[1] == (315, 200, 40, 40)
+            model.predict.assert_not_called()
+            success, bbox, _ = update_tracking(frame, state, model)
+
+        assert success
+        assert bbox == (300, 200, 40, 40)
+        assert state.reacquisition.corrections == 1
+
+    def test_without_model_loss_ends_tracking(self, state):
+        state.tracker.update.return_value = (False, None)
+        success, bbox, updated = update_tracking(self.frame(300, 200), state)
+        assert render_tracking(self.frame(300, 200), state, success, bbox, updated)[2] is True
+        assert not state.tracking
+
+    def test_box_is_drawn_in_place_only_when_asked(self, state):
+        frame = self.frame(300, 200)
+        original = frame.copy()
+
+        output, _, _ = render_tracking(frame, state, True, (300, 200, 40, 40), True)
+        assert output is not frame
+        assert np.array_equal(frame, original)  # The caller's frame stays raw
+        assert not np.array_equal(output, original)
+
+        output, _, _ = render_tracking(frame, state, True, (300, 200, 40, 40), True, inplace=True)
+        assert output is frame
+
+
+class TestObjectTracks:
+    """Sanity tests for multi-object track IDs in detection mode"""
+
+    def test_detections_get_track_ids(self, car_model):
+        state = ProcessingState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        results = detect_twice(frame, car_model, state)
+        tracked_results, track_ids = state.detection_track_ids
+        assert tracked_results is results
+        assert track_ids.tolist() == [1]
+
+    def test_select_track_by_id_starts_tracking(self, car_model):
+        state = ProcessingState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        results = detect_twice(frame, car_model, state)
+
+        _, mode_changed = render_detections(frame, results, car_model, state, None, None, track_id=1)
+        assert mode_changed
+        assert state.tracking
+        assert state.tracked_class == 2
+        assert state.tracked_bbox == pytest.approx((100, 100, 40, 40), abs=1)
+
+    def test_unknown_track_id_is_ignored(self, car_model):
+        state = ProcessingState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        _, mode_changed = render_detections(frame, None, car_model, state, None, None, track_id=7)
+        assert not mode_changed
+        assert not state.tracking
+
+
+class TestVectorOverlays:
+    """Sanity tests for overlays sent as metadata instead of drawn into the frame"""
+
+    def test_detections_described_with_track_ids(self, car_model):
+        state = ProcessingState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        results = detect_twice(frame, car_model, state)
+        assert describe_detections(results, car_model, state) == [
+            {"bbox": [100, 100, 140, 140], "class": "car", "confidence": 0.9, "track_id": 1}
+        ]
+        assert describe_detections(None, car_model, state) == []
+
+    def test_click_handled_without_drawing(self, car_model):
+        state = ProcessingState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        results = car_model.predict(frame)
+        output, mode_changed = render_detections(frame, results, car_model, state, (120, 120), (120, 120), draw=False)
+        assert output is None
+        assert mode_changed
+        assert not frame.any()
+        assert describe_tracking(state, car_model) == {"bbox": [100, 100, 140, 140], "class": "car", "searching": False}
+
+
+class TestTrackerRegistry:
+    """Sanity tests for tracker selection"""
+
+    @pytest.mark.parametrize("tracker_type", ["csrt", "kcf", "mosse"])
+    def test_opencv_trackers_follow_target(self, tracker_type):
+        rng = np.random.default_rng(0)
+        texture = cv2.GaussianBlur(rng.integers(0, 255, (240, 320), dtype=np.uint8), (5, 5), 0)
+        frame = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+        tracker, created = create_tracker(tracker_type)
+        assert created == tracker_type
+        tracker.init(frame, (80, 80, 40, 40))
+        success, bbox = tracker.update(frame)
+        assert success
+        assert bbox[0] == pytest.approx(80, abs=4)
+
+    def test_missing_dnn_model_falls_back_to_csrt(self):
+        with patch.object(TrackingConfig, "NANOTRACK_BACKBONE", "/nonexistent/backbone.onnx"):
+            tracker, created = create_tracker("nano")
+        assert created == "csrt"
+        assert tracker is not None
+
+    def test_unknown_tracker(self):
+        with pytest.raises(ValueError):
+            create_tracker("dasiamrpn")
+
+    def test_processing_state_uses_configured_tracker(self):
+        state = ProcessingState()
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        with patch.object(TrackingConfig, "TRACKER_TYPE", "kcf"), patch.dict(TRACKERS, kcf=Mock(return_value=Mock())):
+            state.start_tracking(frame, (80, 80, 40, 40), 0)
+            TRACKERS["kcf"].assert_called_once()
+        assert state.tracker_type == "kcf"
+
+
+class TestScaledTracking:
+    """Sanity tests for tracking on downscaled frames"""
+
+    def scene(self, dx=0):
+        rng = np.random.default_rng(0)
+        texture = cv2.GaussianBlur(rng.integers(0, 255, (720, 1400), dtype=np.uint8), (21, 21), 0)
+        texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)  # Coarse enough to survive downscaling
+        return cv2.cvtColor(np.ascontiguousarray(texture[:, 60 - dx:1340 - dx]), cv2.COLOR_GRAY2BGR)
+
+    def test_scale_from_target_size(self):
+        assert tracking_scale((0, 0, 32, 20)) == 1.0
+        assert tracking_scale((0, 0, 128, 64)) == pytest.approx(TrackingConfig.TRACKING_TARGET_PX / 128)
+        assert tracking_scale((0, 0, 1000, 600)) == TrackingConfig.TRACKING_MIN_SCALE
+
+    def test_boxes_mapped_between_resolutions(self):
+        inner = Mock(spec=["init", "update"])
+        inner.update.return_value = (True, (100, 50, 32, 32))
+        tracker = ScaledTracker(inner, grayscale=True)
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+        tracker.init(frame, (400, 200, 128, 128))
+        image, bbox = inner.init.call_args.args
+        assert image.shape == (360, 640)
+        assert bbox == (200, 100, 64, 64)
+        assert tracker.update(frame) == (True, (200, 100, 64, 64))
+
+    def test_scaled_tracker_follows_target(self):
+        tracker = ScaledTracker(cv2.TrackerKCF.create())
+        tracker.init(self.scene(), (500, 300, 160, 160))
+        assert tracker.scale < 1.0
+        for dx in (6, 12, 18):
+            success, bbox = tracker.update(self.scene(dx))
+        assert success
+        assert bbox[0] == pytest.approx(518, abs=6)
+        assert bbox[2] == pytest.approx(160, abs=6)
+
+    def test_processing_state_wraps_tracker(self):
+        state = ProcessingState()
+        with patch.object(TrackingConfig, "SCALED_TRACKING", True), patch.object(TrackingConfig, "TRACKER_TYPE", "kcf"):
+            state.start_tracking(self.scene(), (500, 300, 160, 160), 0)
+        assert isinstance(state.tracker, ScaledTracker)
+        success, bbox = state.tracker.update(self.scene(6))
+        assert success and bbox[0] == pytest.approx(506, abs=6)
@@ -0,0 +1,143 @@
+"""
+Sanity tests for BatchInference.py
+Tests batching, per-stream result routing and the latency window of BatchInferenceService
+"""
+
+import pytest
+import threading
+import time
+from unittest.mock import Mock
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parents[6]
+sys.path.insert(0, str(root))
+from backend.gcs.ai.BatchInference import BatchInferenceService
+
+
+class FakeModel:
+    """Returns the frame itself as the 'result' and records the size of every batch"""
+    def __init__(self, predict_time=0.0):
+        self.names = {0: "person"}
+        self.predict_time = predict_time
+        self.batch_sizes = []
+        self.kwargs = None
+
+    def predict(self, frames, **kwargs):
+        self.batch_sizes.append(len(frames))
+        self.kwargs = kwargs
+        time.sleep(self.predict_time)
+        return list(frames)
+
+
+class TestBatchInferenceService:
+    """Sanity tests for BatchInferenceService class"""
+
+    @pytest.fixture
+    def model(self):
+        return FakeModel()
+
+    @pytest.fixture
+    def service(self, model):
+        service = BatchInferenceService(model, max_batch_size=4, max_latency_ms=200, conf=0.1)
+        yield service
+        service.stop()
+
+    def run_streams(self, clients, frames_per_client=1):
+        """Submit from every client at once, each on its own thread. Returns {client name: [results]}"""
+        results = {client.name: [] for client in clients}
+        barrier = threading.Barrier(len(clients))
+
+        def stream(client):
+            barrier.wait()
+            for i in range(frames_per_client):
+                results[client.name].extend(client.predict(f"{client.name}-{i}"))
+
+        threads = [threading.Thread(target=stream, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results
+
+    def test_single_stream_is_not_delayed(self, service, model):
+        client = service.client("a")
+        start = time.perf_counter()
+        assert client.predict("frame") == ["frame"]
+        assert time.perf_counter() - start < 0.1  # Well under the 200 ms window
+        assert model.batch_sizes == [1]
+
+    def test_streams_are_batched_and_results_routed(self, service, model):
+        clients = [service.client(name) for name in ("a", "b", "c")]
+        results = self.run_streams(clients, frames_per_client=3)
+
+        for name in ("a", "b", "c"):
+            assert results[name] == [f"{name}-0", f"{name}-1", f"{name}-2"]
+        assert sum(model.batch_sizes) == 9
+        assert max(model.batch_sizes) > 1
+        assert service.stats()["avg_batch_size"] > 1
+
+    def test_batch_size_limit(self, model):
+        service = BatchInferenceService(model, max_batch_size=2, max_latency_ms=200)
+        try:
+            clients = [service.client(name) for name in ("a", "b", "c", "d")]
+            self.run_streams(clients)
+        finally:
+            service.stop()
+        assert max(model.batch_sizes) <= 2
+        assert sum(model.batch_sizes) == 4
+
+    def test_latency_window_flushes_partial_batch(self, service, model):
+        client = service.client("a")
+        service.client("idle")  # Registered, never submits
+        start = time.perf_counter()
+        assert client.predict("frame") == ["frame"]
+        elapsed = time.perf_counter() - start
+        assert 0.15 < elapsed < 1.0
+        assert model.batch_sizes == [1]
+
+    def test_closed_client_is_not_waited_for(self, service, model):
+        client = service.client("a")
+        service.client("gone").close()
+        start = time.perf_counter()
+        client.predict("frame")
+        assert time.perf_counter() - start < 0.1
+
+    def test_predict_settings_and_names(self, service, model):
+        client = service.client("a")
+        client.predict("frame", conf=0.9)
+        assert model.kwargs == {"conf": 0.1, "verbose": False}
+        assert client.names == {0: "person"}
+
+    def test_only_same_size_frames_share_a_batch(self, service, model):
+        clients = [service.client(name) for name in ("a", "b")]
+        results = {}
+        barrier = threading.Barrier(2)
+
+        def stream(client, imgsz):
+            barrier.wait()
+            results[client.name] = client.predict(client.name, imgsz=imgsz)
+
+        threads = [threading.Thread(target=stream, args=(client, imgsz)) for client, imgsz in zip(clients, (320, 640))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert results == {"a": ["a"], "b": ["b"]}
+        assert model.batch_sizes == [1, 1]
+        assert model.kwargs["imgsz"] in (320, 640)
+
+    def test_predict_error_reaches_every_stream(self):
+        model = Mock()
+        model.predict.side_effect = RuntimeError("model failed")
+        service = BatchInferenceService(model)
+        try:
+            with pytest.raises(RuntimeError, match="model failed"):
+                service.client("a").predict("frame")
+        finally:
+            service.stop()
+
+    def test_invalid_batch_size(self, model):
+        with pytest.raises(ValueError):
+            BatchInferenceService(model, max_batch_size=0)
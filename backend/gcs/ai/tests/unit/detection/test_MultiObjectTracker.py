@@ -0,0 +1,118 @@
+"""
+Sanity tests for MultiObjectTracker.py
+Tests ID persistence, two-stage association and trajectories of the multi-object tracker
+"""
+
+import pytest
+import numpy as np
+import sys
+import threading
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parents[6]
+sys.path.insert(0, str(root))
+from backend.gcs.ai.MultiObjectTracker import MultiObjectTracker, iou_matrix, greedy_match
+
+
+def detections(*boxes, score=0.9, class_id=0):
+    """(xyxy, scores, classes) arrays for boxes given as (x1, y1, x2, y2)"""
+    xyxy = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    return xyxy, np.full(len(xyxy), score), np.full(len(xyxy), class_id)
+
+
+class TestMultiObjectTracker:
+    """Sanity tests for MultiObjectTracker class"""
+
+    @pytest.fixture
+    def tracker(self):
+        return MultiObjectTracker(high_confidence=0.5, match_iou=0.3, max_lost_updates=3)
+
+    def test_iou_matrix_and_greedy_match(self):
+        a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+        b = np.array([[20, 20, 30, 30], [0, 0, 10, 5]], dtype=float)
+        iou = iou_matrix(a, b)
+        assert iou[0, 1] == pytest.approx(0.5)
+        assert iou[1, 0] == pytest.approx(1.0)
+        assert sorted(greedy_match(iou, 0.3)) == [(0, 1), (1, 0)]
+        assert greedy_match(iou, 0.6) == [(1, 0)]
+
+    def test_ids_confirmed_after_second_match(self, tracker):
+        first = tracker.update(*detections((100, 100, 140, 140), (300, 100, 340, 140)))
+        assert first.tolist() == [-1, -1]  # Not yet confirmed
+
+        second = tracker.update(*detections((104, 100, 144, 140), (302, 100, 342, 140)))
+        assert second.tolist() == [1, 2]
+
+    def test_ids_persist_through_motion_and_reordering(self, tracker):
+        for step in range(10):
+            ids = tracker.update(*detections((300 - 4 * step, 100, 340 - 4 * step, 140), (100 + 8 * step, 100, 140 + 8 * step, 140)))
+        assert ids.tolist() == [1, 2]
+        # Same objects, detections listed the other way round
+        ids = tracker.update(*detections((180, 100, 220, 140), (260, 100, 300, 140)))
+        assert ids.tolist() == [2, 1]
+
+    def test_low_confidence_detection_keeps_track(self, tracker):
+        tracker.update(*detections((100, 100, 140, 140)))
+        tracker.update(*detections((102, 100, 142, 140)))
+        # Partly occluded: below high_confidence, still matched to the existing track, never starts a new one
+        ids = tracker.update(*detections((104, 100, 144, 140), score=0.2))
+        assert ids.tolist() == [1]
+        assert tracker.update(*detections((500, 400, 540, 440), score=0.2)).tolist() == [-1]
+        assert [track.track_id for track in tracker.tracks] == [1]
+
+    def test_classes_are_not_mixed(self, tracker):
+        tracker.update(*detections((100, 100, 140, 140), class_id=0))
+        tracker.update(*detections((100, 100, 140, 140), class_id=0))
+        ids = tracker.update(*detections((100, 100, 140, 140), class_id=2))
+        assert ids.tolist() == [-1]
+        assert len(tracker.tracks) == 2
+
+    def test_lost_tracks_are_finished_with_trajectory(self, tracker):
+        for step in range(3):
+            tracker.update(*detections((100 + 10 * step, 100, 140 + 10 * step, 140)), frame_number=step)
+        for _ in range(4):
+            tracker.update(*detections())
+
+        assert tracker.tracks == []
+        trajectories = tracker.trajectories()
+        assert len(trajectories) == 1
+        assert trajectories[0]["id"] == 1
+        assert trajectories[0]["active"] is False
+        assert [point["frame"] for point in trajectories[0]["trajectory"]] == [0, 1, 2]
+
+    def test_get_only_returns_confirmed_tracks(self, tracker):
+        tracker.update(*detections((100, 100, 140, 140)))
+        assert tracker.get(1) is None
+        tracker.update(*detections((100, 100, 140, 140)))
+        assert tracker.get(1).class_id == 0
+        assert tracker.get(99) is None
+
+    def test_trajectories_can_be_read_while_updating(self, tracker):
+        stop = threading.Event()
+        errors = []
+
+        def infer_thread():
+            step = 0
+            try:
+                while not stop.is_set():
+                    # Objects appear, move and disappear so tracks start, grow and finish
+                    boxes = [(100 * i + step % 50, 100, 100 * i + 40 + step % 50, 140) for i in range(step % 6)]
+                    tracker.update(*detections(*boxes), frame_number=step)
+                    step += 1
+            except Exception as e:
+                errors.append(e)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads often, so a read overlaps an update
+        thread = threading.Thread(target=infer_thread)
+        thread.start()
+        try:
+            deadline = time.time() + 0.5
+            while time.time() < deadline:
+                tracker.trajectories()
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(switch_interval)
+        assert not errors
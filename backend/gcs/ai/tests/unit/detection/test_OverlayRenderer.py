@@ -0,0 +1,83 @@
+"""
+Sanity tests for OverlayRenderer.py
+Tests that overlays match full-frame blending while only touching the annotated pixels
+"""
+
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parents[6]
+sys.path.insert(0, str(root))
+from backend.gcs.ai.OverlayRenderer import OverlayRenderer
+
+
+class TestOverlayRenderer:
+    """Sanity tests for OverlayRenderer class"""
+
+    @pytest.fixture
+    def frame(self):
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)
+
+    def test_fill_matches_full_frame_blend(self, frame):
+        # Reference: the previous copy + rectangle + full-frame addWeighted
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (20, 30), (60, 70), (0, 255, 0), -1)
+        expected = cv2.addWeighted(overlay, 0.3, frame, 0.7, 0)
+
+        renderer = OverlayRenderer()
+        renderer.fill((20, 30, 61, 71), (0, 255, 0), 0.3)
+        result = renderer.render(frame.copy())
+        assert np.abs(result.astype(int) - expected.astype(int)).max() <= 1
+
+    def test_only_box_pixels_change(self, frame):
+        original = frame.copy()
+        renderer = OverlayRenderer()
+        renderer.fill((20, 30, 60, 70), (255, 255, 255), 0.5)
+        renderer.render(frame)
+
+        changed = np.any(frame != original, axis=2)
+        assert changed[30:70, 20:60].any()
+        changed[30:70, 20:60] = False
+        assert not changed.any()
+
+    def test_mask_limits_fill(self, frame):
+        original = frame.copy()
+        mask = np.zeros((40, 40), dtype=np.uint8)
+        mask[:, :20] = 255
+        renderer = OverlayRenderer()
+        renderer.fill((20, 30, 60, 70), (255, 255, 255), 0.5, mask=mask)
+        renderer.render(frame)
+
+        assert np.any(frame[30:70, 20:40] != original[30:70, 20:40])
+        assert np.array_equal(frame[30:70, 40:60], original[30:70, 40:60])
+
+    def test_boxes_outside_frame_are_clipped(self, frame):
+        mask = np.full((40, 40), 255, dtype=np.uint8)
+        renderer = OverlayRenderer()
+        renderer.fill((-20, -20, 20, 20), (0, 0, 255), 0.5, mask=mask)
+        renderer.fill((200, 200, 240, 240), (0, 0, 255), 0.5)
+        renderer.render(frame)
+
+    def test_copy_uses_reusable_buffer(self, frame):
+        original = frame.copy()
+        renderer = OverlayRenderer()
+        renderer.outline((10, 10, 50, 50), (0, 0, 255))
+        first = renderer.render(frame, copy=True)
+        renderer.label("car", (10, 60), (0, 255, 0))
+        second = renderer.render(frame, copy=True)
+
+        assert np.array_equal(frame, original)
+        assert first is second
+        assert not np.array_equal(second, original)
+
+    def test_render_clears_queue(self, frame):
+        renderer = OverlayRenderer()
+        renderer.fill((0, 0, 10, 10), (0, 0, 0), 0.5)
+        renderer.outline((0, 0, 10, 10), (0, 0, 0))
+        assert len(renderer) == 2
+        renderer.render(frame)
+        assert len(renderer) == 0
@@ -5,8 +5,11 @@ AI Helper File:
 
 import cv2
 import numpy as np
+from backend.gcs.ai.OverlayRenderer import OverlayRenderer
 
 class Cv2UiHelperClass:
+    overlay = OverlayRenderer()  # Shared by the static drawing helpers below
+
     def __init__(self, window_name):
         self.cursor_x = 0
         self.cursor_y = 0
@@ -34,10 +37,13 @@ class Cv2UiHelperClass:
     # --- Helper Methods ---
     @staticmethod
     def draw_hover_effects(frame, masks, boxes, classes, cursor_x, cursor_y):
-        """Draws outlines and fills when mouse hovers over a YOLO detection"""  
-        annotated_frame = frame.copy()
+        """
+        Draws outlines and fills when mouse hovers over a YOLO detection.
+        The returned frame is a reused buffer, valid until the next call.
+        """
         target_box = None
         target_index = None
+        frame_h, frame_w = frame.shape[:2]
 
         for i, mask in enumerate(masks):
             x1, y1, x2, y2 = boxes[i].astype(int)
@@ -46,38 +52,39 @@ class Cv2UiHelperClass:
             if x1 <= cursor_x <= x2 and y1 <= cursor_y <= y2:
                 target_index = i
                 target_box = (x1, y1, x2 - x1, y2 - y1)
+                x1, y1 = max(0, x1), max(0, y1)
+                x2, y2 = min(frame_w, x2), min(frame_h, y2)
+                if x2 <= x1 or y2 <= y1:
+                    continue
                 
-                # Resize mask to frame size
+                # Resize only the part of the mask under the box to the box size
                 mask_img = (mask.cpu().numpy() * 255).astype(np.uint8)
-                mask_resized = cv2.resize(mask_img, (frame.shape[1], frame.shape[0]))
+                scale_y, scale_x = mask_img.shape[0] / frame_h, mask_img.shape[1] / frame_w
+                mask_crop = mask_img[int(y1 * scale_y):max(int(y1 * scale_y) + 1, int(np.ceil(y2 * scale_y))),
+                                     int(x1 * scale_x):max(int(x1 * scale_x) + 1, int(np.ceil(x2 * scale_x)))]
+                mask_roi = cv2.resize(mask_crop, (x2 - x1, y2 - y1))
                 
-                # 1. Draw Contours
-                contours, _ = cv2.findContours(mask_resized, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                # 1. Contours
+                contours, _ = cv2.findContours(mask_roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(int(x1), int(y1)))
                 for cnt in contours:
                     epsilon = 0.01 * cv2.arcLength(cnt, True)
-                    approx = cv2.approxPolyDP(cnt, epsilon, True)
-                    cv2.drawContours(annotated_frame, [approx], -1, (0, 200, 0), 2)
+                    Cv2UiHelperClass.overlay.contour(cv2.approxPolyDP(cnt, epsilon, True), (0, 200, 0), 2)
 
                 # 2. Gradient Fill
-                overlay = annotated_frame.copy()
-                overlay[mask_resized > 0] = (0, 255, 0)
-                annotated_frame = cv2.addWeighted(overlay, 0.4, annotated_frame, 0.6, 0)
+                Cv2UiHelperClass.overlay.fill((x1, y1, x2, y2), (0, 255, 0), 0.4, mask=mask_roi)
 
+        annotated_frame = Cv2UiHelperClass.overlay.render(frame, copy=True)
         return annotated_frame, target_box, target_index
 
     @staticmethod
-    def draw_tracking_state(frame, bbox, class_id, status_text=""):
+    def draw_tracking_state(frame, bbox, class_id, status_text="", inplace=False):
+        """Draws the tracked box and class onto a copy of frame, or onto frame itself with inplace=True"""
         x, y, w, h = [int(v) for v in bbox]
         alpha = 0.4
 
-        # Draw Gradient Box
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 255), -1)
-        frame = cv2.addWeighted(overlay, alpha, frame, 1-alpha, 0)
-
-        # Outline & Text
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 200, 200), 2)
-        cv2.putText(frame, f"Tracking class {class_id}", (x, y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            
-        return frame
\ No newline at end of file
+        # Gradient Box, Outline & Text
+        overlay = Cv2UiHelperClass.overlay
+        overlay.fill((x, y, x + w, y + h), (0, 255, 255), alpha)
+        overlay.outline((x, y, x + w, y + h), (0, 200, 200), 2)
+        overlay.label(f"Tracking class {class_id}", (x, y - 10), (0, 255, 255), scale=0.8)
+        return overlay.render(frame if inplace else frame.copy())
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Benchmark the YOLO detector backends on recorded footage.
+
+Runs the same frames through PyTorch and each exported CPU backend (ONNX Runtime, OpenVINO,
+FP32 and INT8) and reports fps, plus mAP@0.5 drift measured against the PyTorch detections.
+
+Usage (from the project root):
+    python -m backend.gcs.ai.utils.benchmark_detector --video recording.mp4 --export --int8
+"""
+
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from backend.gcs.ai.AIEngine import TrackingConfig, DETECTOR_RUNTIMES, detector_export_path, export_detector, resolve_detector_model
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(script_dir, "..", "models", "yolo26n.pt")
+DEFAULT_VIDEO = os.path.join(script_dir, "..", "error-video.mp4")
+WARMUP_FRAMES = 5
+
+
+def load_frames(video_path, max_frames):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_backend(model, frames):
+    """
+    Returns:
+        Tuple (fps, detections)
+        - detections: Per frame, tuple (boxes xyxy, confidences, classes) as numpy arrays
+    """
+    predict_args = {"conf": TrackingConfig.CONFIDENCE_THRESHOLD, "iou": TrackingConfig.MODEL_IOU, "device": "cpu", "verbose": False}
+    for frame in frames[:WARMUP_FRAMES]:
+        model.predict(frame, **predict_args)
+
+    detections = []
+    start = time.perf_counter()
+    for frame in frames:
+        boxes = model.predict(frame, **predict_args)[0].boxes
+        detections.append((boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)))
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, detections
+
+
+def box_iou(box, boxes):
+    """IoU of one xyxy box against an (N, 4) array of xyxy boxes"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def mean_average_precision(reference, candidate, iou_threshold=0.5):
+    """
+    mAP@iou_threshold of the candidate detections, with the reference detections as ground truth.
+
+    Args:
+        reference, candidate: Per-frame detections as returned by run_backend()
+
+    Returns:
+        Mean AP over the classes present in the reference (1.0 if both are empty)
+    """
+    classes = set()
+    for boxes, _, cls in reference:
+        classes.update(cls.tolist())
+    if not classes:
+        return 1.0 if all(len(cls) == 0 for _, _, cls in candidate) else 0.0
+
+    average_precisions = []
+    for class_id in classes:
+        ground_truth = [ref_boxes[ref_cls == class_id] for ref_boxes, _, ref_cls in reference]
+        matched = [np.zeros(len(boxes), dtype=bool) for boxes in ground_truth]
+        total = sum(len(boxes) for boxes in ground_truth)
+
+        # Every candidate detection of this class, highest confidence first
+        predictions = [
+            (conf, frame_index, box)
+            for frame_index, (boxes, confs, cls) in enumerate(candidate)
+            for box, conf in zip(boxes[cls == class_id], confs[cls == class_id])
+        ]
+        predictions.sort(key=lambda prediction: -prediction[0])
+
+        true_positives = np.zeros(len(predictions))
+        for i, (_, frame_index, box) in enumerate(predictions):
+            gt_boxes = ground_truth[frame_index]
+            if len(gt_boxes) == 0:
+                continue
+            ious = box_iou(box, gt_boxes)
+            ious[matched[frame_index]] = 0
+            best = int(np.argmax(ious))
+            if ious[best] >= iou_threshold:
+                matched[frame_index][best] = True
+                true_positives[i] = 1
+
+        # All-point interpolated area under the precision/recall curve
+        cumulative_tp = np.cumsum(true_positives)
+        recall = np.concatenate(([0.0], cumulative_tp / total, [1.0]))
+        precision = np.concatenate(([1.0], cumulative_tp / np.arange(1, len(predictions) + 1), [0.0]))
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        average_precisions.append(float(np.sum((recall[1:] - recall[:-1]) * precision[1:])))
+    return float(np.mean(average_precisions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark YOLO detector backends on recorded footage')
+    parser.add_argument('--video', default=DEFAULT_VIDEO, help='Recorded footage to run the detectors on')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='PyTorch .pt model (reference and export source)')
+    parser.add_argument('--frames', type=int, default=300, help='Number of frames to benchmark')
+    parser.add_argument('--backends', nargs='+', default=list(DETECTOR_RUNTIMES), help='Backends to compare with PyTorch')
+    parser.add_argument('--int8', action='store_true', help='Also benchmark the INT8-quantized exports')
+    parser.add_argument('--export', action='store_true', help='Export models that are missing before benchmarking')
+    parser.add_argument('--data', default=None, help='Dataset yaml for OpenVINO INT8 calibration')
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}")
+
+    reference_fps, reference = run_backend(YOLO(args.model, task="detect"), frames)
+    rows = [("pytorch", reference_fps, 1.0)]
+
+    for backend in args.backends:
+        for int8 in ([False, True] if args.int8 else [False]):
+            name = f"{backend}{'-int8' if int8 else ''}"
+            if args.export and not os.path.exists(detector_export_path(args.model, backend, int8)):
+                export_detector(args.model, backend, int8=int8, data=args.data)
+            path, resolved = resolve_detector_model(args.model, backend, int8)
+            if resolved != backend:
+                print(f"Skipping {name}")
+                continue
+            fps, detections = run_backend(YOLO(path, task="detect"), frames)
+            rows.append((name, fps, mean_average_precision(reference, detections)))
+
+    print(f"\n{'Backend':<16}{'FPS':>8}{'Speedup':>10}{'mAP@0.5 vs PyTorch':>22}")
+    for name, fps, map50 in rows:
+        print(f"{name:<16}{fps:>8.1f}{fps / reference_fps:>9.2f}x{map50:>22.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark the single-object trackers on recorded footage.
+
+Every tracker in TRACKERS is started on the same target in each clip and run to the end of
+the clip. Reported per tracker: ms/frame (mean and p95), success rate (frames the tracker
+reported the target) and accuracy (frames whose box overlaps the YOLO detection of the
+target by IoU >= 0.5, YOLO being the reference).
+
+The target is the most confident YOLO detection in the first frame of each clip, or --bbox.
+
+Usage (from the project root):
+    python -m backend.gcs.ai.utils.benchmark_tracker --videos clip1.mp4 clip2.mp4 --frames 300 --scaled
+"""
+
+import argparse
+import time
+import numpy as np
+from ultralytics import YOLO
+
+from backend.gcs.ai.AIEngine import TrackingConfig, TRACKERS, ScaledTracker, bbox_iou, create_tracker
+from backend.gcs.ai.utils.benchmark_detector import DEFAULT_MODEL, DEFAULT_VIDEO, load_frames
+
+MIN_IOU = 0.5
+
+
+def detect(model, frame):
+    """Returns (xyxy, conf, cls) numpy arrays of the YOLO detections in the frame"""
+    boxes = model.predict(frame, conf=TrackingConfig.CONFIDENCE_THRESHOLD, iou=TrackingConfig.MODEL_IOU, device="cpu", verbose=False)[0].boxes
+    return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+
+def reference_boxes(model, frames, bbox):
+    """
+    Follow the target through the clip with YOLO: in each frame, the detection of the target's
+    class that best overlaps its previous reference box.
+
+    Returns:
+        Per frame, the reference (x, y, w, h) or None where YOLO lost the target
+    """
+    first_xyxy, _, first_cls = detect(model, frames[0])
+    matches = [(bbox_iou(bbox, _xywh(box)), cls) for box, cls in zip(first_xyxy, first_cls)]
+    class_id = max(matches)[1] if matches else None
+
+    references = [bbox]
+    previous = bbox
+    for frame in frames[1:]:
+        xyxy, _, cls = detect(model, frame)
+        candidates = [_xywh(box) for box, c in zip(xyxy, cls) if c == class_id]
+        best = max(candidates, key=lambda box: bbox_iou(previous, box), default=None)
+        if best is not None and bbox_iou(previous, best) > 0:
+            previous = best
+            references.append(best)
+        else:
+            references.append(None)
+    return references
+
+
+def _xywh(box):
+    return (int(box[0]), int(box[1]), int(box[2] - box[0]), int(box[3] - box[1]))
+
+
+def run_tracker(tracker_type, frames, bbox, references, scaled=False, grayscale=False):
+    """
+    Args:
+        scaled: Track on a downscaled copy of the frames (ScaledTracker), grayscale if set and supported
+
+    Returns:
+        Tuple (times_ms, successes, accurate, referenced) for the clip
+    """
+    tracker, created = create_tracker(tracker_type)
+    if created != tracker_type:
+        raise RuntimeError(f"{tracker_type} tracker is not available")
+    if scaled:
+        tracker = ScaledTracker(tracker, grayscale and tracker_type in ScaledTracker.GRAYSCALE_TRACKERS)
+    tracker.init(frames[0], bbox)
+
+    times_ms = []
+    successes = accurate = referenced = 0
+    for frame, reference in zip(frames[1:], references[1:]):
+        start = time.perf_counter()
+        success, box = tracker.update(frame)
+        times_ms.append((time.perf_counter() - start) * 1000)
+        successes += bool(success)
+        if reference is not None:
+            referenced += 1
+            accurate += bool(success) and bbox_iou(box, reference) >= MIN_IOU
+    return times_ms, successes, accurate, referenced
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the single-object trackers on recorded footage')
+    parser.add_argument('--videos', nargs='+', default=[DEFAULT_VIDEO], help='Recorded clips to track in')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='YOLO model picking the target and providing the reference boxes')
+    parser.add_argument('--frames', type=int, default=300, help='Frames per clip')
+    parser.add_argument('--trackers', nargs='+', default=list(TRACKERS), help='Trackers to compare')
+    parser.add_argument('--scaled', action='store_true', help='Also benchmark each tracker on downscaled frames (ScaledTracker)')
+    parser.add_argument('--grayscale', action='store_true', help='Downscaled frames are also converted to grayscale where supported')
+    parser.add_argument('--bbox', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'), help='Target in the first frame instead of the best detection')
+    args = parser.parse_args()
+
+    model = YOLO(args.model, task="detect")
+    variants = [(name, False) for name in args.trackers]
+    if args.scaled:
+        variants += [(name, True) for name in args.trackers]
+    results = {variant: ([], 0, 0, 0) for variant in variants}
+
+    for video in args.videos:
+        frames = load_frames(video, args.frames)
+        if len(frames) < 2:
+            print(f"Skipping {video}: not enough frames")
+            continue
+
+        bbox = tuple(args.bbox) if args.bbox else None
+        if bbox is None:
+            xyxy, conf, _ = detect(model, frames[0])
+            if len(conf) == 0:
+                print(f"Skipping {video}: nothing detected in the first frame")
+                continue
+            bbox = _xywh(xyxy[int(np.argmax(conf))])
+        references = reference_boxes(model, frames, bbox)
+        print(f"{video}: {len(frames)} frames, target {bbox}")
+
+        for name, scaled in variants:
+            try:
+                times_ms, successes, accurate, referenced = run_tracker(name, frames, bbox, references, scaled, args.grayscale)
+            except Exception as e:
+                print(f"Skipping {name} on {video}: {e}")
+                continue
+            total = results[(name, scaled)]
+            results[(name, scaled)] = (total[0] + times_ms, total[1] + successes, total[2] + accurate, total[3] + referenced)
+
+    print(f"\n{'Tracker':<16}{'ms/frame':>10}{'p95 ms':>10}{'FPS':>8}{'Success':>10}{'Accuracy':>10}")
+    for (name, scaled), (times_ms, successes, accurate, referenced) in results.items():
+        label = f"{name}-scaled" if scaled else name
+        if not times_ms:
+            print(f"{label:<16}{'n/a':>10}")
+            continue
+        mean_ms = float(np.mean(times_ms))
+        print(f"{label:<16}{mean_ms:>10.2f}{float(np.percentile(times_ms, 95)):>10.2f}{1000 / mean_ms:>8.0f}"
+              f"{successes / len(times_ms):>10.1%}{(accurate / referenced if referenced else 0.0):>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -107,7 +107,7 @@ while cap.isOpened():
             click_flag = False
     else:
         # --- TRACKING MODE ---
-        output_frame, tracking_succeeded, mode_changed = process_tracking_mode(frame, state)
+        output_frame, tracking_succeeded, mode_changed = process_tracking_mode(frame, state, model)
         annotated_frame = output_frame
         if mode_changed:
             # Switched back to detection mode
@@ -0,0 +1,117 @@
+"""Websocket fan-out for the GCS frontend clients."""
+import asyncio
+import json
+from collections import deque
+
+CLIENT_QUEUE_SIZE = 8  # Outbound messages buffered per client before the oldest is dropped
+
+
+class ClientChannel:
+    """
+    Bounded outbound queue and sender task for one websocket client, plus a latest-only slot
+    for high-rate messages (e.g. 30 Hz overlays) that would otherwise crowd telemetry out of the queue.
+    """
+    def __init__(self, websocket, max_queue):
+        self.websocket = websocket
+        self.queue = deque(maxlen=max_queue)
+        self.latest = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.superseded = 0
+        self.task = None
+
+    def enqueue(self, text):
+        """Queue a serialized message, dropping the oldest one if the client has fallen behind."""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(text)
+        self.ready.set()
+
+    def replace_latest(self, text):
+        """Hold a serialized message in the latest-only slot, replacing one that was not sent yet."""
+        if self.latest is not None:
+            self.superseded += 1
+        self.latest = text
+        self.ready.set()
+
+
+class BroadcastHub:
+    """
+    Serializes each message once and hands it to every client's own queue. Every client has
+    its own sender task, so a slow browser only drops its own stale telemetry and never delays
+    the others.
+    """
+    def __init__(self, max_queue=CLIENT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self.clients = {}  # websocket -> ClientChannel
+
+    def register(self, websocket):
+        """Start delivering broadcasts to a connected websocket. Must be called from the event loop."""
+        channel = ClientChannel(websocket, self.max_queue)
+        channel.task = asyncio.create_task(self._sender(channel))
+        self.clients[websocket] = channel
+        return channel
+
+    def unregister(self, websocket):
+        channel = self.clients.pop(websocket, None)
+        if channel and channel.task and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+
+    def broadcast(self, message: dict):
+        """Queue a message for every client. Never waits on the network."""
+        if not self.clients:
+            return
+        text = json.dumps(message)
+        for channel in list(self.clients.values()):
+            channel.enqueue(text)
+
+    def broadcast_latest(self, message: dict):
+        """
+        Send a message to every client without queueing it: a client that has not sent the
+        previous one yet only gets this one. Keeps frequent messages out of the telemetry queue.
+        """
+        if not self.clients:
+            return
+        text = json.dumps(message)
+        for channel in list(self.clients.values()):
+            channel.replace_latest(text)
+
+    async def _sender(self, channel):
+        try:
+            while True:
+                await channel.ready.wait()
+                channel.ready.clear()
+                while channel.queue or channel.latest is not None:
+                    if channel.queue:
+                        text = channel.queue.popleft()
+                    else:
+                        text, channel.latest = channel.latest, None
+                    await channel.websocket.send_text(text)
+                    channel.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Client went away, stop sending to it
+            self.unregister(channel.websocket)
+
+    def stats(self):
+        """Per-client queue depth, sent and dropped message counts."""
+        return [
+            {
+                "client": f"{channel.websocket.client.host}:{channel.websocket.client.port}" if getattr(channel.websocket, "client", None) else str(id(channel.websocket)),
+                "queue_depth": len(channel.queue),
+                "sent": channel.sent,
+                "dropped": channel.dropped,
+                "superseded": channel.superseded,
+            }
+            for channel in self.clients.values()
+        ]
+
+    async def close(self):
+        """Stop every sender task (shutdown)."""
+        tasks = [channel.task for channel in self.clients.values() if channel.task]
+        self.clients.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
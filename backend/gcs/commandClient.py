@@ -0,0 +1,236 @@
+"""Command channel from the GCS to the flight computer, with request IDs, acknowledgements and priorities."""
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from collections import deque
+
+# Seconds to wait for the flight computer to acknowledge a command. Longer than the flight
+# computer's own wait for the autopilot (ACK_TIMEOUT, 5 s, in mavlinkExecutor.py) plus link
+# latency, so a command is never reported as failed while the autopilot may still accept it
+COMMAND_TIMEOUT = 7.0
+
+# Lower value is sent first
+COMMAND_PRIORITIES = {
+    "stop_following": 0,
+    "set_flight_mode": 1,
+    "set_follow_distance": 2,
+    "move_to_location": 3,
+}
+DEFAULT_PRIORITY = 2
+
+# Queuing a command drops any still-unsent command of these types (their waiters get CommandSupersededError)
+SUPERSEDES = {
+    "move_to_location": {"move_to_location"},  # Only the newest follow target matters
+    "stop_following": {"move_to_location"},
+}
+
+
+class CommandError(RuntimeError):
+    """The flight computer rejected the command or it could not be delivered."""
+
+
+class CommandTimeoutError(CommandError):
+    """No acknowledgement arrived within the timeout."""
+
+
+class CommandSupersededError(CommandError):
+    """A newer command replaced this one before it was sent."""
+
+
+class PendingCommand:
+    def __init__(self, request_id, message, priority, timeout):
+        self.request_id = request_id
+        self.message = message
+        self.command = message.get("command")
+        self.priority = priority
+        self.timeout = timeout
+        self.future = asyncio.get_running_loop().create_future()
+        self.sent_at = None
+        self.cancelled = False
+
+
+class CommandClient:
+    """
+    Sends commands over the flight computer websocket and matches acks by request_id.
+
+    Commands wait in a priority queue and are written by a single sender task, so a stop or mode
+    change goes out ahead of queued follow targets. Several commands can await their acks at once.
+    """
+    def __init__(self, timeout=COMMAND_TIMEOUT):
+        self.timeout = timeout
+        self.websocket = None
+        self._queue = []  # heap of (priority, order, PendingCommand)
+        self._queue_ready = None
+        self._in_flight = {}  # request_id -> PendingCommand
+        self._ids = itertools.count(1)
+        self._sender_task = None
+
+        # Metrics
+        self.round_trip_ms = {}  # command -> deque of recent round-trip times
+        self.acked = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.superseded = 0
+
+    @property
+    def connected(self):
+        return self.websocket is not None
+
+    def attach(self, websocket):
+        """
+        Start sending over a newly connected flight computer websocket. A previous socket's
+        sender is stopped, and commands awaiting an ack on it fail, as the ack cannot arrive.
+        """
+        self._stop_sender()
+        self._fail_in_flight(CommandError("Flight computer reconnected"))
+        self.websocket = websocket
+        if self._queue_ready is None:
+            self._queue_ready = asyncio.Event()
+        self._sender_task = asyncio.create_task(self._sender())
+
+    def detach(self):
+        """Connection lost: fail everything queued or awaiting an ack."""
+        self.websocket = None
+        self._stop_sender()
+        for _, _, pending in self._queue:
+            self._fail(pending, CommandError("Flight computer disconnected"))
+        self._queue.clear()
+        self._fail_in_flight(CommandError("Flight computer disconnected"))
+
+    def _stop_sender(self):
+        if self._sender_task:
+            self._sender_task.cancel()
+            self._sender_task = None
+
+    def _fail_in_flight(self, error):
+        for pending in list(self._in_flight.values()):
+            self._fail(pending, error)
+        self._in_flight.clear()
+
+    def submit(self, message: dict, priority=None, timeout=None):
+        """
+        Queue a command without waiting for its ack. If no ack arrives within the timeout after
+        it is sent, the command stops counting as in flight and its future fails.
+
+        Returns:
+            PendingCommand whose future resolves to the ack dict
+        """
+        if not self.connected:
+            raise RuntimeError("Flight computer not connected")
+
+        command = message.get("command")
+        if priority is None:
+            priority = COMMAND_PRIORITIES.get(command, DEFAULT_PRIORITY)
+
+        # Drop queued commands this one makes stale
+        stale_types = SUPERSEDES.get(command, set())
+        if stale_types:
+            for _, _, queued in self._queue:
+                if not queued.cancelled and queued.command in stale_types:
+                    queued.cancelled = True
+                    self.superseded += 1
+                    self._fail(queued, CommandSupersededError(f"{queued.command} superseded by {command}"))
+
+        request_id = next(self._ids)
+        timeout = self.timeout if timeout is None else timeout
+        pending = PendingCommand(request_id, dict(message, request_id=request_id), priority, timeout)
+        heapq.heappush(self._queue, (priority, request_id, pending))
+        self._queue_ready.set()
+        return pending
+
+    async def send(self, message: dict, priority=None, timeout=None):
+        """
+        Queue a command and wait for the flight computer to acknowledge it.
+
+        Returns:
+            The ack dict
+
+        Raises:
+            RuntimeError: If the flight computer is not connected
+            CommandTimeoutError, CommandSupersededError, CommandError
+        """
+        pending = self.submit(message, priority, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending.future), pending.timeout)
+        except asyncio.TimeoutError:
+            self._time_out(pending)
+            raise CommandTimeoutError(f"No ack for {pending.command} after {pending.timeout:.1f}s")
+
+    def handle_ack(self, ack: dict):
+        """Resolve the command an ack message from the flight computer refers to."""
+        pending = self._in_flight.pop(ack.get("request_id"), None)
+        if pending is None or pending.future.done():
+            return # Already timed out or unknown
+
+        round_trip_ms = (time.perf_counter() - pending.sent_at) * 1000
+        self.round_trip_ms.setdefault(pending.command, deque(maxlen=100)).append(round_trip_ms)
+
+        if ack.get("status") == "ok":
+            self.acked += 1
+            pending.future.set_result(ack)
+        else:
+            self.failed += 1
+            self._fail(pending, CommandError(ack.get("error") or f"{pending.command} failed"))
+
+    async def _sender(self):
+        while True:
+            await self._queue_ready.wait()
+            while self._queue:
+                _, _, pending = heapq.heappop(self._queue)
+                if pending.cancelled or pending.future.done():
+                    continue
+                pending.sent_at = time.perf_counter()
+                self._in_flight[pending.request_id] = pending
+                try:
+                    await self.websocket.send(json.dumps(pending.message))
+                except Exception as e:
+                    self._in_flight.pop(pending.request_id, None)
+                    self._fail(pending, CommandError(f"Failed to send to flight comp: {e}"))
+                    continue
+                # Nobody awaits a submitted command, so a dropped ack must not keep it in flight forever
+                asyncio.get_running_loop().call_later(pending.timeout, self._expire, pending)
+            self._queue_ready.clear()
+
+    def _expire(self, pending):
+        if self._in_flight.get(pending.request_id) is pending:
+            self._time_out(pending)
+        # Otherwise acked, already timed out in send(), or failed on disconnect
+
+    def _time_out(self, pending):
+        """Give up on a command's ack, once, whether send() or the expiry timer notices first."""
+        if pending.cancelled:
+            return
+        self.timeouts += 1
+        pending.cancelled = True
+        self._in_flight.pop(pending.request_id, None)
+        self._fail(pending, CommandTimeoutError(f"No ack for {pending.command} after {pending.timeout:.1f}s"))
+
+    @staticmethod
+    def _fail(pending, error):
+        if not pending.future.done():
+            pending.future.set_exception(error)
+            pending.future.exception()  # Mark retrieved so fire-and-forget commands don't warn
+
+    def stats(self):
+        """Round-trip latency per command type plus delivery counters."""
+        latency = {}
+        for command, samples in self.round_trip_ms.items():
+            ordered = sorted(samples)
+            latency[command] = {
+                "count": len(ordered),
+                "last_ms": samples[-1],
+                "avg_ms": sum(ordered) / len(ordered),
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            }
+        return {
+            "connected": self.connected,
+            "queued": sum(1 for _, _, pending in self._queue if not pending.cancelled),
+            "in_flight": len(self._in_flight),
+            "acked": self.acked,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "superseded": self.superseded,
+            "round_trip": latency,
+        }
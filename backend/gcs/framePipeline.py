@@ -0,0 +1,212 @@
+"""
+Staged video pipeline for the GCS: ingest -> preprocess -> infer -> render -> publish.
+
+Every stage runs on its own thread, so YOLO inference of frame N+1 overlaps with rendering and
+publishing frame N. The queues between stages are bounded and drop the oldest item when full,
+which means a slow stage skips stale frames instead of building up latency.
+
+A frame that borrows its buffer (e.g. a receiver ring slot) gets an on_release callback. The
+pipeline calls it once the frame is dropped or has been through the last stage. A last stage
+that hands the buffer on to something that keeps reading it takes the callback over instead
+(see PipelineFrame.take_release).
+"""
+import threading
+import time
+from collections import deque
+
+STAGE_QUEUE_SIZE = 1  # Frames waiting in front of each stage; 1 keeps end-to-end latency at a minimum
+STATS_WINDOW = 100    # Samples kept for the latency statistics
+
+
+class StageQueue:
+    """Bounded, thread-safe queue that drops its oldest item instead of blocking the producer."""
+    def __init__(self, name, maxsize=STAGE_QUEUE_SIZE):
+        self.name = name
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        """Returns the oldest item if it was dropped to make room, otherwise None."""
+        dropped = None
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+                dropped = self.items[0]
+            self.items.append(item)
+            self.condition.notify()
+        return dropped
+
+    def get(self, timeout=None):
+        """Returns the oldest item, or None if nothing arrived within timeout or the queue was closed."""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        """Stop the queue and return the items still waiting in it."""
+        with self.condition:
+            self.closed = True
+            remaining = list(self.items)
+            self.items.clear()
+            self.condition.notify_all()
+        return remaining
+
+    def __len__(self):
+        return len(self.items)
+
+
+class PipelineFrame:
+    """One frame and everything the stages attach to it on its way through the pipeline."""
+    def __init__(self, frame, pixel_format, metadata, on_release=None):
+        self.frame = frame
+        self.pixel_format = pixel_format
+        self.metadata = metadata
+        self.ingested_at = time.perf_counter()
+        self.ai_frame = None        # BGR frame for the AI (preprocess)
+        self.inference = None       # Detection results or tracker update (infer)
+        self.output_frame = None    # Frame to stream (render)
+        self.output_format = None
+        self.on_release = on_release  # Gives frame's buffer back to its owner
+
+    def take_release(self):
+        """Take over on_release, e.g. to pass the buffer on. The pipeline will not call it."""
+        on_release, self.on_release = self.on_release, None
+        return on_release
+
+    def release(self):
+        """Call on_release once. The frame must not be used afterwards."""
+        on_release, self.on_release = self.on_release, None
+        if on_release is not None:
+            on_release()
+
+
+def _latency_stats(samples):
+    if not samples:
+        return {"count": 0, "last_ms": None, "avg_ms": None, "p95_ms": None}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "last_ms": samples[-1],
+        "avg_ms": sum(ordered) / len(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+class PipelineStage:
+    """
+    Thread that takes frames from its input queue, runs fn on each one and passes the result on.
+
+    fn returns the PipelineFrame to hand to the next stage, or None to drop the frame. The first
+    stage has no input queue: its fn is called in a loop and produces the frames.
+    """
+    def __init__(self, name, fn, input_queue=None, output_queue=None):
+        self.name = name
+        self.fn = fn
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.latency_ms = deque(maxlen=STATS_WINDOW)
+        self.processed = 0
+        self.errors = 0
+        self.thread = None
+
+    def run(self, stop_event, on_complete=None):
+        while not stop_event.is_set():
+            item = None
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    continue
+
+            start = time.perf_counter()
+            try:
+                result = self.fn() if self.input_queue is None else self.fn(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in {self.name} stage: {e}")
+                if item is not None:
+                    item.release()
+                continue
+            if result is None:
+                if item is not None:
+                    item.release()
+                continue
+            self.latency_ms.append((time.perf_counter() - start) * 1000)
+            self.processed += 1
+
+            if self.output_queue is not None:
+                dropped = self.output_queue.put(result)
+                if dropped is not None:
+                    dropped.release()
+            elif on_complete is not None:
+                on_complete(result)
+
+
+class FramePipeline:
+    """
+    Chain of stages connected by StageQueues.
+
+    Args:
+        stages: List of (name, fn) in order. The first fn takes no arguments and produces
+            PipelineFrames (or None when no frame is available); the others take a PipelineFrame
+        queue_size: Capacity of each queue between two stages
+    """
+    def __init__(self, stages, queue_size=STAGE_QUEUE_SIZE):
+        if len(stages) < 2:
+            raise ValueError("A pipeline needs a source stage and at least one more stage")
+        self.queues = [StageQueue(f"{stages[i][0]}->{stages[i + 1][0]}", queue_size) for i in range(len(stages) - 1)]
+        self.stages = []
+        for i, (name, fn) in enumerate(stages):
+            input_queue = self.queues[i - 1] if i > 0 else None
+            output_queue = self.queues[i] if i < len(self.queues) else None
+            self.stages.append(PipelineStage(name, fn, input_queue, output_queue))
+
+        self.end_to_end_ms = deque(maxlen=STATS_WINDOW)  # Ingest to end of the last stage
+        self.frames_completed = 0
+        self.stop_event = threading.Event()
+
+    def _complete(self, item):
+        self.end_to_end_ms.append((time.perf_counter() - item.ingested_at) * 1000)
+        self.frames_completed += 1
+        item.release()
+
+    def start(self):
+        self.stop_event.clear()
+        for stage in self.stages:
+            on_complete = self._complete if stage.output_queue is None else None
+            stage.thread = threading.Thread(target=stage.run, args=(self.stop_event, on_complete), name=f"pipeline-{stage.name}", daemon=True)
+            stage.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        remaining = []
+        for queue in self.queues:
+            remaining.extend(queue.close())
+        for stage in self.stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout)
+                stage.thread = None
+        for item in remaining:
+            item.release()
+
+    @property
+    def running(self):
+        return any(stage.thread is not None and stage.thread.is_alive() for stage in self.stages)
+
+    def stats(self):
+        """Per-stage latency, queue occupancy and drops, and end-to-end latency."""
+        return {
+            "running": self.running,
+            "frames_completed": self.frames_completed,
+            "end_to_end": _latency_stats(self.end_to_end_ms),
+            "stages": [
+                dict(_latency_stats(stage.latency_ms), name=stage.name, processed=stage.processed, errors=stage.errors)
+                for stage in self.stages
+            ],
+            "queues": [
+                {"name": queue.name, "depth": len(queue), "capacity": queue.items.maxlen, "dropped": queue.dropped}
+                for queue in self.queues
+            ],
+        }
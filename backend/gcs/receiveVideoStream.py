@@ -1,29 +1,345 @@
 import subprocess
 import os
+import sys
 import av
 import cv2
 import time
-import json
 import threading
+import numpy as np
+from collections import OrderedDict
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from klvTelemetry import decode_telemetry
+
 # --- CONFIGURATION ---
 GCS_VIDEO_PORT = os.getenv("GCS_VIDEO_PORT", 5000)
 STREAM_URL = "udp://0.0.0.0:" +  str(GCS_VIDEO_PORT) + "?overrun_nonfatal=1&fifo_size=10000"
 DISPLAY_WITH_OVERLAY = True
+FRAME_BUFFER_SLOTS = 4  # Decoder write slot + newest published + consumer claim + one spare
+TELEMETRY_LOOKBACK = 120  # KLV packets kept for pairing with frames (2 s at 60 fps)
+DECODER_THREADS = int(os.getenv("GCS_DECODER_THREADS", 0))                  # 0 = let FFmpeg pick
+DECODER_THREAD_TYPE = os.getenv("GCS_DECODER_THREAD_TYPE", "AUTO")          # AUTO, FRAME or SLICE
+DECODER_OUTPUT_FORMAT = os.getenv("GCS_DECODER_OUTPUT_FORMAT", "bgr24")     # bgr24, yuv420p or nv12
 # Reduce log noise
 av.logging.set_level(av.logging.PANIC)
 
 
+class FrameRingBuffer:
+    """
+    Fixed set of preallocated frame buffers shared by the decoder thread and one consumer.
+
+    The decoder fills a free slot in place and publishes it with a sequence number.
+    The consumer claims the newest published slot without copying it. A claimed slot
+    is never handed back to the decoder until the consumer claims another one, so the
+    returned array stays valid until the next claim(). A consumer that keeps frames
+    longer (e.g. a multi-stage pipeline) holds the claimed slot with hold() until it
+    calls release(); if every slot is held, the ring grows by one slot.
+    """
+    def __init__(self, num_slots=FRAME_BUFFER_SLOTS):
+        if num_slots < 3:
+            raise ValueError("FrameRingBuffer needs at least 3 slots (writing, newest, claimed)")
+        self.num_slots = num_slots
+        self.lock = threading.Lock()
+
+        self.slots = [None] * num_slots       # Writable buffers, filled by the decoder
+        self.views = [None] * num_slots       # Read-only views handed to the consumer
+        self.slot_seq = [-1] * num_slots      # Sequence number of the frame held by each slot
+        self.slot_pts = [None] * num_slots    # Stream PTS of the frame held by each slot
+        self.holds = [0] * num_slots          # hold() count of each slot
+        self.generation = 0                   # Bumped on reallocation, so stale holds are ignored
+        self.newest_slot = None
+        self.claimed_slot = None
+
+        self.next_seq = 0
+        self.last_claimed_seq = -1
+        self.dropped_total = 0
+
+    def _allocate(self, shape, dtype):
+        """(Re)allocate every slot, e.g. on the first frame or when the stream resolution changes."""
+        for i in range(self.num_slots):
+            buffer = np.empty(shape, dtype=dtype)
+            view = buffer.view()
+            view.flags.writeable = False
+            self.slots[i] = buffer
+            self.views[i] = view
+            self.slot_seq[i] = -1
+            self.slot_pts[i] = None
+            self.holds[i] = 0
+        self.generation += 1
+        self.newest_slot = None
+        self.claimed_slot = None
+
+    def _add_slot(self, shape, dtype):
+        buffer = np.empty(shape, dtype=dtype)
+        view = buffer.view()
+        view.flags.writeable = False
+        self.slots.append(buffer)
+        self.views.append(view)
+        self.slot_seq.append(-1)
+        self.slot_pts.append(None)
+        self.holds.append(0)
+        self.num_slots += 1
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Return (slot_index, buffer) for the writer to fill in place. Must be followed by publish()."""
+        with self.lock:
+            if self.slots[0] is None or self.slots[0].shape != shape or self.slots[0].dtype != dtype:
+                self._allocate(shape, dtype)
+
+            # Reuse the oldest slot that the consumer is not holding and that is not the newest frame
+            free_slots = [i for i in range(self.num_slots) if i != self.newest_slot and i != self.claimed_slot and not self.holds[i]]
+            if not free_slots:
+                self._add_slot(shape, dtype)
+                free_slots = [self.num_slots - 1]
+            index = min(free_slots, key=lambda i: self.slot_seq[i])
+            self.slot_seq[index] = -1
+            return index, self.slots[index]
+
+    def publish(self, index, seq=None, pts=None):
+        """
+        Mark a filled slot as the newest frame.
+
+        seq lets the caller number frames itself (e.g. by decode order when not every
+        decoded frame is written), so claim() still counts the frames that were skipped.
+        pts is the frame's stream timestamp, returned by claim() for pairing with telemetry.
+        """
+        with self.lock:
+            if seq is None:
+                seq = self.next_seq
+            self.slot_seq[index] = seq
+            self.slot_pts[index] = pts
+            self.next_seq = seq + 1
+            self.newest_slot = index
+
+    def claim(self):
+        """
+        Claim the newest published frame without copying.
+
+        Returns:
+            Tuple (frame, seq, pts, dropped)
+            - frame: Read-only view of the newest frame, or None if nothing was published yet
+            - seq: Sequence number of the frame
+            - pts: Stream timestamp the frame was published with
+            - dropped: Frames published since the previous claim that the consumer never saw
+        """
+        with self.lock:
+            if self.newest_slot is None:
+                return None, -1, None, 0
+
+            seq = self.slot_seq[self.newest_slot]
+            dropped = 0
+            if self.last_claimed_seq >= 0 and seq > self.last_claimed_seq:
+                dropped = seq - self.last_claimed_seq - 1
+            self.dropped_total += dropped
+
+            self.claimed_slot = self.newest_slot
+            self.last_claimed_seq = seq
+            return self.views[self.claimed_slot], seq, self.slot_pts[self.claimed_slot], dropped
+
+    def hold(self):
+        """
+        Keep the claimed slot out of reuse after the next claim(), until release() is called with
+        the returned token. The same slot may be held several times (e.g. a frame read twice).
+
+        Returns:
+            Token for release(), or None if nothing was claimed yet
+        """
+        with self.lock:
+            if self.claimed_slot is None:
+                return None
+            self.holds[self.claimed_slot] += 1
+            return self.generation, self.claimed_slot
+
+    def release(self, token):
+        """Give a held slot back to the decoder. Tokens from before a reallocation are ignored."""
+        with self.lock:
+            generation, index = token
+            if generation == self.generation and self.holds[index] > 0:
+                self.holds[index] -= 1
+
+
+class TelemetryIndex:
+    """
+    Recent KLV telemetry keyed by stream PTS, so each frame can be paired with its own metadata.
+
+    The drone stamps every KLV packet with the PTS of the video frame it was captured with.
+    Only the last `lookback` packets are kept.
+    """
+    def __init__(self, lookback=TELEMETRY_LOOKBACK):
+        self.lookback = lookback
+        self.entries = OrderedDict()  # pts -> telemetry dict, oldest first
+
+    def add(self, pts, meta):
+        if pts is None:
+            return
+        self.entries[pts] = meta
+        self.entries.move_to_end(pts)
+        while len(self.entries) > self.lookback:
+            self.entries.popitem(last=False)
+
+    def match(self, pts):
+        """
+        Telemetry for the frame with this PTS: the exact packet if present, otherwise the
+        newest packet captured before it. None if nothing in the window qualifies.
+        """
+        if pts is None:
+            return None
+        meta = self.entries.get(pts)
+        if meta is not None:
+            return meta
+
+        best_pts, best_meta = None, None
+        for entry_pts, entry_meta in self.entries.items():
+            if entry_pts <= pts and (best_pts is None or entry_pts > best_pts):
+                best_pts, best_meta = entry_pts, entry_meta
+        return best_meta
+
+
+def convert_frame_to_bgr(frame, dst, staging=None):
+    """
+    Convert a decoded av.VideoFrame into the preallocated BGR array dst.
+
+    yuv420p frames (what the drone's x264 stream decodes to) are packed into the
+    reusable I420 staging buffer and converted by OpenCV straight into dst, so no
+    per-frame image allocation happens. Other pixel formats fall back to PyAV.
+    """
+    height, width = frame.height, frame.width
+    if frame.format.name != "yuv420p" or staging is None or height % 2 or width % 2:
+        np.copyto(dst, frame.to_ndarray(format="bgr24"))
+        return dst
+
+    y_plane, u_plane, v_plane = frame.planes
+    chroma_h, chroma_w = height // 2, width // 2
+    chroma_size = chroma_h * chroma_w
+    flat = staging.reshape(-1)
+
+    np.copyto(staging[:height], np.frombuffer(y_plane, np.uint8).reshape(-1, y_plane.line_size)[:height, :width])
+    np.copyto(flat[height * width:height * width + chroma_size].reshape(chroma_h, chroma_w),
+              np.frombuffer(u_plane, np.uint8).reshape(-1, u_plane.line_size)[:chroma_h, :chroma_w])
+    np.copyto(flat[height * width + chroma_size:].reshape(chroma_h, chroma_w),
+              np.frombuffer(v_plane, np.uint8).reshape(-1, v_plane.line_size)[:chroma_h, :chroma_w])
+
+    cv2.cvtColor(staging, cv2.COLOR_YUV2BGR_I420, dst=dst)
+    return dst
+
+
+def frame_buffer_shape(height, width, pixel_format):
+    """Array shape used to hold one frame of the given pixel format."""
+    if pixel_format == "bgr24":
+        return (height, width, 3)
+    # Planar YUV 4:2:0 (I420 or NV12) is stored as one (H * 3/2, W) array, as OpenCV and PyAV expect
+    return (height * 3 // 2, width)
+
+
+def copy_frame_to_yuv(frame, dst, pixel_format="yuv420p"):
+    """
+    Copy a decoded av.VideoFrame into the preallocated (H * 3/2, W) array dst as I420 or NV12.
+
+    Only the planes are copied (NV12 just interleaves the chroma); no colour conversion
+    happens unless the decoder produced something other than yuv420p.
+    """
+    if frame.format.name != "yuv420p":
+        frame = frame.reformat(format="yuv420p")
+
+    height, width = frame.height, frame.width
+    y_plane, u_plane, v_plane = frame.planes
+    chroma_h, chroma_w = height // 2, width // 2
+    u = np.frombuffer(u_plane, np.uint8).reshape(-1, u_plane.line_size)[:chroma_h, :chroma_w]
+    v = np.frombuffer(v_plane, np.uint8).reshape(-1, v_plane.line_size)[:chroma_h, :chroma_w]
+
+    np.copyto(dst[:height], np.frombuffer(y_plane, np.uint8).reshape(-1, y_plane.line_size)[:height, :width])
+    if pixel_format == "nv12":
+        uv = dst[height:].reshape(chroma_h, chroma_w, 2)
+        uv[..., 0] = u
+        uv[..., 1] = v
+    else:
+        chroma_size = chroma_h * chroma_w
+        flat = dst.reshape(-1)
+        np.copyto(flat[height * width:height * width + chroma_size].reshape(chroma_h, chroma_w), u)
+        np.copyto(flat[height * width + chroma_size:].reshape(chroma_h, chroma_w), v)
+    return dst
+
+
+def yuv_to_bgr(frame, pixel_format, dst=None):
+    """Convert a (H * 3/2, W) I420 or NV12 array from the receiver into a BGR image for the AI."""
+    code = cv2.COLOR_YUV2BGR_NV12 if pixel_format == "nv12" else cv2.COLOR_YUV2BGR_I420
+    return cv2.cvtColor(frame, code, dst=dst)
+
+
+class DecoderProfile:
+    """
+    Decoder tuning for VideoStreamReceiver.
+
+    thread_type: "AUTO", "FRAME" or "SLICE". The drone encodes with sliced-threads, so SLICE
+        decodes one frame on several cores without the extra frame of delay FRAME threading adds.
+    thread_count: Decoder threads, 0 lets FFmpeg pick one per core.
+    output_format: "bgr24" for OpenCV, or "yuv420p"/"nv12" to keep frames in the decoder's
+        native layout all the way to the WebRTC encoder.
+    """
+    THREAD_TYPES = ("AUTO", "FRAME", "SLICE")
+    OUTPUT_FORMATS = ("bgr24", "yuv420p", "nv12")
+
+    def __init__(self, thread_count=DECODER_THREADS, thread_type=DECODER_THREAD_TYPE, output_format=DECODER_OUTPUT_FORMAT):
+        thread_type = thread_type.upper()
+        if thread_type not in self.THREAD_TYPES:
+            raise ValueError(f"Unknown decoder thread type '{thread_type}', expected one of {self.THREAD_TYPES}")
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError(f"Unknown decoder output format '{output_format}', expected one of {self.OUTPUT_FORMATS}")
+        if thread_count < 0:
+            raise ValueError("Decoder thread count cannot be negative")
+
+        self.thread_count = thread_count
+        self.thread_type = thread_type
+        self.output_format = output_format
+
+    def apply(self, stream):
+        """Configure a PyAV video stream before its first packet is decoded."""
+        stream.thread_type = self.thread_type
+        stream.codec_context.thread_count = self.thread_count
+
+    def __repr__(self):
+        return f"DecoderProfile(threads={self.thread_count}, type={self.thread_type}, output={self.output_format})"
+
+
+def _staging_for(staging, frame):
+    """Return an I420 scratch buffer sized for frame, reusing staging when it already fits."""
+    shape = (frame.height * 3 // 2, frame.width)
+    if staging is None or staging.shape != shape:
+        staging = np.empty(shape, dtype=np.uint8)
+    return staging
+
+
 class VideoStreamReceiver:
-    def __init__(self, stream_url=STREAM_URL):
+    def __init__(self, stream_url=STREAM_URL, buffer_slots=FRAME_BUFFER_SLOTS, decode_on_demand=False, decoder_profile=None, packet_sink=None):
+        """
+        Args:
+            stream_url: MPEG-TS UDP source
+            buffer_slots: Number of preallocated frames in the ring buffer
+            decode_on_demand: Decode every packet (to keep the codec state valid) but only
+                convert the frame that read() actually hands out
+            decoder_profile: DecoderProfile, defaults to the GCS_DECODER_* environment settings
+            packet_sink: Called on the receiver thread as packet_sink(data, pts, time_base, keyframe)
+                with every encoded video packet before it is decoded (e.g. webrtc.write_packet)
+        """
         self.stream_url = stream_url
+        self.decode_on_demand = decode_on_demand
+        self.decoder_profile = decoder_profile or DecoderProfile()
+        self.packet_sink = packet_sink
         self.running = False
         self.thread = None
         self.lock = threading.Lock()
 
         # Shared Variables
-        self.latest_frame = None
+        self.frame_buffer = FrameRingBuffer(buffer_slots)
+        self._decode_staging = None  # Reused I420 scratch buffer for the decoder thread
+        self._read_staging = None    # Same, for conversions done by read() in decode-on-demand mode
+        self._record_frame = None    # BGR scratch frame for recording outside the bgr24 fast path
+
+        # Decode-on-demand: newest decoded (still YUV) frame and its decode sequence number
+        self._pending_frame = None
+        self._decoded_seq = -1
+        self.telemetry_index = TelemetryIndex()
         self.latest_telemetry = {
             "frame_number": -1,
             "error": "Waiting for stream...",
@@ -94,8 +410,8 @@ class VideoStreamReceiver:
                             "rw_timeout": "2000000"
                         },
                     )
-                    container.streams.video[0].thread_type = "AUTO"
-                    print("Stream Connected.")
+                    self.decoder_profile.apply(container.streams.video[0])
+                    print(f"Stream Connected. {self.decoder_profile}")
 
                 # Demux Packets
                 for packet in container.demux():
@@ -105,9 +421,7 @@ class VideoStreamReceiver:
                     # Handle Telemetry (Metadata)
                     if packet.stream.type == "data":
                         try:
-                            payload = bytes(packet)
-                            text = payload.decode("utf-8", errors="ignore")
-                            meta = json.loads(text)
+                            meta = decode_telemetry(bytes(packet))
 
                             # Calculate Latency immediately upon arrival
                             meta["receive_time"] = time.time()
@@ -118,6 +432,7 @@ class VideoStreamReceiver:
 
                             with self.lock:
                                 self.latest_telemetry = meta
+                                self.telemetry_index.add(packet.pts, meta)
 
                         except Exception:
                             pass
@@ -125,16 +440,11 @@ class VideoStreamReceiver:
                     # Handle Video
                     elif packet.stream.type == "video":
                         try:
+                            if self.packet_sink is not None:
+                                self.packet_sink(bytes(packet), packet.pts, packet.time_base, packet.is_keyframe)
                             for frame in packet.decode():
-                                img = frame.to_ndarray(format="bgr24")
-    
-                                with self.lock:
-                                    self.latest_frame = img
-                                
-                                # Write to file if recording
-                                if self.recording and self.video_writer:
-                                    self.video_writer.write(img)
-                                    
+                                self._handle_decoded_frame(frame)
+
                         except (av.FFmpegError, OSError, ValueError) as e:
                             print(f"Video Decode Error: {e}. Continuing...")
                             continue
@@ -152,17 +462,75 @@ class VideoStreamReceiver:
             container.close()
         print("Stream closed.")
 
+    def _handle_decoded_frame(self, frame):
+        """Called on the decoder thread for every decoded frame."""
+        if not self.decode_on_demand:
+            self._decode_staging = _staging_for(self._decode_staging, frame)
+            img = self._write_to_buffer(frame, self._decode_staging)
+        else:
+            # Keep only a reference to the decoded frame; read() converts it if it is ever pulled
+            with self.lock:
+                self._decoded_seq += 1
+                self._pending_frame = frame
+            img = None
+
+        # Write to file if recording (every frame is needed as BGR, so convert regardless of mode)
+        if self.recording and self.video_writer:
+            if img is None or self.decoder_profile.output_format != "bgr24":
+                self._decode_staging = _staging_for(self._decode_staging, frame)
+                if self._record_frame is None or self._record_frame.shape != (frame.height, frame.width, 3):
+                    self._record_frame = np.empty((frame.height, frame.width, 3), dtype=np.uint8)
+                img = convert_frame_to_bgr(frame, self._record_frame, self._decode_staging)
+            self.video_writer.write(img)
+
+    def _write_to_buffer(self, frame, staging, seq=None):
+        """Convert a decoded frame into a free ring slot and publish it. Returns the filled slot."""
+        output_format = self.decoder_profile.output_format
+        index, slot = self.frame_buffer.acquire(frame_buffer_shape(frame.height, frame.width, output_format))
+        if output_format == "bgr24":
+            convert_frame_to_bgr(frame, slot, staging)
+        else:
+            copy_frame_to_yuv(frame, slot, output_format)
+        self.frame_buffer.publish(index, seq, frame.pts)
+        return slot
+
+    @property
+    def frames_dropped(self):
+        """Total frames decoded but never read by the consumer."""
+        return self.frame_buffer.dropped_total
+
     def read(self):
-        """Returns the absolute NEWEST frame and telemetry."""
+        """
+        Returns the absolute NEWEST frame and telemetry.
+
+        The frame is a read-only view into the ring buffer and stays valid until the
+        next read(); copy it if it has to outlive that.
+
+        Returns:
+            Tuple (frame, telemetry, dropped)
+            - frame: Newest decoded frame in decoder_profile.output_format, or None if no frame has arrived yet
+            - telemetry: Telemetry captured with that frame (matched by PTS), or the latest
+              telemetry if no matching packet is in the lookback window
+            - dropped: Number of frames decoded since the last read() that were never read
+        """
+        if self.decode_on_demand:
+            with self.lock:
+                pending, seq = self._pending_frame, self._decoded_seq
+                self._pending_frame = None
+            if pending is not None:
+                # Conversion runs on the caller's thread, only for the frame being consumed
+                self._read_staging = _staging_for(self._read_staging, pending)
+                self._write_to_buffer(pending, self._read_staging, seq)
+
+        frame, _, pts, dropped = self.frame_buffer.claim()
         with self.lock:
-            if self.latest_frame is None:
-                return None, self.latest_telemetry
-            return self.latest_frame, self.latest_telemetry
+            telemetry = self.telemetry_index.match(pts) if frame is not None else None
+            return frame, telemetry or self.latest_telemetry, dropped
 
 
 def display_video_stream():
     """Function to display the incoming video stream with telemetry overlay."""
-    receiver = VideoStreamReceiver()
+    receiver = VideoStreamReceiver(decoder_profile=DecoderProfile(output_format="bgr24"))
     receiver.start()
 
     # Wait for connection
@@ -174,7 +542,7 @@ def display_video_stream():
     try:
         while True:
             # Get latest data (non-blocking)
-            frame, ts_info = receiver.read()
+            frame, ts_info, _ = receiver.read()
 
             if frame is None:
                 time.sleep(0.01)
@@ -288,7 +656,7 @@ def benchmark_video_stream(duration=30):
 
     try:
         while (time.time() - start_time) < duration:
-            frame, info = receiver.read()
+            frame, info, _ = receiver.read()
             if frame is None:
                 continue
 
@@ -310,6 +678,7 @@ def benchmark_video_stream(duration=30):
 
     print("\n" + "=" * 40)
     print(f"Total Samples: {len(latencies)}")
+    print(f"Frames Dropped (decoded but never read): {receiver.frames_dropped}")
     if latencies:
         print(f"Avg Latency: {sum(latencies)/len(latencies):.2f} ms")
         print(f"Min Latency: {min(latencies):.2f} ms")
@@ -7,27 +7,33 @@ import asyncio
 import json
 import traceback
 from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Optional 
 import os
 import websockets
 import cv2
 import time
 import numpy as np
 from database import get_all_objects, delete_object, record_telemetry_data
-from ai.AI import ENGINE, STATE, CURSOR_HANDLER, process_frame, TELEMETRY_RECORDER
+from ai.AI import ENGINE, STATE, CURSOR_HANDLER, TELEMETRY_RECORDER, BATCH_INFERENCE, infer_frame, render_frame, describe_frame
 from dotenv import load_dotenv
 from GeoLocate import calculate_horizontal_distance
-from webrtc import webrtc_router, write_frame, get_peer_connections
-from receiveVideoStream import VideoStreamReceiver
-import threading
+from webrtc import webrtc_router, write_frame, write_packet, set_passthrough, get_peer_connections
+from receiveVideoStream import VideoStreamReceiver, FRAME_BUFFER_SLOTS, yuv_to_bgr
+from broadcastHub import BroadcastHub
+from commandClient import CommandClient
+from framePipeline import FramePipeline, PipelineFrame, STAGE_QUEUE_SIZE
 
 load_dotenv(dotenv_path="../../.env")
 
 VIDEO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai", "error-video.mp4")
+VECTOR_OVERLAYS = os.getenv("GCS_VECTOR_OVERLAYS", "0") == "1"  # Send overlays over /ws/gcs for the frontend to draw instead of burning them into the video
+WEBRTC_PASSTHROUGH = os.getenv("GCS_WEBRTC_PASSTHROUGH", "0") == "1"  # Forward the drone's H.264 to viewers without re-encoding
+if WEBRTC_PASSTHROUGH and not VECTOR_OVERLAYS:
+    print("GCS_WEBRTC_PASSTHROUGH needs GCS_VECTOR_OVERLAYS=1, burned-in overlays have to be encoded. Passthrough disabled.")
+    WEBRTC_PASSTHROUGH = False
+set_passthrough(WEBRTC_PASSTHROUGH)
 
-active_connections: List[WebSocket] = []
-flight_comp_ws: WebSocket = None
+BROADCAST_HUB = BroadcastHub()  # Frontend (/ws/gcs) clients
+COMMAND_CLIENT = CommandClient()  # Acked, prioritized commands to the flight computer
 
 # Video stream configuration
 GCS_VIDEO_PORT = os.getenv("GCS_VIDEO_PORT", 5000)
@@ -38,20 +44,22 @@ newest_telemetry = {}
 
 telemetry_event = asyncio.Event()
 
-process_frame_executor: Optional[ThreadPoolExecutor] = None
-
 async def flight_computer_background_task():
     """Background task that connects to flight computer and listens for telemetry"""
-    global flight_comp_ws
     while True:
         try:
             async with websockets.connect(FLIGHT_COMP_URL) as ws:
-                flight_comp_ws = ws
+                COMMAND_CLIENT.attach(ws)
                 print("Connected to flight computer")   
                 async for message in ws:
                     try:
                         data = json.loads(message)
 
+                        # Command acknowledgements share the socket with telemetry
+                        if data.get("type") == "ack":
+                            COMMAND_CLIENT.handle_ack(data)
+                            continue
+
                         data["is_recording"] = TELEMETRY_RECORDER.is_recording
 
                         data["tracking"] = STATE.tracking # Add tracking state
@@ -75,122 +83,209 @@ async def flight_computer_background_task():
                         await send_data_to_connections(data)
                     except json.JSONDecodeError:
                         continue
+            print("Flight computer closed the connection, reconnecting in 5s")
         except Exception as e:
             print(f"Flight computer connection error: {e}, retrying in 5s")
-            flight_comp_ws = None
-            await asyncio.sleep(5)
+        finally:
+            # Clean close or error: commands awaiting an ack on this socket fail now, not at their timeout
+            COMMAND_CLIENT.detach()
+        await asyncio.sleep(5)
+
+
+FALLBACK_METADATA = {
+    "last_time": -1,
+    "latitude":-1,
+    "longitude":-1,
+    "rth_altitude":-1,
+    "dlat":-1,
+    "dlon":-1,
+    "dalt":-1,
+    "heading":-1,
+    "roll":-1,
+    "pitch":-1,
+    "yaw":-1,
+    "flight_mode":-1,
+    "battery_remaining":-1,
+    "battery_voltage":-1,
+    "altitude" : -1,
+    "timestamp" : -1,
+    "speed" : -1
+}
+
+# Pipeline frames hold their ring slot instead of copying it: 5 stages, 4 queues, and in WebRTC
+# the newest published frame plus one superseded while it was being converted
+PIPELINE_FRAMES_HELD = 5 + 4 * STAGE_QUEUE_SIZE + 2
+video_receiver = VideoStreamReceiver(STREAM_URL, buffer_slots=FRAME_BUFFER_SLOTS + PIPELINE_FRAMES_HELD,
+                                     decode_on_demand=True,  # Only the frames we pull get converted to BGR
+                                     packet_sink=write_packet if WEBRTC_PASSTHROUGH else None)
+
+
+class VideoSource:
+    """Ingest stage: newest live frame, or the looping fallback video while the drone stream is down. Paced to TARGET_FPS."""
+    TARGET_FPS = 60
+
+    def __init__(self, receiver, fallback_path):
+        self.receiver = receiver
+        self.fallback_path = fallback_path
+        self.cap = None
+        self.fallback_available = False
+        self.next_frame_at = 0.0
+        self.loop = None  # Event loop to notify of new telemetry
+
+    def open(self, loop):
+        self.loop = loop
+        self.receiver.start()
+        self.cap = cv2.VideoCapture(self.fallback_path)
+        self.fallback_available = self.cap.isOpened()
+        if not self.fallback_available:
+            print(f"Error. Could not open fallback video: {self.fallback_path}")
+
+    def close(self):
+        self.receiver.stop()
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    def __call__(self):
+        global newest_telemetry
+
+        # --- Rate Limiting ---
+        wait = self.next_frame_at - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_frame_at = time.perf_counter() + 1.0 / self.TARGET_FPS
+
+        # --- Try Reading Live Stream ---
+        frame, metadata, _ = self.receiver.read()
+        pixel_format = self.receiver.decoder_profile.output_format
+        on_release = None
+        if frame is not None:
+            # Keep the ring slot until the pipeline is done with the frame, instead of copying it
+            ring = self.receiver.frame_buffer
+            token = ring.hold()
+            on_release = lambda: ring.release(token)
+
+        # --- Fallback Logic ---
+        if frame is None:
+            pixel_format = "bgr24"
+            if self.fallback_available:
+                ret, file_frame = self.cap.read()
+
+                # Handle End of File (Loop video)
+                if not ret:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, file_frame = self.cap.read()
+
+                if ret:
+                    frame = file_frame
+                    metadata = dict(FALLBACK_METADATA) # Inject dummy metadata
+
+        # --- If live video and mock both fail then wait and retry ---
+        if frame is None:
+            time.sleep(0.1)
+            return None
+
+        newest_telemetry = metadata # Update newest telemetry for flight computer task
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(telemetry_event.set) # Notify waiters new telemetry is available
+        return PipelineFrame(frame, pixel_format, metadata, on_release)
+
+
+def preprocess_stage(item):
+    """Convert YUV frames to BGR for the AI. The original frame is kept for streaming."""
+    item.ai_frame = item.frame if item.pixel_format == "bgr24" else yuv_to_bgr(item.frame, item.pixel_format)
+    return item
+
+
+def infer_stage(item):
+    """
+    YOLO detection or tracker update, overlapping with rendering of the previous frame.
+    Clicks and track selections are handled here, so only this thread starts or ends tracking.
+    """
+    click = CURSOR_HANDLER.click_pos
+    track_id = CURSOR_HANDLER.selected_track_id
+    try:
+        item.inference = infer_frame(item.ai_frame, CURSOR_HANDLER.cursor_pos, item.metadata, click, track_id)
+    except Exception as e:
+        # Keep the video flowing without overlays rather than dropping the frame
+        print(f"Error running inference: {e}")
+        item.inference = None
 
+    if click is not None:
+        CURSOR_HANDLER.clear_click()
+        print("Click cleared")
+    if track_id is not None:
+        CURSOR_HANDLER.clear_track_selection()
+    return item
 
-video_stop_event = threading.Event()
-video_receiver = VideoStreamReceiver(STREAM_URL)
-async def video_streaming_task():
-    """Background task that reads video, processes through AI, and streams via WebRTC"""
-    print("Starting receive video stream background task...")
-    global newest_telemetry
-    # Start Live Receiver
-    video_receiver.start()
-    # Target 60 FPS for the loop
-    target_interval = 1.0 / 60.0
-
-    # Start fallback video once at the beginning
-    cap = cv2.VideoCapture(VIDEO_PATH)
-    fallback_available = cap.isOpened()
-    if not fallback_available:
-        print(f"Error. Could not open fallback video: {VIDEO_PATH}")
+
+_was_tracking = False
+def render_stage(item):
+    """
+    Draw the AI results and choose what to stream.
+
+    When nothing was drawn, the frame is streamed in its original format so the WebRTC
+    encoder needs no colour conversion. With VECTOR_OVERLAYS nothing is ever drawn: the
+    detections and tracking state are broadcast to the frontend instead.
+    """
+    global _was_tracking
+
+    # Get the cursor as late as possible so hover follows the mouse
+    cursor = CURSOR_HANDLER.cursor_pos
 
     try:
-        while not video_stop_event.is_set():
-            loop_start = time.time()
-
-            # --- Try Reading Live Stream ---
-            frame, metadata = video_receiver.read()
-
-            # --- Fallback Logic ---
-            if frame is None:
-                if fallback_available:
-                    ret, file_frame = cap.read()
-
-                    # Handle End of File (Loop video)
-                    if not ret:
-                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        ret, file_frame = cap.read()
-
-                    if ret:
-                        frame = file_frame
-                        # Inject dummy metadata
-                        metadata = {
-                                "last_time": -1,
-                                "latitude":-1,
-                                "longitude":-1,
-                                "rth_altitude":-1,
-                                "dlat":-1,
-                                "dlon":-1,
-                                "dalt":-1,
-                                "heading":-1,
-                                "roll":-1,
-                                "pitch":-1,
-                                "yaw":-1,
-                                "flight_mode":-1,
-                                "battery_remaining":-1,
-                                "battery_voltage":-1,
-                                "altitude" : -1,
-                                "timestamp" : -1,
-                                "speed" : -1
-                        }
-
-            # --- If live video and mock both fail then sleep and retry ---
-            if frame is None:
-                await asyncio.sleep(0.1)
-                continue
-            
-            newest_telemetry = metadata # Update newest telemetry for flight computer task
-            telemetry_event.set() # Notify flight_computer_background_task new telemetry is available
-            previous_tracking_state = False
-            
-            # --- D. AI Processing (Common for both sources) ---
-            try:
-                # Get Cursor/Click data
-                cursor = CURSOR_HANDLER.cursor_pos
-                click = CURSOR_HANDLER.click_pos
-
-                # Run AI (Wait for result)
-                annotated_frame = await asyncio.get_event_loop().run_in_executor(
-                        process_frame_executor, 
-                        lambda: process_frame(frame, metadata, cursor, click) 
-                    )
-                
-                current_tracking_state = STATE.tracking
-                if previous_tracking_state and not current_tracking_state: # Tracking was lost - save recording if previously active
-                    save_current_recording()
-                previous_tracking_state = current_tracking_state
-
-                if click is not None:
-                    CURSOR_HANDLER.clear_click()
-                    print("Click cleared")
-
-                # Send to WebRTC
-                if annotated_frame is not None:
-                    write_frame(annotated_frame)
-
-            except Exception as e:
-                print(f"Error processing frame: {e}")
-                traceback.print_exc()
-
-            # --- E. Rate Limiting ---
-            # Calculates how much time is left in the 1/60th second window
-            elapsed = time.time() - loop_start
-            sleep_time = max(0, target_interval - elapsed)
-            await asyncio.sleep(sleep_time)
+        annotated_frame = None
+        if item.inference is not None:
+            annotated_frame = render_frame(item.ai_frame, item.inference, item.metadata, cursor, draw=not VECTOR_OVERLAYS)
+            if VECTOR_OVERLAYS and VIDEO_SOURCE.loop is not None:
+                overlay = describe_frame(item.inference, item.ai_frame.shape, item.metadata)
+                VIDEO_SOURCE.loop.call_soon_threadsafe(BROADCAST_HUB.broadcast_latest, overlay)
+    except Exception as e:
+        print(f"Error processing frame: {e}")
+        traceback.print_exc()
+        annotated_frame = None
+
+    if _was_tracking and not STATE.tracking: # Tracking was lost - save recording if previously active
+        save_current_recording()
+    _was_tracking = STATE.tracking
+
+    if annotated_frame is not None:
+        item.output_frame, item.output_format = annotated_frame, "bgr24"
+    else:
+        item.output_frame, item.output_format = item.frame, item.pixel_format
+    return item
+
+
+def publish_stage(item):
+    """Send to WebRTC. An unannotated frame is still the ring slot, which WebRTC gives back once it has read it."""
+    on_release = item.take_release() if item.output_frame is item.frame else None
+    write_frame(item.output_frame, item.output_format, on_release)
+    return item
 
+
+VIDEO_SOURCE = VideoSource(video_receiver, VIDEO_PATH)
+VIDEO_PIPELINE = FramePipeline([
+    ("ingest", VIDEO_SOURCE),
+    ("preprocess", preprocess_stage),
+    ("infer", infer_stage),
+    ("render", render_stage),
+    ("publish", publish_stage),
+])
+
+async def video_streaming_task():
+    """Background task that runs the video pipeline: live video (or fallback), AI, then WebRTC"""
+    print("Starting receive video stream background task...")
+    VIDEO_SOURCE.open(asyncio.get_running_loop())
+    VIDEO_PIPELINE.start()
+    try:
+        await asyncio.Event().wait() # Stages run on their own threads until shutdown
     except asyncio.CancelledError:
         print("Video streaming task cancelled.")
-
     finally:
         # Cleanup both sources
         print("Stopping video sources...")
-        video_receiver.stop()
-        if cap.isOpened():
-            cap.release()
+        await asyncio.get_running_loop().run_in_executor(None, VIDEO_PIPELINE.stop)
+        BATCH_INFERENCE.stop()
+        VIDEO_SOURCE.close()
     print("Video streaming task ended.")
 
 async def follows_background_task():
@@ -199,18 +294,22 @@ async def follows_background_task():
         if STATE.tracking:
             if newest_telemetry['mode'] != "Guided":
                 print("Attempting to enter follows mode...")
-                await send_data_to_connections({"command": "set_flight_mode", "mode": "Guided"}, flight_comp_ws)
-                await asyncio.sleep(2) # Wait for mode change (delay on ArduPilot's side)
-                print("Entered Guided mode for follows.")
+                try:
+                    # Acked once the flight computer has the autopilot's answer
+                    await COMMAND_CLIENT.send({"command": "set_flight_mode", "mode": "Guided"})
+                    print("Entered Guided mode for follows.")
+                except Exception as e:
+                    print(f"Failed to enter Guided mode: {e}")
 
             follows_altitude = 15.0 # Hard coding the follows altitude to 15 meters (50 ft) for now
             if STATE.last_target_lat is not None and STATE.last_target_lon is not None:
                 try:
-                    await send_data_to_connections({"command": "move_to_location", "location": {
+                    # Don't wait for the ack: a newer target replaces this one if it is still queued
+                    COMMAND_CLIENT.submit({"command": "move_to_location", "location": {
                             "lat": STATE.last_target_lat,
                             "lon": STATE.last_target_lon,
                             "alt": follows_altitude
-                        }}, flight_comp_ws)
+                        }})
                     print(f"Sent follow command to flight computer: lat {STATE.last_target_lat}, lon {STATE.last_target_lon}, alt {follows_altitude}")
                 except Exception as e:
                     print(f"Failed to send follow command: {e}")
@@ -221,20 +320,14 @@ async def lifespan(app: FastAPI):
     # Start background tasks    
     print("[GCS] Starting background tasks...")
     tasks = [asyncio.create_task(flight_computer_background_task()), asyncio.create_task(video_streaming_task()), asyncio.create_task(follows_background_task())]
-    global process_frame_executor
-    process_frame_executor = ThreadPoolExecutor(max_workers=1)
     yield
 
     print("[GCS] Shutting down...")
     for t in tasks:
         t.cancel()
     await asyncio.gather(*tasks, return_exceptions=True)
+    await BROADCAST_HUB.close()
 
-    video_stop_event.set() # Stop video receiver thread
-
-    if process_frame_executor:
-        process_frame_executor.shutdown(wait=True) # Stop video processing thread pool
-    
     # Close WebRTC peer connections
     peer_connections = get_peer_connections()
     await asyncio.gather(
@@ -257,30 +350,37 @@ app.add_middleware(
 app.include_router(webrtc_router)
 
 # -- Websocket communication --
-async def send_data_to_connections(
-    message: dict, websockets_list: List[WebSocket] = active_connections
-):
-    """Send message to all connected WebSocket clients"""
-    for websocket in websockets_list:
-        try:
-            await websocket.send_text(json.dumps(message))
-        except:
-            if websocket in websockets_list:
-                websockets_list.remove(websocket)
-
-
-async def send_to_flight_comp(message: dict):
-    """Send a JSON command to the flight computer."""
-    global flight_comp_ws
-    if flight_comp_ws is None:
-        raise RuntimeError("Flight computer not connected")
-
-    try:
-        await flight_comp_ws.send(json.dumps(message))
-    except Exception as e:
-        print(f"Failed to send to flight comp: {e}")
-        flight_comp_ws = None
-        raise
+async def send_data_to_connections(message: dict):
+    """Queue message for every frontend client through BROADCAST_HUB. Returns immediately."""
+    BROADCAST_HUB.broadcast(message)
+
+
+# -- Metrics Endpoints --
+@app.get("/metrics/websockets")
+def get_websocket_metrics():
+    """Per-client outbound queue depth, sent and dropped message counts for the frontend websockets"""
+    return BROADCAST_HUB.stats()
+
+@app.get("/metrics/pipeline")
+def get_pipeline_metrics():
+    """Per-stage latency, queue occupancy and dropped frames of the video pipeline, plus ingest-to-publish latency"""
+    return VIDEO_PIPELINE.stats()
+
+@app.get("/metrics/inference")
+def get_inference_metrics():
+    """Batch count, average batch size and wait/predict time of the shared YOLO batching service, plus the detection/tracker cadence and target re-acquisition counts"""
+    return dict(BATCH_INFERENCE.stats(), scheduler=STATE.scheduler.stats(), reacquisition=STATE.reacquisition.stats())
+
+@app.get("/tracks")
+def get_object_tracks():
+    """Every object the multi-object tracker has followed, with its ID and trajectory in frame pixels"""
+    names = ENGINE.model.names
+    return [dict(track, classification=names[track["class_id"]]) for track in STATE.object_tracker.trajectories()]
+
+@app.get("/metrics/commands")
+def get_command_metrics():
+    """Flight computer command round-trip latency and ack/timeout counters"""
+    return COMMAND_CLIENT.stats()
 
 # -- Database Endpoints --
 @app.get("/objects")
@@ -327,7 +427,7 @@ async def set_follow_distance(request: dict = Body(...)):
     if distance is None:
         raise HTTPException(status_code=400, detail="Missing 'distance' in body")
     try:
-        await send_data_to_connections({"command": "set_follow_distance", "distance": distance}, flight_comp_ws)
+        await COMMAND_CLIENT.send({"command": "set_follow_distance", "distance": distance})
         return {"status": 200, "message": f"Follow distance set to {distance} meters"}
     except Exception as e:
         raise HTTPException(
@@ -343,7 +443,7 @@ async def set_flight_mode(request: dict = Body(...)):
     if not mode:
         raise HTTPException(status_code=400, detail="Missing 'mode' in body")
     try:
-        await send_data_to_connections({"command": "set_flight_mode", "mode": mode}, flight_comp_ws)
+        await COMMAND_CLIENT.send({"command": "set_flight_mode", "mode": mode})
         return {"status": 200, "message": f"Flight mode set to {mode}"}
     except Exception as e:
         print("Sent request to change mode but failed at the flight computer.")
@@ -355,7 +455,7 @@ async def stop_following():
     try:
         save_current_recording()
         STATE.reset_tracking()
-        await send_data_to_connections({"command": "stop_following"}, flight_comp_ws)
+        await COMMAND_CLIENT.send({"command": "stop_following"})
         return {"status": 200, "message": "Stopped following the target."}
     except Exception as e:
         raise HTTPException(
@@ -367,7 +467,7 @@ async def stop_following():
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for GCS frontend to send commands and receive telemetry"""
     await websocket.accept()
-    active_connections.append(websocket)
+    BROADCAST_HUB.register(websocket)
     try:
         while True:
             message = await websocket.receive_text()
@@ -377,9 +477,14 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Handle mouse movements and clicks for AI
                 if command_type == "mouse_move":
                     CURSOR_HANDLER.update_cursor(data.get("x"), data.get("y"))
+                elif command_type == "mouse_leave":
+                    CURSOR_HANDLER.clear_cursor()
                 elif command_type == "click":
                     CURSOR_HANDLER.register_click(data.get("x"), data.get("y"))
                     print(f"Registered click at ({data.get('x')}, {data.get('y')})")
+                elif command_type == "select_track" and isinstance(data.get("track_id"), int):
+                    CURSOR_HANDLER.register_track_selection(data["track_id"])
+                    print(f"Registered selection of object #{data['track_id']}")
 
             except json.JSONDecodeError:
                 pass
@@ -393,8 +498,8 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
     finally:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        BROADCAST_HUB.unregister(websocket)
+        CURSOR_HANDLER.clear_cursor() # A closed tab never sends mouse_leave
 
 def save_current_recording():
     """Stop recording and save telemetry data to db if present."""
@@ -10,7 +10,11 @@ import mock_db # Mock database to avoid real DB calls. Simply tests the logic.
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import server
 from server import app, send_data_to_connections
+from broadcastHub import BroadcastHub
+from commandClient import CommandClient, CommandError, CommandSupersededError, CommandTimeoutError
+import asyncio
 
 test_telemetry = {
     "timestamp": '2024-10-01T12:00:00Z',
@@ -110,7 +114,7 @@ async def test_record_endpoint_success(async_client):
 @pytest.mark.asyncio
 async def test_set_flight_mode_endpoint_with_mocked_fc(async_client):
     """Test /setFlightMode using mocked flight computer communication."""
-    with patch('server.send_data_to_connections') as mock_send:
+    with patch('server.COMMAND_CLIENT.send', new_callable=AsyncMock) as mock_send:
         response = await async_client.post("/setFlightMode", json={"mode": "AUTO"})
         assert response.status_code == 200
 
@@ -122,11 +126,18 @@ async def test_set_flight_mode_endpoint_empty_payload(async_client):
     assert response.status_code == 400
 
 
+@pytest.mark.asyncio
+async def test_set_flight_mode_endpoint_flight_computer_disconnected(async_client):
+    """Test /setFlightMode fails cleanly when the flight computer is not connected."""
+    response = await async_client.post("/setFlightMode", json={"mode": "Guided"})
+    assert response.status_code == 500
+
+
 # ------------------ Stop Following Test ------------------
 @pytest.mark.asyncio
 async def test_stop_following_endpoint(async_client):
     """Test /stopFollowing endpoint with mocked flight computer communication."""
-    with patch('server.send_data_to_connections') as mock_send:
+    with patch('server.COMMAND_CLIENT.send', new_callable=AsyncMock) as mock_send:
         response = await async_client.post("/stopFollowing")
         assert response.status_code == 200
 
@@ -134,14 +145,14 @@ async def test_stop_following_endpoint(async_client):
 @pytest.mark.asyncio
 async def test_set_follow_distance_endpoint_with_mocked_fc(async_client):
     """Test /setFollowDistance using mocked flight computer communication."""
-    with patch('server.send_data_to_connections') as mock_send:   
+    with patch('server.COMMAND_CLIENT.send', new_callable=AsyncMock) as mock_send:   
         response = await async_client.post("/setFollowDistance", json={"distance": 10})
         assert response.status_code == 200
 
 @pytest.mark.asyncio
 async def test_set_follow_distance_endpoint_missing_distance(async_client):
     """Test /setFollowDistance with missing distance in payload."""
-    with patch('server.send_data_to_connections') as mock_send:
+    with patch('server.COMMAND_CLIENT.send', new_callable=AsyncMock) as mock_send:
         response = await async_client.post("/setFollowDistance", json={})
         assert response.status_code == 400
 
@@ -158,10 +169,12 @@ async def test_GCS_frontend_telemetry_broadcast():
     """
     # Create mock WebSocket connection (representing React dashboard)
     mock_ws = AsyncMock()
-    mock_connections = [mock_ws]
+    server.BROADCAST_HUB.register(mock_ws)
     
     # Test: GCS broadcasts telemetry to frontend (assumes GCS already has the data)
-    await send_data_to_connections(test_telemetry, mock_connections)
+    await send_data_to_connections(test_telemetry)
+    await asyncio.sleep(0)  # Let the client's sender task run
+    server.BROADCAST_HUB.unregister(mock_ws)
     
     # Verify the telemetry was sent to WebSocket
     mock_ws.send_text.assert_called_once()
@@ -169,4 +182,222 @@ async def test_GCS_frontend_telemetry_broadcast():
     # Verify specific telemetry fields are preserved in transmission
     sent_data = mock_ws.send_text.call_args[0][0]
     parsed_data = json.loads(sent_data) # What frontend receives after parsing
-    assert parsed_data["altitude"] == 150.0 
\ No newline at end of file
+    assert parsed_data["altitude"] == 150.0 
+
+
+# ------------------ Broadcast Hub Tests ------------------
+@pytest.mark.asyncio
+async def test_broadcast_hub_slow_client_does_not_delay_others():
+    """A client stuck in send_text must not hold back telemetry for the other clients."""
+    release_slow = asyncio.Event()
+
+    async def slow_send(text):
+        await release_slow.wait()
+
+    slow_ws = MagicMock()
+    slow_ws.send_text = AsyncMock(side_effect=slow_send)
+    fast_ws = AsyncMock()
+
+    hub = BroadcastHub(max_queue=2)
+    hub.register(slow_ws)
+    hub.register(fast_ws)
+
+    for i in range(5):
+        hub.broadcast({"seq": i})
+        await asyncio.sleep(0)
+
+    assert fast_ws.send_text.call_count == 5
+    assert json.loads(fast_ws.send_text.call_args[0][0])["seq"] == 4
+
+    slow_channel = hub.clients[slow_ws]
+    assert len(slow_channel.queue) == 2  # Bounded, oldest telemetry dropped
+    assert [json.loads(text)["seq"] for text in slow_channel.queue] == [3, 4]
+    assert sorted(client["dropped"] for client in hub.stats()) == [0, 2]
+
+    release_slow.set()
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_hub_overlays_do_not_crowd_out_telemetry():
+    release = asyncio.Event()
+    sent = []
+
+    async def blocked_send(text):
+        await release.wait()
+        sent.append(json.loads(text))
+
+    ws = MagicMock()
+    ws.send_text = AsyncMock(side_effect=blocked_send)
+    hub = BroadcastHub(max_queue=2)
+    hub.register(ws)
+    hub.broadcast({"seq": 0})
+    await asyncio.sleep(0)  # Sender is now stuck on the first message
+
+    hub.broadcast({"seq": 1})
+    for frame in range(30):
+        hub.broadcast_latest({"type": "overlay", "frame_number": frame})
+    hub.broadcast({"seq": 2})
+
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert sent == [{"seq": 0}, {"seq": 1}, {"seq": 2}, {"type": "overlay", "frame_number": 29}]
+    assert hub.stats()[0]["dropped"] == 0
+    assert hub.stats()[0]["superseded"] == 29
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_hub_removes_failed_client():
+    broken_ws = AsyncMock()
+    broken_ws.send_text.side_effect = RuntimeError("socket closed")
+
+    hub = BroadcastHub()
+    hub.register(broken_ws)
+    hub.broadcast(test_telemetry)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert broken_ws not in hub.clients
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_tracks_endpoint(async_client):
+    response = await async_client.get("/tracks")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+@pytest.mark.asyncio
+async def test_websocket_metrics_endpoint(async_client):
+    response = await async_client.get("/metrics/websockets")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+# ------------------ Command Client Tests ------------------
+@pytest.mark.asyncio
+async def test_command_client_resolves_ack_and_records_latency(mock_flight_computer):
+    client = CommandClient()
+    client.attach(mock_flight_computer)
+
+    send_task = asyncio.create_task(client.send({"command": "set_flight_mode", "mode": "Guided"}))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    sent = json.loads(mock_flight_computer.send.call_args[0][0])
+    assert sent["command"] == "set_flight_mode"
+    client.handle_ack({"type": "ack", "request_id": sent["request_id"], "status": "ok"})
+
+    ack = await send_task
+    assert ack["status"] == "ok"
+    assert client.stats()["round_trip"]["set_flight_mode"]["count"] == 1
+    client.detach()
+
+
+@pytest.mark.asyncio
+async def test_command_client_priority_and_superseded_follow(mock_flight_computer):
+    client = CommandClient()
+    client.attach(mock_flight_computer)
+
+    # Queue before the sender task gets to run
+    stale = client.submit({"command": "move_to_location", "location": {"lat": 1, "lon": 1, "alt": 15}})
+    newest = client.submit({"command": "move_to_location", "location": {"lat": 2, "lon": 2, "alt": 15}})
+    client.submit({"command": "set_flight_mode", "mode": "Guided"})
+    await asyncio.sleep(0)
+
+    with pytest.raises(CommandSupersededError):
+        await stale.future
+
+    sent = [json.loads(call[0][0]) for call in mock_flight_computer.send.call_args_list]
+    assert [message["command"] for message in sent] == ["set_flight_mode", "move_to_location"]
+    assert sent[1]["request_id"] == newest.request_id
+    client.detach()
+
+
+@pytest.mark.asyncio
+async def test_command_client_timeout(mock_flight_computer):
+    client = CommandClient()
+    client.attach(mock_flight_computer)
+
+    with pytest.raises(CommandTimeoutError):
+        await client.send({"command": "stop_following"}, timeout=0.01)
+    assert client.stats()["timeouts"] == 1
+    client.detach()
+
+
+@pytest.mark.asyncio
+async def test_command_client_expires_unacked_submitted_command(mock_flight_computer):
+    client = CommandClient(timeout=0.01)
+    client.attach(mock_flight_computer)
+
+    pending = client.submit({"command": "set_flight_mode", "mode": "Guided"})
+    await asyncio.sleep(0)
+    assert client.stats()["in_flight"] == 1
+
+    # The ack never arrives and nobody awaits the command
+    with pytest.raises(CommandTimeoutError):
+        await asyncio.wait_for(pending.future, 1)
+    assert client.stats()["in_flight"] == 0
+    assert client.stats()["timeouts"] == 1
+    client.detach()
+
+
+@pytest.mark.asyncio
+async def test_command_client_reattach_replaces_sender(mock_flight_computer):
+    client = CommandClient()
+    client.attach(mock_flight_computer)
+    old_sender = client._sender_task
+    send_task = asyncio.create_task(client.send({"command": "set_flight_mode", "mode": "Guided"}))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    new_ws = MagicMock()
+    new_ws.send = AsyncMock()
+    client.attach(new_ws)
+    await asyncio.sleep(0)
+    assert old_sender.cancelled()
+    with pytest.raises(CommandError):  # Its ack would have come on the old socket
+        await send_task
+    client.detach()
+
+
+@pytest.mark.asyncio
+async def test_flight_computer_clean_close_detaches_commands():
+    class ClosingSocket:
+        """Flight computer websocket that closes cleanly without sending anything"""
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, *exc):
+            return False
+        def __aiter__(self):
+            return self
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+    with patch.object(server.websockets, "connect", return_value=ClosingSocket()), \
+            patch.object(server.COMMAND_CLIENT, "attach") as attach, \
+            patch.object(server.COMMAND_CLIENT, "detach") as detach, \
+            patch.object(server.asyncio, "sleep", AsyncMock(side_effect=asyncio.CancelledError)):
+        with pytest.raises(asyncio.CancelledError):
+            await server.flight_computer_background_task()
+    attach.assert_called_once()
+    detach.assert_called_once()
+
+
+# ------------------ Video Pipeline Tests ------------------
+def test_clicks_are_handled_by_the_infer_stage():
+    server.CURSOR_HANDLER.register_click(10, 20)
+    server.CURSOR_HANDLER.register_track_selection(3)
+    item = server.PipelineFrame(None, "bgr24", {})
+    item.ai_frame = object()
+    with patch.object(server, "infer_frame", return_value=("detection", None)) as infer, \
+         patch.object(server, "render_frame", return_value=None) as render:
+        server.render_stage(server.infer_stage(item))
+
+    assert infer.call_args.args[3:] == ((10, 20), 3)
+    assert server.CURSOR_HANDLER.click_pos is None
+    assert server.CURSOR_HANDLER.selected_track_id is None
+    assert render.call_args.args[3:] == (server.CURSOR_HANDLER.cursor_pos,)  # Render only reads the cursor
@@ -0,0 +1,190 @@
+import pytest
+import threading
+import time
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from framePipeline import FramePipeline, PipelineFrame, StageQueue
+
+# ------------------ Fixtures ------------------
+@pytest.fixture
+def counting_source():
+    """Source stage producing numbered frames until it has produced `limit` of them."""
+    class Source:
+        def __init__(self, limit=20):
+            self.limit = limit
+            self.count = 0
+
+        def __call__(self):
+            if self.count >= self.limit:
+                time.sleep(0.01)
+                return None
+            self.count += 1
+            return PipelineFrame(self.count, "bgr24", {"frame_number": self.count})
+    return Source()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+# ------------------ Stage Queue Tests ------------------
+def test_stage_queue_drops_oldest_when_full():
+    queue = StageQueue("test", maxsize=2)
+    for value in range(5):
+        queue.put(value)
+    assert queue.dropped == 3
+    assert queue.get(timeout=0) == 3
+    assert queue.get(timeout=0) == 4
+    assert queue.get(timeout=0.01) is None
+
+
+def test_stage_queue_close_wakes_consumer():
+    queue = StageQueue("test")
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get(timeout=5)))
+    consumer.start()
+    queue.close()
+    consumer.join(timeout=1)
+    assert not consumer.is_alive()
+    assert result == [None]
+
+# ------------------ Pipeline Tests ------------------
+def test_pipeline_keeps_frame_order(counting_source):
+    published = []
+    def double(item):
+        item.frame *= 2
+        return item
+    def publish(item):
+        published.append(item.frame)
+        return item
+
+    pipeline = FramePipeline([("ingest", counting_source), ("double", double), ("publish", publish)], queue_size=100)
+    pipeline.start()
+    try:
+        assert wait_for(lambda: len(published) == 20)
+    finally:
+        pipeline.stop()
+    assert published == [2 * n for n in range(1, 21)]
+    assert not pipeline.running
+
+
+def test_pipeline_overlaps_stages():
+    """Two 20 ms stages in series take ~40 ms per frame, pipelined they deliver one frame per ~20 ms."""
+    source_frames = iter(range(10))
+    def source():
+        value = next(source_frames, None)
+        if value is None:
+            time.sleep(0.01)
+            return None
+        return PipelineFrame(value, "bgr24", {})
+    def slow(item):
+        time.sleep(0.02)
+        return item
+    published = []
+
+    pipeline = FramePipeline([("ingest", source), ("infer", slow), ("render", slow), ("publish", lambda item: published.append(item) or item)], queue_size=10)
+    start = time.perf_counter()
+    pipeline.start()
+    try:
+        assert wait_for(lambda: len(published) == 10)
+    finally:
+        pipeline.stop()
+    assert time.perf_counter() - start < 10 * 0.04
+
+
+def test_slow_stage_drops_stale_frames(counting_source):
+    published = []
+    def slow(item):
+        time.sleep(0.02)
+        return item
+
+    counting_source.limit = 200
+    pipeline = FramePipeline([("ingest", counting_source), ("infer", slow), ("publish", lambda item: published.append(item.frame) or item)])
+    pipeline.start()
+    try:
+        assert wait_for(lambda: counting_source.count == 200)
+        time.sleep(0.1)
+    finally:
+        pipeline.stop()
+
+    stats = pipeline.stats()
+    assert stats["queues"][0]["dropped"] > 0
+    assert len(published) < 200
+    assert published == sorted(published)
+
+
+def test_stage_error_does_not_stop_pipeline(counting_source):
+    published = []
+    def flaky(item):
+        if item.frame == 3:
+            raise ValueError("bad frame")
+        return item
+
+    pipeline = FramePipeline([("ingest", counting_source), ("flaky", flaky), ("publish", lambda item: published.append(item.frame) or item)], queue_size=100)
+    pipeline.start()
+    try:
+        assert wait_for(lambda: len(published) == 19)
+    finally:
+        pipeline.stop()
+    assert 3 not in published
+    assert pipeline.stats()["stages"][1]["errors"] == 1
+
+
+def test_every_frame_is_released_once(counting_source):
+    released = []
+    produce = counting_source.__call__
+    def source():
+        item = produce()
+        if item is not None:
+            item.on_release = lambda number=item.frame: released.append(number)
+        return item
+
+    published, taken = [], []
+    def publish(item):
+        published.append((item.frame, item.frame in released))
+        if item.frame % 2 == 0:
+            taken.append(item.take_release())  # Handed on, like a ring slot published to WebRTC
+        return item
+
+    counting_source.limit = 100
+    stages = [("ingest", source), ("filter", lambda item: item if item.frame % 3 else None), ("slow", lambda item: time.sleep(0.005) or item), ("publish", publish)]
+    pipeline = FramePipeline(stages)
+    pipeline.start()
+    try:
+        assert wait_for(lambda: counting_source.count == 100)
+        time.sleep(0.1)
+    finally:
+        pipeline.stop()
+
+    assert published and not any(was_released for _, was_released in published)
+    assert not any(number in released for number, _ in published if number % 2 == 0)
+    for release in taken:
+        release()
+    assert sorted(released) == list(range(1, 101))  # Dropped, filtered, published and taken over alike
+
+
+def test_pipeline_stats(counting_source):
+    pipeline = FramePipeline([("ingest", counting_source), ("publish", lambda item: item)], queue_size=100)
+    pipeline.start()
+    try:
+        assert wait_for(lambda: pipeline.frames_completed == 20)
+    finally:
+        pipeline.stop()
+
+    stats = pipeline.stats()
+    assert stats["frames_completed"] == 20
+    assert stats["end_to_end"]["count"] == 20
+    assert stats["end_to_end"]["p95_ms"] >= 0
+    assert [stage["name"] for stage in stats["stages"]] == ["ingest", "publish"]
+    assert stats["stages"][0]["processed"] == 20
+    assert stats["queues"] == [{"name": "ingest->publish", "depth": 0, "capacity": 100, "dropped": 0}]
+
+
+def test_pipeline_needs_two_stages(counting_source):
+    with pytest.raises(ValueError):
+        FramePipeline([("ingest", counting_source)])
@@ -0,0 +1,274 @@
+import pytest
+import numpy as np
+import av
+import json
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+from klvTelemetry import encode_telemetry, decode_telemetry, TELEMETRY_KEY
+from receiveVideoStream import FrameRingBuffer, TelemetryIndex, VideoStreamReceiver, DecoderProfile, convert_frame_to_bgr, frame_buffer_shape, yuv_to_bgr
+
+FRAME_SHAPE = (72, 128, 3)
+
+# ------------------ Fixtures ------------------
+@pytest.fixture
+def ring():
+    return FrameRingBuffer(num_slots=4)
+
+
+@pytest.fixture
+def yuv_frame():
+    """Smooth synthetic image decoded the same way the drone's H.264 stream is (yuv420p)."""
+    x = np.linspace(0, 255, FRAME_SHAPE[1], dtype=np.uint8)
+    bgr = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    bgr[..., 0] = x
+    bgr[..., 1] = x[::-1]
+    bgr[..., 2] = 128
+    return av.VideoFrame.from_ndarray(bgr, format="bgr24").reformat(format="yuv420p")
+
+
+def write_frames(ring, count, value_start=0):
+    for value in range(value_start, value_start + count):
+        index, slot = ring.acquire(FRAME_SHAPE)
+        slot[:] = value
+        ring.publish(index)
+
+# ------------------ Ring Buffer Tests ------------------
+def test_claim_before_any_frame(ring):
+    frame, seq, _, dropped = ring.claim()
+    assert frame is None
+    assert seq == -1
+    assert dropped == 0
+
+
+def test_claim_returns_newest_and_counts_dropped(ring):
+    write_frames(ring, 5)
+    frame, seq, _, dropped = ring.claim()
+    assert seq == 4
+    assert frame[0, 0, 0] == 4
+    assert dropped == 0  # Nothing to compare against on the first read
+
+    write_frames(ring, 3, value_start=5)
+    frame, seq, _, dropped = ring.claim()
+    assert seq == 7
+    assert dropped == 2
+    assert ring.dropped_total == 2
+
+
+def test_claimed_slot_is_not_overwritten(ring):
+    write_frames(ring, 1)
+    frame, _, _, _ = ring.claim()
+
+    # Writer keeps producing far more frames than there are slots
+    write_frames(ring, 20, value_start=1)
+    assert frame[0, 0, 0] == 0
+
+
+def test_claimed_frame_is_read_only(ring):
+    write_frames(ring, 1)
+    frame, _, _, _ = ring.claim()
+    with pytest.raises(ValueError):
+        frame[0, 0, 0] = 1
+
+
+def test_slots_are_reused_without_allocation(ring):
+    write_frames(ring, 1)
+    buffer_ids = {id(slot) for slot in ring.slots}
+    write_frames(ring, 50)
+    assert {id(slot) for slot in ring.slots} == buffer_ids
+
+
+def test_resolution_change_reallocates(ring):
+    write_frames(ring, 2)
+    index, slot = ring.acquire((36, 64, 3))
+    ring.publish(index)
+    frame, _, _, _ = ring.claim()
+    assert frame.shape == (36, 64, 3)
+
+
+def test_held_slots_are_not_reused_until_released(ring):
+    write_frames(ring, 1)
+    ring.claim()
+    token = ring.hold()
+    held = ring.slots[token[1]]
+
+    write_frames(ring, 20, value_start=1)
+    ring.claim()  # Claiming another frame does not give the held slot back
+    write_frames(ring, 20, value_start=21)
+    assert held[0, 0, 0] == 0
+
+    ring.release(token)
+    write_frames(ring, 20, value_start=41)
+    assert held[0, 0, 0] != 0
+
+
+def test_ring_grows_when_every_slot_is_held(ring):
+    tokens = []
+    for value in range(6):
+        write_frames(ring, 1, value_start=value)
+        ring.claim()
+        tokens.append(ring.hold())
+    assert ring.num_slots > 4
+    assert [ring.slots[index][0, 0, 0] for _, index in tokens] == list(range(6))
+
+
+def test_release_after_reallocation_is_ignored(ring):
+    write_frames(ring, 1)
+    ring.claim()
+    token = ring.hold()
+    ring.acquire((36, 64, 3))  # Resolution change drops every hold
+    ring.release(token)
+    assert ring.holds == [0] * ring.num_slots
+
+
+def test_requires_three_slots():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(num_slots=2)
+
+# ------------------ Colour Conversion Tests ------------------
+def test_convert_frame_to_bgr_matches_pyav(yuv_frame):
+    dst = np.empty(FRAME_SHAPE, dtype=np.uint8)
+    staging = np.empty((FRAME_SHAPE[0] * 3 // 2, FRAME_SHAPE[1]), dtype=np.uint8)
+
+    result = convert_frame_to_bgr(yuv_frame, dst, staging)
+
+    assert result is dst
+    reference = yuv_frame.to_ndarray(format="bgr24").astype(np.int16)
+    assert np.abs(reference - dst).max() <= 4
+
+
+# ------------------ Decode-On-Demand Tests ------------------
+def test_decode_on_demand_converts_only_read_frames(yuv_frame):
+    receiver = VideoStreamReceiver(decode_on_demand=True)
+    for _ in range(5):
+        receiver._handle_decoded_frame(yuv_frame)
+
+    # Nothing converted until the consumer asks for a frame
+    assert receiver.frame_buffer.newest_slot is None
+
+    frame, _, dropped = receiver.read()
+    assert frame.shape == FRAME_SHAPE
+    assert dropped == 0
+
+    for _ in range(3):
+        receiver._handle_decoded_frame(yuv_frame)
+    _, _, dropped = receiver.read()
+    assert dropped == 2
+    assert receiver.frames_dropped == 2
+
+
+def test_decode_on_demand_rereads_same_frame_without_new_data(yuv_frame):
+    receiver = VideoStreamReceiver(decode_on_demand=True)
+    receiver._handle_decoded_frame(yuv_frame)
+    first, _, _ = receiver.read()
+    second, _, dropped = receiver.read()
+    assert second is first
+    assert dropped == 0
+
+
+# ------------------ Decoder Profile Tests ------------------
+def test_decoder_profile_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        DecoderProfile(thread_type="GPU")
+    with pytest.raises(ValueError):
+        DecoderProfile(output_format="rgb48")
+
+
+@pytest.mark.parametrize("pixel_format", ["yuv420p", "nv12"])
+def test_yuv_output_round_trips_to_bgr(yuv_frame, pixel_format):
+    receiver = VideoStreamReceiver(decoder_profile=DecoderProfile(output_format=pixel_format))
+    receiver._handle_decoded_frame(yuv_frame)
+    frame, _, _ = receiver.read()
+
+    assert frame.shape == frame_buffer_shape(FRAME_SHAPE[0], FRAME_SHAPE[1], pixel_format)
+    reference = yuv_frame.to_ndarray(format="bgr24").astype(np.int16)
+    assert np.abs(reference - yuv_to_bgr(frame, pixel_format)).max() <= 4
+
+
+# ------------------ Telemetry Pairing Tests ------------------
+def test_telemetry_index_exact_and_previous_match():
+    index = TelemetryIndex(lookback=4)
+    for pts in (1500, 3000, 4500):
+        index.add(pts, {"pts": pts})
+
+    assert index.match(3000)["pts"] == 3000
+    assert index.match(4000)["pts"] == 3000  # Newest packet captured before the frame
+    assert index.match(1000) is None
+    assert index.match(None) is None
+
+
+def test_telemetry_index_is_bounded():
+    index = TelemetryIndex(lookback=2)
+    for pts in (1500, 3000, 4500):
+        index.add(pts, {"pts": pts})
+    assert list(index.entries) == [3000, 4500]
+    assert index.match(1500) is None
+
+
+def test_read_pairs_frame_with_its_own_telemetry(yuv_frame):
+    receiver = VideoStreamReceiver()
+    for pts in (1500, 3000, 4500):
+        receiver.telemetry_index.add(pts, {"frame_number": pts // 1500})
+    receiver.latest_telemetry = {"frame_number": 3}
+
+    yuv_frame.pts = 3000
+    receiver._handle_decoded_frame(yuv_frame)
+    _, telemetry, _ = receiver.read()
+    assert telemetry["frame_number"] == 2
+
+
+# ------------------ KLV Telemetry Format Tests ------------------
+drone_telemetry = {
+    "last_time": 1730000000.25,
+    "latitude": 51.0779123,
+    "longitude": -114.1305456,
+    "rth_altitude": 30.5,
+    "dlat": 1.5,
+    "dlon": -0.5,
+    "dalt": 0.0,
+    "heading": 270.0,
+    "roll": 0.01,
+    "pitch": -0.02,
+    "yaw": 3.1,
+    "flight_mode": 4.0,
+    "battery_remaining": None,
+    "battery_voltage": None,
+}
+
+
+def test_klv_round_trip():
+    packet = encode_telemetry(42, 1730000000.5, drone_telemetry)
+    meta = decode_telemetry(packet)
+
+    assert packet.startswith(TELEMETRY_KEY)
+    assert meta["frame_number"] == 42
+    assert meta["video_timestamp"] == 1730000000.5
+    assert meta["latitude"] == drone_telemetry["latitude"]
+    assert meta["longitude"] == drone_telemetry["longitude"]
+    assert meta["roll"] == pytest.approx(0.01)
+    assert meta["flight_mode"] == 4
+    assert meta["battery_remaining"] is None
+
+
+def test_klv_is_smaller_than_json():
+    klv_data = {"frame_number": 42, "video_timestamp": 1730000000.5}
+    klv_data.update(drone_telemetry)
+    assert len(encode_telemetry(42, 1730000000.5, drone_telemetry)) < len(json.dumps(klv_data)) / 3
+
+
+def test_klv_decodes_legacy_json():
+    legacy = json.dumps({"frame_number": 7, "video_timestamp": 1.0, "latitude": 51.0}).encode("utf-8")
+    assert decode_telemetry(legacy)["frame_number"] == 7
+
+
+def test_klv_rejects_truncated_and_unknown_version():
+    packet = encode_telemetry(1, 1.0, drone_telemetry)
+    with pytest.raises(ValueError):
+        decode_telemetry(packet[:-10])
+
+    length_offset = len(TELEMETRY_KEY)
+    future = bytearray(packet)
+    future[length_offset + 1] = 99
+    with pytest.raises(ValueError):
+        decode_telemetry(bytes(future))
@@ -0,0 +1,250 @@
+import pytest
+import asyncio
+import time
+import numpy as np
+from fractions import Fraction
+from aiortc import RTCPeerConnection, RTCRtpSender
+from unittest.mock import patch
+from av import Packet
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import webrtc
+from webrtc import AIVideoStreamTrack, RelayVideoStreamTrack, SharedEncoder, RTCOffer, handle_offer, set_passthrough, write_frame, write_packet
+
+TS_TIME_BASE = Fraction(1, 90000)  # MPEG-TS PTS units
+FRAME_TICKS = 1500                 # 60 fps
+
+
+def send_packets(start, count, keyframe_every=None):
+    """Write H.264-like packets as the receiver thread would, first one a keyframe unless keyframe_every is given"""
+    for i in range(start, start + count):
+        keyframe = i == start if keyframe_every is None else i % keyframe_every == 0
+        write_packet(bytes([0, 0, 0, 1, 0x65 if keyframe else 0x41, i % 256]), i * FRAME_TICKS, TS_TIME_BASE, keyframe)
+
+
+def moving_frame(step):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:, (step * 4) % 64:] = 200
+    return frame
+
+
+# ------------------ Published Frame Tests ------------------
+@pytest.mark.asyncio
+async def test_track_sends_each_frame_once():
+    write_frame(moving_frame(0))
+    track = AIVideoStreamTrack()
+    first = await asyncio.wait_for(track.recv(), 1)
+
+    # Nothing new published: recv waits instead of re-sending the same frame
+    pending = asyncio.ensure_future(track.recv())
+    await asyncio.sleep(0.1)
+    assert not pending.done()
+
+    write_frame(moving_frame(1))
+    second = await asyncio.wait_for(pending, 1)
+    assert second is not first
+    assert second.pts > first.pts
+    assert second.format.name == "yuv420p"
+    track.stop()
+
+
+@pytest.mark.asyncio
+async def test_viewers_share_one_conversion_per_frame():
+    frame = moving_frame(2)
+    write_frame(frame)
+    tracks = [AIVideoStreamTrack(), AIVideoStreamTrack()]
+    first, second = [await asyncio.wait_for(track.recv(), 1) for track in tracks]
+    assert first is second
+
+    published = webrtc._frames.latest()
+    assert not published.array.flags.writeable
+    assert frame.flags.writeable  # The caller's array is left alone
+    for track in tracks:
+        track.stop()
+
+
+def uniform_frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+@pytest.mark.asyncio
+async def test_borrowed_frame_is_converted_before_its_slot_is_reused():
+    slot = uniform_frame(50)
+    released = []
+    write_frame(slot, on_release=lambda: released.append(True))
+    track = AIVideoStreamTrack()
+    sent = await asyncio.wait_for(track.recv(), 1)
+    assert released  # Given back as soon as it was converted
+
+    slot[:] = 250  # Decoder reuses the slot
+    assert abs(int(sent.to_ndarray(format="bgr24").mean()) - 50) <= 6
+    track.stop()
+
+
+@pytest.mark.asyncio
+async def test_superseded_borrowed_frame_is_never_read():
+    track = AIVideoStreamTrack()
+    await asyncio.wait_for(track.recv(), 1)  # Whatever was published before
+
+    slot = uniform_frame(50)
+    released = []
+    write_frame(slot, on_release=lambda: released.append(True))
+    stale = webrtc._frames.latest()
+    write_frame(uniform_frame(120))  # Published before any viewer converted the first one
+    assert released
+    slot[:] = 250  # Decoder reuses the slot
+
+    assert stale.video_frame() is None
+    sent = await asyncio.wait_for(track.recv(), 1)
+    assert abs(int(sent.to_ndarray(format="bgr24").mean()) - 120) <= 6
+    track.stop()
+
+
+# ------------------ Passthrough Tests ------------------
+@pytest.mark.asyncio
+async def test_passthrough_starts_at_keyframe():
+    track = RelayVideoStreamTrack(SharedEncoder(), passthrough=True)
+    write_packet(b"\x00\x00\x00\x01\x41", 0, TS_TIME_BASE, False)  # Joined mid-GOP: cannot be decoded
+    send_packets(1, 3)
+    await asyncio.sleep(0)
+
+    packets = [await track.recv() for _ in range(3)]
+    assert all(isinstance(packet, Packet) for packet in packets)
+    assert [bytes(packet)[-1] for packet in packets] == [1, 2, 3]
+    assert [packet.pts - packets[0].pts for packet in packets] == [0, FRAME_TICKS, 2 * FRAME_TICKS]
+    assert track.packets_skipped == 1
+    track.stop()
+
+
+@pytest.mark.asyncio
+async def test_passthrough_slow_viewer_skips_to_next_keyframe():
+    track = RelayVideoStreamTrack(SharedEncoder(), passthrough=True)
+    send_packets(0, webrtc.RELAY_QUEUE + 5, keyframe_every=webrtc.RELAY_QUEUE + 2)
+    await asyncio.sleep(0)
+
+    packet = await track.recv()
+    assert bytes(packet)[-1] == webrtc.RELAY_QUEUE + 2
+    assert track._packets.qsize() == 2
+    track.stop()
+
+
+@pytest.mark.asyncio
+async def test_passthrough_timestamps_keep_increasing_after_stream_restart():
+    track = RelayVideoStreamTrack(SharedEncoder(), passthrough=True)
+    send_packets(1000, 2)
+    await asyncio.sleep(0)
+    first = [await track.recv() for _ in range(2)]
+
+    send_packets(0, 1)  # Drone restarted, PTS went back
+    await asyncio.sleep(0)
+    restarted = await track.recv()
+    assert restarted.pts > first[1].pts
+    track.stop()
+
+
+@pytest.mark.asyncio
+async def test_passthrough_uses_relay_while_stream_is_down():
+    encoder = SharedEncoder(fps=60)
+    write_frame(moving_frame(0))
+    track = RelayVideoStreamTrack(encoder, passthrough=True)
+
+    packet = await asyncio.wait_for(track.recv(), 2)
+    assert packet.is_keyframe  # H.264 from the shared encoder
+    assert track._source == "encoder"
+
+    send_packets(0, 1)  # Drone stream back: its packets take over at its keyframe
+    await asyncio.sleep(0)
+    assert not track.wants_encoded()
+    assert bytes(await track.recv())[-1] == 0
+    track.stop()
+    assert track not in webrtc._passthrough_tracks
+
+
+# ------------------ Relay Tests ------------------
+@pytest.mark.asyncio
+async def test_relay_encodes_once_for_all_viewers():
+    encoder = SharedEncoder(fps=60)
+    write_frame(moving_frame(0))
+    viewers = [RelayVideoStreamTrack(encoder) for _ in range(3)]
+
+    received = [[] for _ in viewers]
+    for step in range(1, 6):
+        write_frame(moving_frame(step))
+        for packets, viewer in zip(received, viewers):
+            packets.append(bytes(await asyncio.wait_for(viewer.recv(), 2)))
+
+    assert received[0] == received[1] == received[2]
+    assert encoder.frames_encoded <= 6  # One encode per new frame, not one per viewer
+    assert encoder.stats()["viewers"] == 3
+    for viewer in viewers:
+        viewer.stop()
+    assert encoder.stats()["viewers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_relay_keyframe_requests_are_merged():
+    encoder = SharedEncoder(fps=60)
+    write_frame(moving_frame(0))
+    viewers = [RelayVideoStreamTrack(encoder) for _ in range(3)]
+    assert (await asyncio.wait_for(viewers[0].recv(), 2)).is_keyframe
+
+    # Picture loss reported by every viewer at once: one keyframe, after the minimum interval
+    for viewer in viewers:
+        viewer.request_keyframe()
+    start = time.time()
+    step = 1
+    while True:
+        write_frame(moving_frame(step))
+        step += 1
+        packet = await asyncio.wait_for(viewers[0].recv(), 2)
+        if packet.is_keyframe:
+            break
+    assert time.time() - start >= SharedEncoder.KEYFRAME_MIN_INTERVAL - 0.1
+    assert encoder.keyframes == 2
+    for viewer in viewers:
+        viewer.stop()
+
+
+async def negotiate(relay, passthrough):
+    """Answer a browser-like offer. Returns the answer SDP and the track sent to the viewer."""
+    viewer = RTCPeerConnection()
+    viewer.addTransceiver("video", direction="recvonly")
+    await viewer.setLocalDescription(await viewer.createOffer())
+
+    set_passthrough(passthrough)
+    try:
+        with patch.object(webrtc, "RELAY", relay):
+            answer = await handle_offer(RTCOffer(sdp=viewer.localDescription.sdp, type=viewer.localDescription.type))
+    finally:
+        set_passthrough(False)
+
+    tracks = []
+    for pc in list(webrtc.get_peer_connections()):
+        for sender in pc.getSenders():
+            tracks.append(sender.track)
+            sender.track.stop()
+        await pc.close()
+        webrtc.get_peer_connections().discard(pc)
+    await viewer.close()
+    return answer["sdp"], tracks[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("relay, passthrough", [(True, False), (False, True)])
+async def test_offer_negotiates_h264(relay, passthrough):
+    sdp, track = await negotiate(relay, passthrough)
+    codecs = [line for line in sdp.splitlines() if line.startswith("a=rtpmap")]
+    assert codecs and all("H264" in line for line in codecs)
+    assert isinstance(track, RelayVideoStreamTrack)
+
+
+@pytest.mark.asyncio
+async def test_offer_encodes_per_viewer_without_relay():
+    _, track = await negotiate(False, False)
+    assert isinstance(track, AIVideoStreamTrack)
+
+
+def test_aiortc_keyframe_hook_exists():
+    """Relay and passthrough replace this private RTCRtpSender method; an aiortc upgrade must keep it"""
+    assert callable(getattr(RTCRtpSender, "_send_keyframe", None))
@@ -1,53 +1,182 @@
 """WebRTC functionality for streaming AI-processed video frames."""
 from fastapi import APIRouter
-from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
-from av import VideoFrame
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription, RTCRtpSender
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
+from av import CodecContext, Packet, VideoFrame
+from av.video.frame import PictureType
+from fractions import Fraction
 from pydantic import BaseModel
-import cv2
+import asyncio
+import os
 import time
 import numpy as np
 import traceback
 import threading
 
-# Frame buffer for video streaming
-_frame_lock = threading.Lock()
-_current_frame = None
-
 # WebRTC peer connections
 _peer_connections = set()
 
+# Streaming: frames are sent as they are published, at most MAX_FPS a second
+MAX_FPS = int(os.getenv("GCS_WEBRTC_FPS", 30))
+
+# Relay: frames are encoded once and the packets sent to every viewer (off by default: aiortc encodes per
+# viewer and adapts each one's bitrate). Relay and passthrough replace aiortc's private RTCRtpSender._send_keyframe
+RELAY = os.getenv("GCS_WEBRTC_RELAY", "0") == "1"
+RELAY_BITRATE = int(os.getenv("GCS_WEBRTC_BITRATE", 3_000_000))  # bit/s, same as the drone's stream
+RELAY_QUEUE = 30            # Packets a viewer may fall behind before skipping to the next keyframe
+
+# Encoded passthrough: the drone's H.264 is forwarded to viewers as is (see set_passthrough)
+PASSTHROUGH_TIMEOUT = 1.0   # Seconds without drone packets before a viewer is sent the relay's packets instead
+_passthrough = False
+_passthrough_lock = threading.Lock()
+_passthrough_tracks = set()
 
-class AIVideoStreamTrack(VideoStreamTrack):
+
+class PublishedFrame:
     """
-    Custom video track that streams AI-processed frames via WebRTC.
-    Optimized for Low Latency using Wall Clock timestamps.
+    One frame published by write_frame().
+
+    version increases with every published frame, and pts is the publish time in RTP clock
+    ticks, the same for every viewer. The av.VideoFrame (yuv420p, what the encoders take) is
+    built on first use and then shared by every track and encode of this version.
+
+    An array borrowed from its owner (on_release given, e.g. a receiver ring slot) is only
+    read until it has been converted or a newer frame is published, whichever comes first;
+    on_release is then called. A borrowed frame superseded before anyone converted it is
+    never converted.
+    """
+    def __init__(self, version, array, pixel_format, pts, on_release=None):
+        self.version = version
+        self.array = array.view()
+        self.array.flags.writeable = False
+        self.pixel_format = pixel_format
+        self.pts = pts
+        self._video_frame = None
+        self._lock = threading.Lock()
+        self._on_release = on_release
+
+    def video_frame(self):
+        """
+        The frame as a yuv420p av.VideoFrame, converted once. May run on an executor thread.
+
+        Returns:
+            The VideoFrame, or None if the array was borrowed and a newer frame replaced it
+            before it was converted (use the newest frame instead)
+        """
+        with self._lock:
+            if self._video_frame is None:
+                if self.array is None:
+                    return None  # Borrowed array already given back
+                video_frame = VideoFrame.from_ndarray(self.array, format=self.pixel_format)
+                if self.pixel_format != "yuv420p":
+                    video_frame = video_frame.reformat(format="yuv420p")
+                video_frame.pts = self.pts
+                video_frame.time_base = VIDEO_TIME_BASE
+                self._video_frame = video_frame
+                self._release()  # The VideoFrame holds its own copy of the pixels
+            return self._video_frame
+
+    def supersede(self):
+        """A newer frame was published: give a borrowed array back unless it is being converted."""
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        on_release, self._on_release = self._on_release, None
+        if on_release is not None:
+            self.array = None
+            on_release()
+
+
+class FrameBuffer:
+    """
+    Newest published frame, shared by the video pipeline thread (publish) and the WebRTC
+    tracks on the event loop (wait_newer).
+
+    Tracks wait on a condition for a newer version instead of polling, so they send each
+    frame once, as soon as it is published.
     """
     def __init__(self):
-        super().__init__()
-        self._start = None
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.frame = PublishedFrame(0, np.zeros((480, 640, 3), dtype=np.uint8), "bgr24", 0)  # Sent until the first frame is written
+        self._loop = None
+        self._changed = None
 
-    async def recv(self):
-        """Give WebRTC the next frame to send."""
-        try:
-            if self._start is None:
-                self._start = time.time()
+    def publish(self, array, pixel_format, on_release=None):
+        pts = int((time.time() - self.start) * VIDEO_CLOCK_RATE)
+        with self.lock:
+            previous = self.frame
+            self.frame = PublishedFrame(previous.version + 1, array, pixel_format, max(pts, previous.pts + 1), on_release)
+            loop = self._loop
+        previous.supersede()
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._notify)
+            except RuntimeError:
+                # Event loop closed (server shutting down)
+                pass
+
+    def latest(self):
+        with self.lock:
+            return self.frame
+
+    def _notify(self):
+        async def notify_all():
+            async with self._changed:
+                self._changed.notify_all()
+        asyncio.get_running_loop().create_task(notify_all())
+
+    async def wait_newer(self, version, timeout=None):
+        """
+        Newest frame once its version is above version.
 
-            pts, time_base = await self.next_timestamp()
-            
-            # Read frame from buffer
-            global _current_frame, _frame_lock
-            with _frame_lock:
-                frame = _current_frame.copy() if _current_frame is not None else None
+        Returns:
+            The newest PublishedFrame, which is not newer than version if timeout ran out
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._changed = asyncio.Condition()
+            with self.lock:
+                self._loop = loop
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.latest().version > version), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.latest()
 
-            if frame is None:
-                frame = np.zeros((480, 640, 3), dtype=np.uint8)
 
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            video_frame = VideoFrame.from_ndarray(frame_rgb, format="rgb24")
-            video_frame.pts = pts
-            video_frame.time_base = time_base
+_frames = FrameBuffer()
 
+
+class AIVideoStreamTrack(MediaStreamTrack):
+    """
+    Custom video track that streams AI-processed frames via WebRTC, encoded by aiortc.
+
+    Each published frame is sent once, as soon as it is published (at most MAX_FPS a second),
+    and timestamped with its publish time. Its VideoFrame is shared with the other viewers.
+    """
+    kind = "video"
+
+    def __init__(self):
+        super().__init__()
+        self._version = -1
+        self._next_at = 0.0
+
+    async def recv(self):
+        """Give WebRTC the next frame to send, waiting for write_frame() to publish one."""
+        try:
+            await asyncio.sleep(max(0.0, self._next_at - time.perf_counter()))
+            published = await _frames.wait_newer(self._version)
+            self._version = published.version
+            self._next_at = time.perf_counter() + 1.0 / MAX_FPS
+            video_frame = await asyncio.get_running_loop().run_in_executor(None, published.video_frame)
+            while video_frame is None:
+                # Superseded before it was converted: send the newer frame instead
+                published = _frames.latest()
+                self._version = published.version
+                video_frame = await asyncio.get_running_loop().run_in_executor(None, published.video_frame)
             return video_frame
         except Exception as e:
             print(f"WebRTC recv ERROR: {e}")
@@ -55,6 +184,226 @@ class AIVideoStreamTrack(VideoStreamTrack):
             raise
 
 
+class SharedEncoder:
+    """
+    One H.264 encode of the write_frame() frames, shared by every relay track.
+
+    Each published frame is encoded once, as soon as it is published (at most fps a second),
+    and the packets are handed to every track that needs them. Keyframe requests from the
+    viewers (new viewer, PLI/FIR) are merged: at most one keyframe per KEYFRAME_MIN_INTERVAL.
+    The encode runs in the default executor, as aiortc runs its own encoders.
+    """
+    KEYFRAME_MIN_INTERVAL = 0.5  # Seconds
+
+    def __init__(self, fps=MAX_FPS, bitrate=RELAY_BITRATE):
+        self.fps = fps
+        self.bitrate = bitrate
+        self.codec = None
+        self.tracks = set()
+        self._task = None
+        self._version = -1
+        self._last_pts = -1
+        self._keyframe_requested = False
+        self._last_keyframe_at = 0.0
+        self.frames_encoded = 0
+        self.keyframes = 0
+        self.keyframe_requests = 0
+
+    def subscribe(self, track):
+        """Start sending packets to track. Runs on the event loop."""
+        self.tracks.add(track)
+        self.request_keyframe()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, track):
+        self.tracks.discard(track)
+        if not self.tracks and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.codec = None
+
+    def request_keyframe(self):
+        self._keyframe_requested = True
+        self.keyframe_requests += 1
+
+    def _create_codec(self, width, height):
+        codec = CodecContext.create("libx264", "w")
+        codec.width = width
+        codec.height = height
+        codec.pix_fmt = "yuv420p"
+        codec.bit_rate = self.bitrate
+        codec.framerate = Fraction(self.fps, 1)
+        codec.time_base = VIDEO_TIME_BASE
+        codec.gop_size = self.fps * 2
+        codec.profile = "Baseline"  # Decodable by every browser
+        codec.options = {"preset": "ultrafast", "tune": "zerolatency", "level": "31"}
+        return codec
+
+    def _encode(self, published, keyframe):
+        """
+        Encode one frame on an executor thread.
+
+        Returns:
+            List of (data, pts, keyframe) H.264 access units
+        """
+        video_frame = published.video_frame()
+        while video_frame is None:
+            # Superseded before it was converted: encode the newer frame instead
+            published = _frames.latest()
+            self._version = published.version
+            video_frame = published.video_frame()
+        if self.codec is None or (self.codec.width, self.codec.height) != (video_frame.width, video_frame.height):
+            self.codec = self._create_codec(video_frame.width, video_frame.height)
+        # A keyframe request may re-encode the same frame, which still needs a later pts
+        self._last_pts = video_frame.pts = max(published.pts, self._last_pts + 1)
+        video_frame.pict_type = PictureType.I if keyframe else PictureType.NONE
+        return [(bytes(packet), packet.pts, packet.is_keyframe) for packet in self.codec.encode(video_frame)]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_at = 0.0
+        while self.tracks:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            if not any(track.wants_encoded() for track in self.tracks):
+                self._version = -1  # Encode the newest frame as soon as a track needs it
+                next_at = time.perf_counter() + 1.0 / self.fps
+                continue
+
+            keyframe = self._keyframe_requested and time.time() - self._last_keyframe_at >= self.KEYFRAME_MIN_INTERVAL
+            if keyframe:
+                published = _frames.latest()
+            else:
+                published = await _frames.wait_newer(self._version, self.KEYFRAME_MIN_INTERVAL)
+                if published.version <= self._version:
+                    continue  # No new frame yet, check the keyframe requests again
+            self._version = published.version
+            if keyframe:
+                self._keyframe_requested = False
+                self._last_keyframe_at = time.time()
+            next_at = time.perf_counter() + 1.0 / self.fps
+
+            try:
+                packets = await loop.run_in_executor(None, self._encode, published, keyframe)
+            except Exception as e:
+                print(f"WebRTC encode ERROR: {e}")
+                traceback.print_exc()
+                self.codec = None
+                continue
+
+            self.frames_encoded += 1
+            tracks = [track for track in self.tracks if track.wants_encoded()]
+            for data, packet_pts, is_keyframe in packets:
+                self.keyframes += is_keyframe
+                for track in tracks:
+                    track._push("encoder", (data, packet_pts, VIDEO_TIME_BASE, is_keyframe))
+
+    def stats(self):
+        return {
+            "viewers": len(self.tracks),
+            "frames_encoded": self.frames_encoded,
+            "keyframes": self.keyframes,
+            "keyframe_requests": self.keyframe_requests,
+        }
+
+
+class RelayVideoStreamTrack(MediaStreamTrack):
+    """
+    Video track that sends H.264 packets encoded elsewhere; aiortc only packetizes them into RTP.
+
+    Packets come from the SharedEncoder, or with passthrough from the drone (write_packet),
+    falling back to the SharedEncoder while the drone stream is down (fallback video).
+    Sources are switched at a keyframe. A viewer starts at a keyframe, and skips to the next
+    keyframe if it falls more than RELAY_QUEUE packets behind. RTP timestamps follow the
+    source's PTS, rebased so they keep increasing across switches and stream restarts.
+    """
+    kind = "video"
+
+    def __init__(self, encoder, passthrough=False):
+        super().__init__()
+        self.encoder = encoder
+        self.passthrough = passthrough
+        self._loop = asyncio.get_running_loop()
+        self._packets = asyncio.Queue(maxsize=RELAY_QUEUE)
+        self._source = None
+        self._waiting_for_keyframe = True
+        self._last_drone_packet_at = 0.0
+        self._start = time.time()
+        self._pts_offset = None
+        self._last_pts = -1
+        self.packets_sent = 0
+        self.packets_skipped = 0
+
+        encoder.subscribe(self)
+        if passthrough:
+            with _passthrough_lock:
+                _passthrough_tracks.add(self)
+
+    def stop(self):
+        self.encoder.unsubscribe(self)
+        with _passthrough_lock:
+            _passthrough_tracks.discard(self)
+        super().stop()
+
+    def wants_encoded(self):
+        """True unless the drone's packets are being forwarded"""
+        return not self.passthrough or time.time() - self._last_drone_packet_at > PASSTHROUGH_TIMEOUT
+
+    def request_keyframe(self):
+        """Keyframe request (PLI/FIR) from the viewer. Drone keyframes come on the drone's own schedule."""
+        if self._source != "drone":
+            self.encoder.request_keyframe()
+
+    def _drop_queued(self):
+        while not self._packets.empty():
+            self._packets.get_nowait()
+            self.packets_skipped += 1
+        self._waiting_for_keyframe = True
+
+    def _push(self, source, packet):
+        """Queue a packet from the encoder or the drone ("encoder"/"drone"). Runs on the event loop."""
+        if source == "drone":
+            self._last_drone_packet_at = time.time()
+        elif not self.wants_encoded():
+            return
+
+        if source != self._source:
+            self._source = source
+            self._pts_offset = None
+            self._drop_queued()
+            if source == "encoder":
+                self.encoder.request_keyframe()
+        elif self._packets.full():
+            # Viewer fell behind: drop the backlog and resume at the next keyframe
+            self._drop_queued()
+
+        if self._waiting_for_keyframe:
+            if not packet[3]:
+                self.packets_skipped += 1
+                return
+            self._waiting_for_keyframe = False
+        self._packets.put_nowait(packet)
+
+    def _clock(self):
+        """Time since the track started, in RTP clock ticks"""
+        return int((time.time() - self._start) * VIDEO_CLOCK_RATE)
+
+    async def recv(self):
+        """Give WebRTC the next H.264 packet."""
+        data, pts, time_base, keyframe = await self._packets.get()
+
+        pts = int(pts * time_base * VIDEO_CLOCK_RATE) if pts is not None else self._clock()
+        if self._pts_offset is None or pts + self._pts_offset <= self._last_pts:
+            self._pts_offset = max(self._clock(), self._last_pts + 1) - pts
+
+        packet = Packet(data)
+        packet.pts = self._last_pts = pts + self._pts_offset
+        packet.time_base = VIDEO_TIME_BASE
+        packet.is_keyframe = keyframe
+        self.packets_sent += 1
+        return packet
+
+
 class RTCOffer(BaseModel):
     """WebRTC offer from client."""
     sdp: str
@@ -63,6 +412,7 @@ class RTCOffer(BaseModel):
 
 # Create WebRTC router
 webrtc_router = APIRouter(prefix="", tags=["webrtc"])
+_encoder = SharedEncoder()
 
 @webrtc_router.post("/offer")
 async def handle_offer(offer: RTCOffer):
@@ -78,11 +428,22 @@ async def handle_offer(offer: RTCOffer):
         if state in ("connected", "failed", "closed"):
             print(f"WebRTC connection state: {state}")
         if state == "failed" or state == "closed":
+            video_track.stop()
             await pc.close()
             _peer_connections.discard(pc)
 
-    video_track = AIVideoStreamTrack()
-    pc.addTrack(video_track)
+    if RELAY or _passthrough:
+        video_track = RelayVideoStreamTrack(_encoder, passthrough=_passthrough)
+        sender = pc.addTrack(video_track)
+        # The sender only forwards packets, so keyframe requests (PLI/FIR) go to the shared encoder
+        sender._send_keyframe = video_track.request_keyframe
+        # The packets are H.264; must be set before the offer is applied
+        h264 = [codec for codec in RTCRtpSender.getCapabilities("video").codecs if codec.mimeType == "video/H264"]
+        for transceiver in pc.getTransceivers():
+            transceiver.setCodecPreferences(h264)
+    else:
+        video_track = AIVideoStreamTrack()
+        pc.addTrack(video_track)
 
     # Process the offer from frontend and create an answer
     await pc.setRemoteDescription(rtc_offer)
@@ -95,11 +456,46 @@ async def handle_offer(offer: RTCOffer):
     }
 
 
-def write_frame(frame):
-    """Write a frame to the shared buffer for WebRTC streaming."""
-    global _current_frame, _frame_lock
-    with _frame_lock:
-        _current_frame = frame
+def write_frame(frame, pixel_format="bgr24", on_release=None):
+    """
+    Write a frame to the shared buffer for WebRTC streaming.
+
+    The array must not be modified after it is written. pixel_format is "bgr24" for
+    (H, W, 3) images or "yuv420p"/"nv12" for (H * 3/2, W) frames from the receiver.
+    Waiting tracks are woken up to send it.
+
+    With on_release, the array is borrowed (e.g. a receiver ring slot): it is read until it
+    has been converted for the viewers or a newer frame is written, then on_release is called.
+    """
+    _frames.publish(frame, pixel_format, on_release)
+
+
+def set_passthrough(enabled):
+    """Forward the drone's H.264 (write_packet) to new viewers instead of encoding write_frame() frames."""
+    global _passthrough
+    _passthrough = enabled
+
+
+def write_packet(data, pts, time_base, keyframe):
+    """
+    Hand one H.264 access unit from the receiver to every passthrough relay track.
+
+    Called on the receiver thread; the packets are queued on each track's event loop.
+    """
+    with _passthrough_lock:
+        tracks = list(_passthrough_tracks)
+    for track in tracks:
+        try:
+            track._loop.call_soon_threadsafe(track._push, "drone", (data, pts, time_base, keyframe))
+        except RuntimeError:
+            # Event loop closed (server shutting down)
+            pass
+
+
+@webrtc_router.get("/metrics/webrtc")
+def get_webrtc_metrics():
+    """Viewers of the shared encoder, frames and keyframes encoded, and keyframe requests"""
+    return _encoder.stats()
 
 
 def get_peer_connections():
@@ -1,4 +1,5 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
+import { OverlayMessage } from '@/utils/telemetryConfig';
 
 export default function VideoFeed() {
     const backendPort = process.env.REACT_APP_BACKEND_PORT || 8766;
@@ -14,12 +15,57 @@ export default function VideoFeed() {
     const videoRef = useRef<HTMLVideoElement>(null);
     const containerRef = useRef<HTMLDivElement>(null);
     const pcRef = useRef<RTCPeerConnection | null>(null);
+    const canvasRef = useRef<HTMLCanvasElement>(null);
+    const overlayRef = useRef<OverlayMessage | null>(null);
+    const cursorRef = useRef<{ x: number; y: number } | null>(null);
 
     // High-performance mouse tracking using refs instead of state
     const lastMouseMoveTimeRef = useRef<number>(0);
     const pendingMouseMoveRef = useRef<{ x: number; y: number } | null>(null);
     const MOUSE_THROTTLE_MS = 80;  // throttle to 80ms for better performance
 
+    // Draw the latest vector overlay on the canvas above the video. Hover is worked out here
+    // from the local cursor, so the highlight follows the mouse without a server round trip.
+    const drawOverlay = useCallback(() => {
+        const canvas = canvasRef.current;
+        const overlay = overlayRef.current;
+        if (!canvas || !overlay) return;
+        if (canvas.width !== overlay.width || canvas.height !== overlay.height) {
+            canvas.width = overlay.width;
+            canvas.height = overlay.height;
+        }
+        const ctx = canvas.getContext('2d');
+        if (!ctx) return;
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        ctx.lineWidth = 2;
+        ctx.font = 'bold 20px sans-serif';
+
+        const cursor = cursorRef.current;
+        for (const detection of overlay.detections) {
+            const [x1, y1, x2, y2] = detection.bbox;
+            if (!cursor || cursor.x < x1 || cursor.x > x2 || cursor.y < y1 || cursor.y > y2) continue;
+            ctx.fillStyle = 'rgba(0, 255, 0, 0.3)';
+            ctx.fillRect(x1, y1, x2 - x1, y2 - y1);
+            ctx.strokeStyle = 'rgb(0, 200, 0)';
+            ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+            ctx.fillStyle = 'rgb(0, 255, 0)';
+            const label = detection.track_id !== null ? `${detection.class} #${detection.track_id}` : detection.class;
+            ctx.fillText(label, x1, y1 - 10);
+        }
+
+        if (overlay.tracking) {
+            const [x1, y1, x2, y2] = overlay.tracking.bbox;
+            ctx.setLineDash(overlay.tracking.searching ? [8, 8] : []);
+            if (!overlay.tracking.searching) {
+                ctx.fillStyle = 'rgba(255, 255, 0, 0.3)';
+                ctx.fillRect(x1, y1, x2 - x1, y2 - y1);
+            }
+            ctx.strokeStyle = 'rgb(200, 200, 0)';
+            ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+            ctx.setLineDash([]);
+        }
+    }, []);
+
     // WebRTC connection
     const startWebRTC = useCallback(async () => {
         try {
@@ -142,6 +188,18 @@ export default function VideoFeed() {
                     setError('WebSocket connection error');
                 };
 
+                ws.onmessage = (event) => {
+                    try {
+                        const data = JSON.parse(event.data);
+                        if (data.type === 'overlay') {
+                            overlayRef.current = data;
+                            drawOverlay();
+                        }
+                    } catch {
+                        // Not JSON, ignore
+                    }
+                };
+
                 wsRef.current = ws;
             } catch (error) {
                 console.error('Failed to connect WebSocket:', error);
@@ -156,7 +214,7 @@ export default function VideoFeed() {
                 wsRef.current.close();
             }
         };
-    }, [gcsServerUrl]); // Dependency array, only rerun if the url changes...
+    }, [gcsServerUrl, drawOverlay]); // Dependency array, only rerun if the url changes...
 
     const handleMouseMove = useCallback((e: React.MouseEvent<HTMLVideoElement>) => {
         if (!videoRef.current) return;
@@ -173,6 +231,8 @@ export default function VideoFeed() {
                 x: Math.round(x * scaleX),
                 y: Math.round(y * scaleY)
             };
+            cursorRef.current = pendingMouseMoveRef.current;
+            drawOverlay();
             return;
         }
 
@@ -185,6 +245,8 @@ export default function VideoFeed() {
         const scaleY = videoRef.current.videoHeight / rect.height;
         const actualX = Math.round(x * scaleX);
         const actualY = Math.round(y * scaleY);
+        cursorRef.current = { x: actualX, y: actualY };
+        drawOverlay();
 
         if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
             wsRef.current.send(JSON.stringify({
@@ -193,7 +255,18 @@ export default function VideoFeed() {
                 y: actualY
             }));
         }
-    }, []);
+    }, [drawOverlay]);
+
+    // Cursor left the video: hide the hover and let the backend go back to full-frame detection
+    const handleMouseLeave = useCallback(() => {
+        cursorRef.current = null;
+        pendingMouseMoveRef.current = null;
+        drawOverlay();
+
+        if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+            wsRef.current.send(JSON.stringify({ type: 'mouse_leave' }));
+        }
+    }, [drawOverlay]);
 
     // Send click event to backend
     const handleClick = useCallback((e: React.MouseEvent<HTMLVideoElement>) => {
@@ -243,10 +316,19 @@ export default function VideoFeed() {
                             setError("Stream error. Is the Python server running?");
                         }}                        
                         onMouseMove={handleMouseMove}
+                        onMouseLeave={handleMouseLeave}
                         onClick={handleClick}
                     />
                 )}
 
+                {/* Vector overlays (GCS_VECTOR_OVERLAYS), sized and fitted like the video */}
+                {!error && (
+                    <canvas
+                        ref={canvasRef}
+                        className="absolute inset-0 w-full h-full object-cover pointer-events-none"
+                    />
+                )}
+
                 {!isWebRTCStreaming && !error && (
                     <div className="absolute inset-0 flex items-center justify-center bg-gray-900/80 backdrop-blur-sm z-10">
                         <svg className="animate-spin h-8 w-8 text-indigo-400" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
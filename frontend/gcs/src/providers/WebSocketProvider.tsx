@@ -78,6 +78,10 @@ export function WebSocketProvider({ children }: WebSocketProviderProps) {
             }
             return;
           }
+          // Video overlays are drawn by VideoFeed
+          if (data.type === 'overlay') {
+            return;
+          }
           // Update telemetry data
           setTelemetryData({ 
               speed: Math.sqrt((data.dlat ** 2) + (data.dlon ** 2) + (data.dalt ** 2)),
@@ -21,6 +21,26 @@ export interface trackingData {
   distance_to_target: number | null;
 }
 
+// Vector overlays sent over /ws/gcs when the backend runs with GCS_VECTOR_OVERLAYS=1
+// Boxes are [x1, y1, x2, y2] in video pixels
+export interface OverlayDetection {
+  bbox: [number, number, number, number];
+  class: string;
+  confidence: number;
+  track_id: number | null;
+}
+
+export interface OverlayMessage {
+  type: 'overlay';
+  frame_number: number | null;
+  video_timestamp: number | null;
+  width: number;
+  height: number;
+  mode: 'detection' | 'tracking';
+  detections: OverlayDetection[];
+  tracking: { bbox: [number, number, number, number]; class: string | null; searching: boolean } | null;
+}
+
 export interface TelemetryItem {
   icon: SvgIconComponent;
   label: string;